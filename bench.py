@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+''' numbers for the hot paths, run against pcf.fakesynth
+
+        ./bench.py                      # everything
+        ./bench.py -k send -k parse     # only names containing send or parse
+        ./bench.py --presets 10000 --latency 0.001 --json > bench_output.txt
+'''
+
+import os, sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import time
+import json
+import asyncio
+import argparse
+import statistics
+
+from pcf.fluidsynth import FluidSynth, AsyncFluidSynth, FluidSynthPool, LineFramer, INSTRUMENTS
+from pcf.fakesynth import FakeShellServer, FakeCatalog
+
+BENCHMARKS = list()
+
+def bench(fn):
+    BENCHMARKS.append(fn)
+    return fn
+
+class Context:
+    def __init__(self, args):
+        self.args = args
+        self.catalog = FakeCatalog.synthetic(args.fonts, args.presets)
+        self.server = FakeShellServer(catalog=self.catalog, latency=args.latency,
+            chunk_size=args.chunk_size).start()
+        self.fs = FluidSynth(port=self.server.port, host='127.0.0.1')
+        self.loop = asyncio.new_event_loop()
+        self.afs = AsyncFluidSynth(port=self.server.port, host='127.0.0.1')
+        self.inst_block = '\n'.join( f'{b:03d}-{p:03d} {n}' for b,p,n in self.catalog.inst[1] )
+
+    def close(self):
+        self.fs.close()
+        self.loop.run_until_complete(self.afs.close())
+        self.loop.close()
+        self.server.stop()
+
+    def app(self):
+        ''' a PCFApp on the fake server, or None if it can't be imported here '''
+        try:
+            from pcf.app import PCFApp
+        except ImportError as e:
+            print(f'# skipping app benchmarks: {e}', file=sys.stderr)
+            return
+        PCFApp.host, PCFApp.port = '127.0.0.1', self.server.port
+        PCFApp._fso = PCFApp._afso = PCFApp._pool = PCFApp._apool = None
+        return PCFApp(cache=False, replay=False, keepalive=None)
+
+@bench
+def send_rtt(ctx):
+    return lambda: ctx.fs.send('echo x')
+
+@bench
+def send_rtt_unframed(ctx):
+    fs = FluidSynth(port=ctx.server.port, host='127.0.0.1', framed=False)
+    return lambda: list(fs.send('echo x'))
+
+@bench
+def batch_16_selects(ctx):
+    cmds = [ FluidSynth.select_cmd(1, 0, 0, chan=c) for c in range(16) ]
+    return lambda: ctx.fs.batch(*cmds)
+
+@bench
+def async_send_rtt(ctx):
+    return lambda: ctx.loop.run_until_complete(ctx.afs.send('echo x'))
+
+@bench
+def catalog(ctx):
+    return ctx.fs.catalog
+
+@bench
+def pool_catalog(ctx):
+    pool = FluidSynthPool(ctx.args.fonts + 1, port=ctx.server.port, host='127.0.0.1')
+    return pool.catalog
+
+@bench
+def async_catalog(ctx):
+    return lambda: ctx.loop.run_until_complete(ctx.afs.catalog())
+
+@bench
+def parse_inst(ctx):
+    return lambda: INSTRUMENTS.parse(ctx.inst_block, font='1')
+
+@bench
+def frame_lines(ctx):
+    data = (ctx.inst_block + '\n').encode()
+    lf = LineFramer()
+    def run():
+        for i in range(0, len(data), 8192):
+            lf.feed(data[i:i+8192])
+            for _ in lf.lines():
+                pass
+    return run
+
+@bench
+def build_inst_tree(ctx):
+    app = ctx.app()
+    return app and app.build_inst_tree
+
+@bench
+def reload(ctx):
+    app = ctx.app()
+    return app and app.reload
+
+def measure(fn, min_time, min_runs=5):
+    fn() # warm up
+    times = list()
+    t_end = time.perf_counter() + min_time
+    while len(times) < min_runs or time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+def run(args=None):
+    parser = argparse.ArgumentParser(prog='bench.py')
+    parser.add_argument('-k', action='append', help='only run benchmarks with this in their name')
+    parser.add_argument('--fonts', default=3, type=int)
+    parser.add_argument('--presets', default=3000, type=int, help='presets per font')
+    parser.add_argument('--latency', default=0, type=float, help='fake server seconds per command')
+    parser.add_argument('--chunk-size', default=0, type=int, help='fake server write size')
+    parser.add_argument('--min-time', default=0.5, type=float, help='seconds per benchmark')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(args)
+
+    ctx = Context(args)
+    results = dict()
+    try:
+        for b in BENCHMARKS:
+            if args.k and not any( k in b.__name__ for k in args.k ):
+                continue
+            fn = b(ctx)
+            if fn is None:
+                continue
+            times = measure(fn, args.min_time)
+            results[b.__name__] = r = {
+                'runs': len(times),
+                'best_ms': min(times) * 1e3,
+                'median_ms': statistics.median(times) * 1e3,
+                'p99_ms': sorted(times)[ int(0.99 * (len(times) - 1)) ] * 1e3,
+            }
+            if not args.json:
+                print(f"{b.__name__:>20s}  {r['median_ms']:10.3f} ms median"
+                      f"  {r['best_ms']:10.3f} best  {r['p99_ms']:10.3f} p99  ({r['runs']} runs)")
+    finally:
+        ctx.close()
+
+    if args.json:
+        json.dump({ 'args': vars(args), 'results': results }, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    run()
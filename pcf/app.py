@@ -2,63 +2,35 @@
 # coding: utf-8
 
 import time
+import asyncio
 import logging
 import urwid
-from pcf.fluidsynth import FluidSynth
+from collections import Counter
+from pcf.fluidsynth import FluidSynth, AsyncFluidSynth, FluidSynthPool, AsyncFluidSynthPool
 from pcf.misc import PathItem, RangySet
-from pcf.metronome import Metronome
+from pcf.metronome import Metronome, PORT_NAME as METRONOME_PORT
+from pcf.patterns import load_patterns
+from pcf.midiport import get_port
+from pcf.midiclock import MidiClockIn
+from pcf.scheduler import default_scheduler
+from pcf.metroworker import MetronomeWorker
+from pcf.cache import CatalogCache, font_key
+from pcf.midiselect import MidiSelect
+from pcf.stats import IOStats
+from pcf.controls import Coalescer, default_controls, read_settings
 
 DRUM_CHANNEL = 9
-FLOOR_TOM = 35
-KICK = 45
-CCRASH = 46
-SNARE = 38
-HHAT = 42
-RIMS = 37
-
-metro_vol = 0.7
-
-_M = ( ((FLOOR_TOM,73),), )
-_B = ( ((HHAT,50),(FLOOR_TOM,73)),
-       ((HHAT,50),), )
-
-_34T = ( ((FLOOR_TOM,80), (KICK,73), ), # (CCRASH,73)),
-         ((FLOOR_TOM,73),),
-         ((FLOOR_TOM,73),),
-       )
-_44T = _34T + (_34T[-1],)
-
-_448T = (
-    ((HHAT,50), (FLOOR_TOM,80), (KICK,73)), # 1
-    ((HHAT,30),),
-    ((HHAT,50), (FLOOR_TOM,73)), # 2
-    ((HHAT,30),),
-    ((HHAT,50), (FLOOR_TOM,73)), # 3
-    ((HHAT,30),),
-    ((HHAT,50), (FLOOR_TOM,73)), # 4
-    ((HHAT,30),),
-)
-
-_348T = (
-    ((HHAT,50), (FLOOR_TOM,80), (KICK,73)), # 1
-    ((HHAT,30),),
-    ((HHAT,50), (FLOOR_TOM,73)), # 2
-    ((HHAT,30),),
-    ((HHAT,50), (FLOOR_TOM,73)), # 3
-    ((HHAT,30),),
-)
-
-def volumize(thing):
-    return max(min(250, int(thing * metro_vol)), 5)
-
-def volume_adjust(scheme):
-    return tuple( tuple( (inst,volumize(vel)) for inst,vel in time_step ) for time_step in scheme )
+metro_vol = 0.7 # scales the pattern velocities
 
 class FluidInstrumentWidget(urwid.TreeWidget):
     log = logging.getLogger('FluidInstrumentWidget')
 
     def __init__(self, node):
         super().__init__(node)
+        if not self.is_leaf and not node.start_expanded:
+            # folded fonts never ask for their children's nodes
+            self.expanded = False
+            self.update_expanded_icon()
         self._w = urwid.AttrWrap(self._w, None)
         self.flagged = False
         self.update_w()
@@ -104,6 +76,39 @@ class FluidInstrumentWidget(urwid.TreeWidget):
             self._w.attr = 'body'
             self._w.focus_attr = 'focus'
 
+class ChannelSet(RangySet):
+    ''' a node's channels; add(), discard(), remove() and clear() keep the
+        font's count of its children's channels current, so the font row
+        never has to go looking
+    '''
+
+    def __init__(self, font=None):
+        super().__init__()
+        self.font = font
+
+    def add(self, x):
+        x = self.wrap(x)
+        if x not in self:
+            super().add(x)
+            if self.font is not None:
+                self.font.chan_added(x)
+
+    def discard(self, x):
+        x = self.wrap(x)
+        if x in self:
+            super().discard(x)
+            if self.font is not None:
+                self.font.chan_removed(x)
+
+    def remove(self, x):
+        if self.wrap(x) not in self:
+            raise KeyError(x)
+        self.discard(x)
+
+    def clear(self):
+        for x in list(self):
+            self.discard(x)
+
 class FluidInstrumentNode(urwid.TreeNode, PathItem):
     log = logging.getLogger('FluidInstrumentNode')
     attrlist = ('!name', 'font', 'bank', 'prog')
@@ -111,7 +116,7 @@ class FluidInstrumentNode(urwid.TreeNode, PathItem):
     def __init__(self, name='FluidSynth', font=None, bank=None, prog=None, parent=None):
         PathItem.__init__(self, name, font, bank, prog)
         urwid.TreeNode.__init__(self, name, key=self.path, parent=parent)
-        self.chan = RangySet()
+        self.chan = ChannelSet(parent)
 
         if parent is not None:
             parent.set_child_node(self.path, self)
@@ -120,33 +125,145 @@ class FluidInstrumentNode(urwid.TreeNode, PathItem):
         return FluidInstrumentWidget(self)
 
     def _invalidate(self):
-        self.get_widget().update()
+        if self._widget is None:
+            return # never drawn; it'll be right when it is
+        self._widget.update()
         # w = self.get_widget()
         # w._invalidate()
         # w.get_inner_widget()
 
+def inst_path(font, bank, prog):
+    ''' PathItem(font, bank, prog).path, without making a PathItem (this
+        runs once per preset in the catalog)
+    '''
+    return f'/{font}/{bank}/{prog}'
+
+def inst_label(name, bank, prog):
+    return f'{int(bank):03d}-{int(prog):03d} {name}'
+
 class FluidFontNode(FluidInstrumentNode, urwid.ParentNode):
+    ''' .records holds the catalog for this font (child path → the
+        instrument record from inst_list) and the child nodes are only made
+        from those when something asks for them: the walker when the font is
+        unfolded, or a channel landing on one. Most fonts stay folded, so
+        most presets never get a node, let alone a widget.
+
+        .chan is every channel any child has, kept up to date by the
+        children's ChannelSets (a font's own changes go on up to the top
+        node the same way); .chan_changed says it did since the row was last
+        redrawn. Only children with nodes can have channels.
+
+        start_expanded is how the font's widget starts out, if it's made.
+    '''
     log = logging.getLogger('FluidFontNode')
     attrlist = ('!name', 'font', 'bank', 'prog')
 
     def __init__(self, name='FluidSynth', font=None, bank=None, prog=None, parent=None):
         PathItem.__init__(self, name, font, bank, prog)
         urwid.ParentNode.__init__(self, name, key=self.path, parent=parent)
+        self.chan = ChannelSet(parent)
+        self.chan_count = Counter() # chan → how many children have it
+        self.chan_changed = False
+        self.records = dict()
+        self._keys = None
+        self.start_expanded = False
 
         if parent is not None:
             parent.set_child_node(self.path, self)
 
-    def get_child_keys(self):
-        return tuple(self._children.keys())
-
-    @property
-    def chan(self):
-        ret = RangySet()
-        for k in self.get_child_keys():
-            n = self.get_child_node(k)
-            for i in n.chan:
-                ret.add(i)
-        return ret
+    def get_child_keys(self, reload=False):
+        if self._keys is None:
+            self._keys = tuple(self.records)
+        return self._keys
+
+    def records_changed(self):
+        ''' call after changing .records (adding, removing or reordering) '''
+        self._keys = None
+
+    def set_child_node(self, key, node):
+        super().set_child_node(key, node)
+        if key not in self.records:
+            self.records[key] = None
+            self._keys = None
+
+    def load_child_node(self, key):
+        name, font, bank, prog = self.records[key]
+        return FluidInstrumentNode(inst_label(name, bank, prog), font, bank, prog, parent=self)
+
+    def remove_child(self, key):
+        ''' forget a child (and its node, if it has one); returns the node '''
+        self.records.pop(key, None)
+        self._keys = None
+        return self._children.pop(key, None)
+
+    def chan_added(self, chan):
+        self.chan_count[chan] += 1
+        if self.chan_count[chan] == 1:
+            self.chan.add(chan)
+            self.chan_changed = True
+
+    def chan_removed(self, chan):
+        self.chan_count[chan] -= 1
+        if self.chan_count[chan] < 1:
+            del self.chan_count[chan]
+            self.chan.discard(chan)
+            self.chan_changed = True
+
+def font_path(path):
+    ''' '/2/0/40' → '/2' '''
+    return '/' + path.split('/')[1]
+
+class InstTree:
+    ''' path → node for the whole catalog, as far as anyone can tell
+
+        The top node and the fonts are always there; instrument nodes are
+        made (and kept) the first time they're looked up, from their font's
+        .records. `path in tree` doesn't make anything.
+    '''
+
+    def __init__(self, top):
+        self.top = top
+        self.fonts = { '/': top }
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}[{len(self.fonts) - 1} fonts; {len(self)} paths]'
+
+    def add_font(self, node):
+        self.fonts[node.path] = node
+        return node
+
+    def remove_font(self, path):
+        return self.fonts.pop(path, None)
+
+    def __contains__(self, path):
+        if not isinstance(path, str):
+            return False
+        if path in self.fonts:
+            return True
+        f = self.fonts.get(font_path(path))
+        return f is not None and path in f.records
+
+    def __getitem__(self, path):
+        if path in self.fonts:
+            return self.fonts[path]
+        if path not in self:
+            raise KeyError(path)
+        return self.fonts[font_path(path)].get_child_node(path)
+
+    def get(self, path, default=None):
+        return self[path] if path in self else default
+
+    def __len__(self):
+        return len(self.fonts) + sum( len(f.records) for p,f in self.fonts.items() if p != '/' )
+
+    def nodes(self):
+        ''' the nodes that exist so far: the fonts and whatever children
+            they've made
+        '''
+        for p,f in self.fonts.items():
+            yield f
+            if p != '/':
+                yield from f._children.values()
 
 ACTUAL_SHOW_CURSOR = urwid.escape.SHOW_CURSOR
 class PCFApp:
@@ -162,13 +279,78 @@ class PCFApp:
                 ('inactive', 'dark gray', 'dark blue'),
             ]
 
-    _fso = font_list = chan_list = inst_list = None # class vars
-
-    def __init__(self):
+    help_msg = [
+        ('button', '<spc>'), ('foot', ':set-inst '),
+        ('button', '0…f'), ('foot', ':±chan '),
+        ('button', '_'), ('foot', ':-all '),
+        ('button', '+'), ('foot', ':+all '),
+        ('button', 'r'), ('foot', ':reload '),
+        ('button', 's'), ('foot', ':stats '),
+        ('button', 'S'), ('foot', ':dump stats '),
+        ('button', '<>'), ('foot', ':gain '),
+        ('button', 'vV'), ('foot', ':vol '),
+        ('button', 'pP'), ('foot', ':pan '),
+        ('button', 'xX'), ('foot', ':expr '),
+        ('button', '{}'), ('foot', ':reverb '),
+        ('button', '()'), ('foot', ':chorus '),
+        ('button', '$'), ('foot', ':4/4 beat '),
+        ('button', '%'), ('foot', ':4/4,8 beat '),
+        ('button', '^'), ('foot', ':3/4,8 beat '),
+        ('button', '&'), ('foot', ':shuffle '),
+        ('button', '*'), ('foot', ':12/8 '),
+        ('button', '@'), ('foot', ':pure bpm '),
+        ('button', '!'), ('foot', ':pure bpm + 8th'),
+        ('button', '#'), ('foot', ':3/4 beat '),
+        ('button', '['), ('foot', ':-10 bpm '),
+        ('button', ']'), ('foot', ':+10 bpm '),
+        ('button', ',.'), ('foot', ':click vol '),
+    ]
+
+    _fso = _afso = _pool = _apool = font_list = chan_list = inst_list = None # class vars
+    host, port = 'localhost', 9800
+    pool_size = 3 # shell connections used for catalog queries
+    stats = IOStats() # shared by every shell client above
+
+    # key → (control, steps); per-channel controls act on the active channels
+    control_keys = {
+        '<': ('gain', -1), '>': ('gain', +1),
+        'v': ('volume', -1), 'V': ('volume', +1),
+        'p': ('pan', -1), 'P': ('pan', +1),
+        'x': ('expression', -1), 'X': ('expression', +1),
+        '{': ('reverb', -1), '}': ('reverb', +1),
+        '(': ('chorus', -1), ')': ('chorus', +1),
+    }
+
+    tempo_ramp_beats = 2 # [ and ] glide to the new tempo over this many beats
+
+    def __init__(self, replay=True, keepalive=5.0, cache=True, midi_select=False,
+            clock_out=False, clock_in=None, metronome_process=False, rt_cpu=None,
+            switch_interval=None):
         self.start_node = self.listbox = self.walker = self.inst_tree = None
+        # urwid runs on this loop (see main()), so the AsyncFluidSynth work
+        # started from key handlers runs while the screen keeps updating
+        self.aloop = asyncio.new_event_loop()
         self.active_channels = {0,}
         self.mouse_bookmarks = set()
-        self.reload()
+        self.keepalive = keepalive
+        if replay:
+            self.afso.on_reconnect.append(self.replay_channels)
+        self.cache = CatalogCache(host=self.host, port=self.port) if cache is True else (cache or None)
+        self.midi_select = MidiSelect() if midi_select is True else (midi_select or None)
+        self.catalog_key = None
+        self.stale = False
+        self.chan_map = dict()
+        # chan → how many selects were sent for it from here; an areload()
+        # leaves channels that got another one while it waited alone
+        self.chan_gen = Counter()
+        self.last_reload = None
+        # held-down keys change these at key repeat rate; the coalescer turns
+        # that into a few batched writes a second with only the latest values
+        self.controls = default_controls()
+        self.coalescer = Coalescer(self.afso.batch, loop=self.aloop)
+        if not self.load_cached_state():
+            self.fetch_current_state()
+        self.reload(fetch=False)
 
         self.listbox  = urwid.TreeListBox(self.walker)
         self.header   = urwid.Text('FluidSynth Instruments')
@@ -184,16 +366,56 @@ class PCFApp:
         fa = urwid.AttrWrap(self.footer,  'foot')
 
         self.view = urwid.Frame( la, header=ha, footer=fa )
+        self.body = la
+        self.stats_text = urwid.Text('')
+        self.stats_pane = urwid.AttrWrap(urwid.LineBox(
+            urwid.Filler(self.stats_text, 'top'), title='shell i/o'), 'body')
+        self.stats_shown = False
+        self.stats_alarm = None # the pending refresh while it's shown
 
         self.metronome = None
+        # key → Pattern, from pcf/metronome.pat and the user's own copy
+        try:
+            patterns = load_patterns()
+        except (OSError, ValueError) as e:
+            self.log.error('unable to read metronome patterns: %s', e)
+            patterns = load_patterns(user=False)
+        self.metronome_keys = { p.key: p for p in patterns.values() if p.key }
+        self.clock_out = clock_out
+        # clock_in: a MidiClockIn, or a port name for one ('' for our own port)
+        if isinstance(clock_in, str):
+            clock_in = MidiClockIn(clock_in or None)
+        self.clock_in = clock_in
+        # metronome_process: run the click in a child process (started on
+        # first use and kept), see pcf.metroworker
+        self.metronome_process = metronome_process
+        self.rt_cpu = rt_cpu
+        self.metronome_worker = None
+        # switch_interval: hand the GIL around this often (seconds) while the
+        # in-process metronome runs (the scheduler puts it back once nothing
+        # is scheduled); it's a process-wide setting, so only on request
+        if switch_interval:
+            default_scheduler().switch_interval = switch_interval
+        self.metro_vol = metro_vol
         self.beats_per_minute = 80
 
         self.update_footer()
 
-    def reload(self, fetch=True):
+    def reload(self, fetch=True, incremental=False):
+        t0, before = time.perf_counter(), self.stats.totals()
+        if incremental and self.inst_tree is not None:
+            old_inst = self.inst_list
+            if fetch:
+                self.fetch_current_state()
+            self.patch_inst_tree(catalog_changed=self.inst_list is not old_inst)
+            if fetch:
+                self.note_reload(t0, before)
+            return
         if fetch:
             self.fetch_current_state()
         self.build_inst_tree()
+        if fetch:
+            self.note_reload(t0, before)
 
         cur_node = self.current_node
         if cur_node:
@@ -209,18 +431,34 @@ class PCFApp:
         if self.listbox is not None:
             self.listbox.body = self.walker
 
-        for node in self.inst_tree.values():
-            if isinstance(node, FluidFontNode) and not node in (self.top_node, self.start_node, self.start_node.get_parent()):
-                node.get_widget().fold()
+        # every font starts out folded (without making its widget, let alone
+        # its children) except the ones the start node is in
+        for node in (self.start_node, self.start_node.get_parent()):
+            if isinstance(node, FluidFontNode):
+                node.start_expanded = True
 
     def main(self):
         urwid.escape.SHOW_CURSOR = ''
-        self.loop = urwid.MainLoop(self.view, self.palette, unhandled_input=self.unhandled_input)
+        asyncio.set_event_loop(self.aloop)
+        self.loop = urwid.MainLoop(self.view, self.palette, unhandled_input=self.unhandled_input,
+            event_loop=urwid.AsyncioEventLoop(loop=self.aloop))
+        if not self.metronome_process:
+            # open the click's port now, so it's patched in before the first downbeat
+            get_port(METRONOME_PORT)
+        # gain, reverb and chorus start from whatever the synth has now
+        self.spawn(read_settings(self.afso, self.controls))
+        if self.keepalive:
+            # notices a restarted synth even when nobody is pressing keys
+            self.spawn(self.afso.keepalive(self.keepalive))
+        if self.stale:
+            self.spawn(self.areload())
         try:
             self.loop.run()
         except KeyboardInterrupt:
             pass
         finally:
+            if self.metronome_worker is not None:
+                self.metronome_worker.close()
             urwid.escape.SHOW_CURSOR = ACTUAL_SHOW_CURSOR
             self.loop.screen.write(urwid.escape.SHOW_CURSOR)
             print('\nbye.\n')
@@ -241,23 +479,13 @@ class PCFApp:
 
     def update_footer(self, msg=None):
         if msg is None:
-            time.sleep(0.5)
-            msg = [
-                ('button', '<spc>'), ('foot', ':set-inst '),
-                ('button', '0…f'), ('foot', ':±chan '),
-                ('button', '_'), ('foot', ':-all '),
-                ('button', '+'), ('foot', ':+all '),
-                ('button', 'r'), ('foot', ':reload '),
-                ('button', '$'), ('foot', ':4/4 beat '),
-                ('button', '%'), ('foot', ':4/4,8 beat '),
-                ('button', '^'), ('foot', ':3/4,8 beat '),
-                ('button', '@'), ('foot', ':pure bpm '),
-                ('button', '!'), ('foot', ':pure bpm + 8th'),
-                ('button', '#'), ('foot', ':3/4 beat '),
-                ('button', '['), ('foot', ':-10 bpm '),
-                ('button', ']'), ('foot', ':+10 bpm '),
-            ]
-        elif msg is not None:
+            if hasattr(self, 'loop'):
+                # leave whatever message is up for a moment before putting the
+                # help back, without blocking the loop to do it
+                self.loop.set_alarm_in(0.5, lambda *_: self.update_footer(self.help_msg))
+            else:
+                msg = self.help_msg
+        elif isinstance(msg, str):
             msg = ('foot', msg)
         attr_txt = list()
         for i in range(16):
@@ -269,23 +497,186 @@ class PCFApp:
         if hasattr(self, 'loop'):
             self.loop.draw_screen()
 
+    def stats_lines(self):
+        ret = self.stats.lines_of_text()
+        lr = self.last_reload
+        if lr:
+            ret += [ '', 'last reload:',
+                f"  {lr['wall']*1e3:0.1f} ms, {lr['count']} cmds, {lr['lines']} lines",
+                f"  {lr['bytes_out']} bytes out, {lr['bytes_in']} in" ]
+        return ret
+
+    def update_stats(self, *_):
+        self.stats_alarm = None
+        if not self.stats_shown:
+            return
+        self.stats_text.set_text('\n'.join(self.stats_lines()))
+        if hasattr(self, 'loop'):
+            self.stats_alarm = self.loop.set_alarm_in(1, self.update_stats)
+
+    def toggle_stats(self):
+        self.stats_shown = not self.stats_shown
+        if self.stats_alarm is not None:
+            # one refresh chain at a time, however fast this is pressed
+            self.loop.remove_alarm(self.stats_alarm)
+            self.stats_alarm = None
+        if self.stats_shown:
+            self.view.body = urwid.Columns([ self.body, ('fixed', 46, self.stats_pane) ])
+            self.update_stats()
+        else:
+            self.view.body = self.body
+
+    def dump_stats(self):
+        path = self.stats.dump(last_reload=self.last_reload)
+        self.update_footer(f'stats → {path}' if path else 'unable to write stats')
+        self.update_footer()
+
     def push_current_node_to_active_channels(self):
         cur_node = self.current_node
+        if isinstance(cur_node, FluidFontNode):
+            # a font has no bank or program to select
+            self.update_footer('that is a font, pick one of its presets')
+            self.update_footer()
+            return
         self.update_footer(f'→ setting active channels → {cur_node.full_string} … ')
-        for chan in self.active_channels:
+        cmds, via_midi = list(), list()
+        touched = set()
+        for chan in sorted(self.active_channels):
             if chan in cur_node.chan:
                 continue
-            self.fso.select( cur_node.font, cur_node.bank, cur_node.prog, chan=chan )
+            if self.midi_select and self.midi_select.select(cur_node.font, cur_node.bank, cur_node.prog, chan=chan):
+                via_midi.append(chan)
+            else:
+                cmds.append( self.fso.select_cmd(cur_node.font, cur_node.bank, cur_node.prog, chan=chan) )
+            # chan_map says who had it; no need to go looking through the tree
+            itn = self.inst_tree.get(self.chan_map.get(chan))
+            # add before taking it away, so a font that keeps the channel
+            # doesn't see it come and go
             cur_node.chan.add(chan)
+            self.chan_map[chan] = cur_node.path
+            self.chan_gen[chan] += 1
             self.log.debug('added chan=%s to %s', chan, cur_node)
-            cur_node._invalidate()
-            for itn in self.inst_tree.values():
-                if itn is not cur_node and chan in itn.chan:
-                    self.log.debug("chan=%s went to %s, removed from %s", chan, cur_node, itn)
-                    itn.chan.remove(chan)
-                    itn._invalidate()
+            touched.add(cur_node)
+            if itn is not None and itn is not cur_node:
+                self.log.debug("chan=%s went to %s, removed from %s", chan, cur_node, itn)
+                itn.chan.discard(chan)
+                touched.add(itn)
+        self._invalidate_nodes(touched)
+        if via_midi:
+            self.spawn(self.verify_channels(via_midi))
+        if cmds:
+            self.spawn(self.afso.batch(*cmds), done=lambda _: self.update_footer())
+        else:
+            self.update_footer()
+
+    def nudge_control(self, name, steps):
+        c = self.controls[name]
+        if '{chan}' in c.cmd:
+            chans = sorted(self.active_channels)
+            for chan in chans:
+                c.nudge(steps, chan=chan)
+                self.coalescer.set( (name, chan), c.command(chan) )
+            shown = ' '.join( f'{chan:x}:{c.show(chan)}' for chan in chans ) or 'no active channels'
+        else:
+            c.nudge(steps)
+            self.coalescer.set( (name, None), c.command() )
+            shown = c.show()
+        self.update_footer(f'{name} {shown}')
+        self.update_footer()
+
+    def control_commands(self):
+        ''' every control that was moved, as shell commands '''
+        return [ c.command(chan) for c in self.controls.values() for chan in sorted(c.values, key=str) ]
+
+    async def verify_channels(self, chans, delay=0.25):
+        ''' after selecting over MIDI, ask the shell (once) whether it took and
+            fix up any channel that didn't (port not patched, say)
+        '''
+        await asyncio.sleep(delay)
+        actual = { int(c.chan): PathItem(*c[2:]).path for c in await self.afso.channels }
+        cmds = list()
+        for chan in chans:
+            want = self.chan_map.get(chan)
+            if want in self.inst_tree and actual.get(chan) != want:
+                n = self.inst_tree[want]
+                cmds.append( self.afso.select_cmd(n.font, n.bank, n.prog, chan=chan) )
+        if cmds:
+            self.log.warning('MIDI select missed %d channel(s), using the shell', len(cmds))
+            await self.afso.batch(*cmds)
+
+    def channel_assignments(self):
+        ''' chan → instrument node, as far as the tree knows '''
+        return { chan: self.inst_tree[path] for chan,path in self.chan_map.items() if path in self.inst_tree }
+
+    async def replay_channels(self, afso):
+        ''' on_reconnect callback: put every channel (and every control that
+            was moved) back the way we had it, in one batch
+        '''
+        # a restarted synth is back to its configured settings; the controls
+        # nobody moved start from those, the rest are replayed
+        await read_settings(afso, self.controls)
+        cmds = [ afso.select_cmd(n.font, n.bank, n.prog, chan=chan)
+            for chan,n in sorted(self.channel_assignments().items()) ]
+        cmds += self.control_commands()
+        self.log.info('synth came back, replaying %d channel(s)', len(cmds))
+        if cmds:
+            await afso.batch(*cmds)
+        self.update_footer('synth restarted, channels restored')
         self.update_footer()
 
+    def spawn(self, coro, done=None):
+        ''' run coro on the urwid/asyncio loop; done(result) is called when it
+            finishes, failures end up in the log and the footer
+        '''
+        def _done(task):
+            if task.cancelled():
+                return
+            e = task.exception()
+            if e is not None:
+                self.log.error('background task failed: %s', e, exc_info=e)
+                self.update_footer(f'error: {e}')
+            elif callable(done):
+                done(task.result())
+        task = self.aloop.create_task(coro)
+        task.add_done_callback(_done)
+        return task
+
+    def toggle_metronome(self, pattern):
+        if self.metronome:
+            self.metronome.stop()
+            self.metronome = None
+            return
+        kw = dict(pattern=pattern, beats_per_minute=self.beats_per_minute,
+            channel=DRUM_CHANNEL, volume=self.metro_vol, clock_out=self.clock_out)
+        if self.metronome_process:
+            # a MidiClockIn can't be handed to another process; following
+            # external clock stays in-process
+            if self.metronome_worker is None:
+                self.metronome_worker = MetronomeWorker(cpu=self.rt_cpu)
+            self.metronome = self.metronome_worker.load(**kw)
+        else:
+            self.metronome = Metronome(follow=self.clock_in, **kw)
+        self.metronome.start()
+
+    def change_tempo(self, delta):
+        if self.clock_in is not None:
+            bpm = self.clock_in.beats_per_minute
+            self.update_footer(f'following MIDI clock at {bpm:0.1f} bpm' if bpm else 'waiting for MIDI clock')
+            self.update_footer()
+            return
+        self.beats_per_minute += delta
+        self.update_footer(f'{self.beats_per_minute} bpm')
+        self.update_footer()
+        if self.metronome:
+            self.metronome.set_tempo(self.beats_per_minute, ramp_beats=self.tempo_ramp_beats)
+
+    def change_metro_vol(self, delta):
+        self.metro_vol = max(0.05, min(1.8, round(self.metro_vol + delta, 2)))
+        self.update_footer(f'metronome volume {self.metro_vol:0.2f}')
+        self.update_footer()
+        if self.metronome:
+            self.metronome.set_volume(self.metro_vol)
+
     def unhandled_input(self, k):
         self.log.debug('unhandled_input(%s)', k)
         if isinstance(k, tuple):
@@ -301,88 +692,33 @@ class PCFApp:
             if k in ('q', 'Q'):
                 raise urwid.ExitMainLoop()
 
-            elif k == '!':
-                if self.metronome:
-                    self.metronome.stop()
-                    self.metronome = None
-                else:
-                    self.metronome = Metronome(*volume_adjust(_B),
-                        beats_per_minute=2*self.beats_per_minute,
-                        channel=DRUM_CHANNEL)
-                    self.metronome.start()
-
-            elif k == '@':
-                if self.metronome:
-                    self.metronome.stop()
-                    self.metronome = None
-                else:
-                    self.metronome = Metronome(*volume_adjust(_M),
-                        beats_per_minute=self.beats_per_minute,
-                        channel=DRUM_CHANNEL)
-                    self.metronome.start()
-
-            elif k == '#':
-                if self.metronome:
-                    self.metronome.stop()
-                    self.metronome = None
-                else:
-                    self.metronome = Metronome(*volume_adjust(_34T),
-                        beats_per_minute=self.beats_per_minute,
-                        channel=DRUM_CHANNEL)
-                    self.metronome.start()
-
-            elif k == '$':
-                if self.metronome:
-                    self.metronome.stop()
-                    self.metronome = None
-                else:
-                    self.metronome = Metronome(*volume_adjust(_44T),
-                        beats_per_minute=self.beats_per_minute,
-                        channel=DRUM_CHANNEL)
-                    self.metronome.start()
-
-            elif k == '%':
-                if self.metronome:
-                    self.metronome.stop()
-                    self.metronome = None
-                else:
-                    self.metronome = Metronome(*volume_adjust(_448T),
-                        beats_per_minute=2*self.beats_per_minute,
-                        channel=DRUM_CHANNEL)
-                    self.metronome.start()
-
-            elif k == '^':
-                if self.metronome:
-                    self.metronome.stop()
-                    self.metronome = None
-                else:
-                    self.metronome = Metronome(*volume_adjust(_348T),
-                        beats_per_minute=2*self.beats_per_minute,
-                        channel=DRUM_CHANNEL)
-                    self.metronome.start()
+            elif k in self.metronome_keys:
+                self.toggle_metronome(self.metronome_keys[k])
 
             elif k == '[':
-                self.beats_per_minute -= 10
-                self.update_footer(f'{self.beats_per_minute} bpm')
-                self.update_footer()
-                if self.metronome:
-                    self.metronome.stop()
-                    self.metronome.beats_per_minute = self.beats_per_minute
-                    self.metronome.start()
+                self.change_tempo(-10)
 
             elif k == ']':
-                self.beats_per_minute += 10
-                self.update_footer(f'{self.beats_per_minute} bpm')
-                self.update_footer()
-                if self.metronome:
-                    self.metronome.stop()
-                    self.metronome.beats_per_minute = self.beats_per_minute
-                    self.metronome.start()
+                self.change_tempo(+10)
+
+            elif k == ',':
+                self.change_metro_vol(-0.05)
+
+            elif k == '.':
+                self.change_metro_vol(+0.05)
 
             elif k == 'r':
                 self.update_footer(f'reloading …')
-                self.reload()
-                self.update_footer()
+                self.spawn(self.areload())
+
+            elif k == 's':
+                self.toggle_stats()
+
+            elif k == 'S':
+                self.dump_stats()
+
+            elif k in self.control_keys:
+                self.nudge_control(*self.control_keys[k])
 
             elif k in ('+', '='):
                 self.active_channels = set(range(16))
@@ -409,33 +745,230 @@ class PCFApp:
     @classmethod
     def get_fso(cls):
         if cls._fso is None:
-            cls._fso = FluidSynth()
+            cls._fso = FluidSynth(port=cls.port, host=cls.host, stats=cls.stats)
         return cls._fso
 
+    @property
+    def afso(self):
+        return self.get_afso()
+
+    @classmethod
+    def get_afso(cls):
+        if cls._afso is None:
+            cls._afso = AsyncFluidSynth(port=cls.port, host=cls.host, stats=cls.stats)
+        return cls._afso
+
+    @classmethod
+    def get_pool(cls):
+        ''' where the catalog queries go: a FluidSynthPool, or just the fso '''
+        if cls.pool_size < 2:
+            return cls.get_fso()
+        if cls._pool is None:
+            cls._pool = FluidSynthPool(cls.pool_size, port=cls.port, host=cls.host, stats=cls.stats)
+        return cls._pool
+
+    @classmethod
+    def get_apool(cls):
+        if cls.pool_size < 2:
+            return cls.get_afso()
+        if cls._apool is None:
+            cls._apool = AsyncFluidSynthPool(cls.pool_size, port=cls.port, host=cls.host, stats=cls.stats)
+        return cls._apool
+
     def fetch_current_state(cls):
         cls.log.debug('fetch_current_state()')
-        fso = cls.get_fso()
-        cls.font_list = fso.fonts
-        cls.chan_list = fso.channels
-        cls.inst_list = fso.instruments
+        cls.set_state(*cls.get_pool().catalog())
+
+    def set_state(self, font_list, chan_list, inst_list):
+        catalog_changed = inst_list is not self.inst_list
+        if self.midi_select and catalog_changed:
+            self.midi_select.update_catalog(inst_list)
+        self.font_list, self.chan_list, self.inst_list = font_list, chan_list, inst_list
+        self.catalog_key = font_key(font_list)
+        self.stale = False
+        # rewriting the cache takes tens of ms on the loop; the channels in it
+        # are only for the first draw and get fetched again right after that
+        if self.cache is not None and catalog_changed:
+            self.cache.save(font_list, chan_list, inst_list)
+
+    def load_cached_state(self):
+        if self.cache is None:
+            return False
+        hit = self.cache.load()
+        if hit is None:
+            return False
+        self.log.debug('drawing from %s until areload() is done', self.cache)
+        self.catalog_key, self.font_list, self.chan_list, self.inst_list = hit
+        if self.midi_select:
+            self.midi_select.update_catalog(self.inst_list)
+        self.stale = True
+        return True
 
     def build_inst_tree(self):
         # reset tree
-        self.inst_tree = dict()
-        self.inst_tree['/'] = self.top_node = FluidFontNode('FluidSynth')
+        self.top_node = FluidFontNode('FluidSynth')
+        self.top_node.start_expanded = True
+        self.inst_tree = InstTree(self.top_node)
 
         # add soundfont nodes
         for font,name,path in self.font_list:
-            n = FluidFontNode(path, font, parent=self.top_node)
-            self.inst_tree[n.path] = n
+            self.inst_tree.add_font(FluidFontNode(path, font, parent=self.top_node))
 
-        # add instrument nodes
-        for name,font,bank,prog in self.inst_list:
-            fp = PathItem(font).path
-            n = FluidInstrumentNode(f'{int(bank):03d}-{int(prog):03d} {name}',
-                font,bank,prog, parent=self.inst_tree[fp])
-            self.inst_tree[n.path] = n
+        # the instruments are just records until something wants their node
+        fonts = self.inst_tree.fonts
+        for rec in self.inst_list:
+            name,font,bank,prog = rec
+            fonts[f'/{font}'].records[inst_path(font, bank, prog)] = rec
 
-        # mark all instruments with their channel(s) (if any)
+        # mark all instruments with their channel(s) (if any); these get nodes
+        self.chan_map = dict()
         for chan,_,*fbp in self.chan_list:
-            self.inst_tree[ PathItem(*fbp).path ].chan.add(chan)
+            path = PathItem(*fbp).path
+            self.inst_tree[path].chan.add(chan)
+            self.chan_map[int(chan)] = path
+        for f in self.inst_tree.fonts.values():
+            f.chan_changed = False # no rows drawn yet
+
+    async def afetch_current_state(self):
+        ''' like fetch_current_state(), but the (big) instrument lists are
+            only asked for again if the fonts changed; returns True if they
+            were
+        '''
+        self.log.debug('afetch_current_state()')
+        afso = self.get_afso()
+        fonts, chans = await afso.status()
+        if font_key(fonts) == self.catalog_key and self.inst_list is not None:
+            self.set_state(fonts, chans, self.inst_list)
+            return False
+        self.set_state(fonts, chans, await self.get_apool().instruments_for(fonts))
+        return True
+
+    async def areload(self):
+        ''' fetch, then patch the tree we have rather than rebuilding it '''
+        t0, before = time.perf_counter(), self.stats.totals()
+        gen = self.chan_gen.copy()
+        catalog_changed = await self.afetch_current_state()
+        # the channel list may predate selects made while we were waiting
+        moved = { chan for chan,n in self.chan_gen.items() if gen[chan] != n }
+        self.patch_inst_tree(catalog_changed=catalog_changed, keep=moved)
+        self.note_reload(t0, before)
+        self.update_footer()
+
+    def note_reload(self, t0, before):
+        ''' what the last reload cost: wall time plus the shell traffic it made '''
+        self.last_reload = IOStats.diff(self.stats.totals(), before)
+        self.last_reload['wall'] = time.perf_counter() - t0
+
+    def _sort_children(self, parent):
+        parent.records = dict(sorted(parent.records.items(),
+            key=lambda kv: tuple( int(x) for x in kv[0].split('/')[1:] )))
+        parent.records_changed()
+
+    def _remove_node(self, node):
+        parent = node.get_parent()
+        parent.remove_child(node.get_key())
+        if isinstance(node, FluidFontNode):
+            for child in node._children.values():
+                child.chan.clear() # takes them off the font's (and the top's) counts
+            self.inst_tree.remove_font(node.path)
+        else:
+            node.chan.clear()
+        return parent
+
+    def _patch_catalog(self, touched):
+        resort = set()
+
+        fonts = { PathItem(f.id).path: f for f in self.font_list }
+        for path in [ k for k in self.top_node.get_child_keys() if k not in fonts ]:
+            self._remove_node(self.inst_tree[path])
+            resort.add(self.top_node)
+        for path,(font,name,fpath) in fonts.items():
+            if path not in self.inst_tree:
+                self.inst_tree.add_font(FluidFontNode(fpath, font, parent=self.top_node))
+                resort.add(self.top_node)
+
+        want = { p: dict() for p in fonts }
+        for rec in self.inst_list:
+            name,font,bank,prog = rec
+            want[f'/{font}'][inst_path(font, bank, prog)] = rec
+        for fpath,recs in want.items():
+            f = self.inst_tree.fonts[fpath]
+            for path in [ p for p in f.records if p not in recs ]:
+                node = f.remove_child(path)
+                if node is not None:
+                    node.chan.clear()
+                resort.add(f)
+            for path,rec in recs.items():
+                if path not in f.records:
+                    f.records[path] = rec
+                    resort.add(f)
+                elif f.records[path] != rec:
+                    f.records[path] = rec
+                    node = f._children.get(path)
+                    if node is not None:
+                        node.name = inst_label(rec[0], rec[2], rec[3])
+                        touched.add(node)
+
+        for parent in resort:
+            self._sort_children(parent)
+            touched.add(parent)
+        return bool(resort)
+
+    def _invalidate_nodes(self, nodes):
+        ''' redraw nodes, and the fonts above them whose channels changed
+            because of it, each once
+        '''
+        nodes = set(nodes)
+        for node in list(nodes):
+            parent = node.get_parent()
+            while parent is not None and parent.chan_changed:
+                nodes.add(parent)
+                parent = parent.get_parent()
+        for node in nodes:
+            if node.path in self.inst_tree:
+                if isinstance(node, FluidFontNode):
+                    node.chan_changed = False
+                node._invalidate()
+
+    def patch_inst_tree(self, catalog_changed=True, keep=()):
+        ''' bring the existing tree in line with font_list/inst_list/chan_list
+
+            Nodes (and so their widgets, fold state and the focus) are kept;
+            only nodes whose channels, name or presence changed get touched.
+            With catalog_changed=False only the channel map is diffed, which
+            is O(changed channels). Channels in keep stay where chan_map has
+            them (as long as that preset is still there).
+        '''
+        touched = set()
+        structure_changed = catalog_changed and self._patch_catalog(touched)
+
+        want = { int(c.chan): PathItem(*c[2:]).path for c in self.chan_list }
+        for chan in set(self.chan_map) | set(want):
+            old, new = self.chan_map.get(chan), want.get(chan)
+            if chan in keep and old in self.inst_tree:
+                continue
+            if old == new and new in self.inst_tree:
+                continue
+            if new in self.inst_tree:
+                node = self.inst_tree[new]
+                node.chan.add(chan)
+                touched.add(node)
+                self.chan_map[chan] = new
+            else:
+                self.chan_map.pop(chan, None)
+            if old in self.inst_tree and old != new:
+                node = self.inst_tree[old]
+                node.chan.discard(chan)
+                touched.add(node)
+
+        self.log.debug('patch_inst_tree() touched %d node(s)', len(touched))
+        self._invalidate_nodes(touched)
+
+        if structure_changed:
+            cur_node = self.current_node
+            if cur_node is None or cur_node.path not in self.inst_tree:
+                parent = cur_node and cur_node.get_parent()
+                while parent is not None and parent.path not in self.inst_tree:
+                    parent = parent.get_parent()
+                self.walker.set_focus(parent or self.top_node)
+            self.walker._modified()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import re
+import json
+import logging
+
+from .fluidsynth import FONTS, CHANNELS, INSTRUMENTS
+
+log = logging.getLogger('pcf.cache')
+
+CACHE_VERSION = 1
+
+# the same record types the FluidSynth parsers hand back
+Font = FONTS.record
+Channel = CHANNELS.record
+Instrument = INSTRUMENTS.record
+
+def default_cache_path(host=None, port=None):
+    ''' one file per synth: the same font paths on another host (or another
+        fluidsynth on this one) can be loaded as something else entirely
+    '''
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    if host is None and port is None:
+        return os.path.join(base, 'pcf', 'catalog.json')
+    host = re.sub(r'[^\w.-]', '_', str(host))
+    return os.path.join(base, 'pcf', f'catalog-{host}-{port}.json')
+
+def font_key(fonts):
+    ''' what the instrument list depends on: which file is loaded as which
+        font id, and whether the file changed since
+    '''
+    ret = list()
+    for f in fonts:
+        try:
+            mtime = os.stat(f.path).st_mtime_ns
+        except OSError:
+            mtime = None # remote synth, or the path isn't visible from here
+        ret.append( [str(f.id), f.path, mtime] )
+    return ret
+
+class CatalogCache:
+    ''' the parsed font_list/chan_list/inst_list on disk, so the UI can draw
+        right away and check with the synth afterwards
+
+            cc = CatalogCache(host='localhost', port=9800)
+            hit = cc.load() # None, or (key, fonts, chans, inst)
+            ...
+            cc.save(fonts, chans, inst)
+
+        The host and port pick the file and are checked on load, so two
+        synths never read each other's catalogs.
+    '''
+
+    def __init__(self, path=None, host=None, port=None):
+        self.path = path or default_cache_path(host, port)
+        self.synth = None if host is None and port is None else f'{host}:{port}'
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}[{self.path}]'
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as fh:
+                dat = json.load(fh)
+            if dat.get('version') != CACHE_VERSION or dat.get('synth') != self.synth:
+                return
+            return ( dat['key'],
+                [ Font(*x) for x in dat['fonts'] ],
+                [ Channel(*x) for x in dat['chans'] ],
+                [ Instrument(*x) for x in dat['inst'] ] )
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning('ignoring unreadable catalog cache %s: %s', self.path, e)
+
+    def save(self, fonts, chans, inst):
+        dat = { 'version': CACHE_VERSION, 'synth': self.synth, 'key': font_key(fonts),
+            'fonts': [ list(x) for x in fonts ],
+            'chans': [ list(x) for x in chans ],
+            'inst':  [ list(x) for x in inst ] }
+        tmp = f'{self.path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, 'w') as fh:
+                json.dump(dat, fh, separators=(',',':'))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning('unable to write catalog cache %s: %s', self.path, e)
@@ -1,9 +1,37 @@
 # coding: utf-8
 
+import argparse
 from pcf.app import PCFApp
+from pcf.scheduler import SWITCH_INTERVAL
 
-def run():
-    PCFApp().main()
+def run(args=None):
+    parser = argparse.ArgumentParser(prog='pcf', description='urwid based interface for fluidsynth')
+    parser.add_argument('--host', default=PCFApp.host, help='fluidsynth shell host (%(default)s)')
+    parser.add_argument('--port', default=PCFApp.port, type=int, help='fluidsynth shell port (%(default)s)')
+    parser.add_argument('--pool', default=PCFApp.pool_size, type=int,
+        help='shell connections for catalog queries, <2 means just the one (%(default)s)')
+    parser.add_argument('--no-cache', action='store_true', help="don't keep the instrument catalog on disk")
+    parser.add_argument('--no-replay', action='store_true',
+        help="don't restore channel assignments when the synth restarts")
+    parser.add_argument('--midi-select', action='store_true',
+        help='select instruments with bank/program changes on the pcf.select MIDI port when possible')
+    parser.add_argument('--clock-out', action='store_true',
+        help='send MIDI clock (and start/stop) with the metronome on the pcf.metronome port')
+    parser.add_argument('--clock-in', metavar='PORT', nargs='?', const='',
+        help='step the metronome with incoming MIDI clock from PORT (a name match; no name: a pcf.clock-in port)')
+    parser.add_argument('--rt-metronome', action='store_true',
+        help='run the metronome in its own (real-time scheduled, if allowed) process')
+    parser.add_argument('--rt-cpu', type=int, metavar='N', help='pin the --rt-metronome process to cpu N')
+    parser.add_argument('--switch-interval', metavar='SECONDS', type=float, nargs='?', const=SWITCH_INTERVAL,
+        help='hand the GIL to the metronome thread at least this often (%(const)s with no value; '
+            "python's default is 0.005) while the in-process metronome runs; put back when it stops")
+    args = parser.parse_args(args)
+
+    PCFApp.host, PCFApp.port, PCFApp.pool_size = args.host, args.port, args.pool
+    PCFApp(cache=not args.no_cache, replay=not args.no_replay, midi_select=args.midi_select,
+        clock_out=args.clock_out, clock_in=args.clock_in,
+        metronome_process=args.rt_metronome and args.clock_in is None, rt_cpu=args.rt_cpu,
+        switch_interval=args.switch_interval).main()
 
 if __name__ == '__main__':
     run()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import asyncio
+import logging
+
+log = logging.getLogger('pcf.controls')
+
+FLUSH_RATE = 30 # batches per second, at most
+
+class Control:
+    ''' a continuous synth setting: a shell command template and a clamped
+        value, one per channel for per-channel controls (chan=None otherwise)
+
+            gain = Control('gain', 'gain {value}', 0, 5, 0.05, 0.2)
+            gain.nudge(+1)  # → 0.25
+            gain.command()  # → 'gain 0.25'
+
+        setting is the synth setting the control starts from, if it has one
+        (see read_settings()); value is only a fallback for that.
+    '''
+
+    def __init__(self, name, cmd, lo, hi, step, value, fmt='{:0.2f}', setting=None):
+        self.name = name
+        self.cmd = cmd
+        self.lo, self.hi, self.step = lo, hi, step
+        self.default = value
+        self.fmt = fmt
+        self.setting = setting
+        self.values = dict()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}[{self.name}]'
+
+    def get(self, chan=None):
+        return self.values.get(chan, self.default)
+
+    def clamp(self, v):
+        v = max(self.lo, min(self.hi, v))
+        if isinstance(self.step, int):
+            v = int(v)
+        return v
+
+    def nudge(self, steps, chan=None):
+        v = self.clamp(self.get(chan) + steps * self.step)
+        self.values[chan] = v
+        return v
+
+    def set_current(self, lines):
+        ''' start from what the synth said (the answer to 'get setting');
+            returns the value, or None (and keeps the default) if it didn't
+            say a number
+        '''
+        for line in lines:
+            try:
+                v = float(line.strip())
+            except ValueError:
+                continue
+            self.default = self.clamp(v)
+            return self.default
+        log.debug('no value for %s in %s', self.setting, lines)
+
+    def show(self, chan=None):
+        return self.fmt.format(self.get(chan))
+
+    def command(self, chan=None):
+        return self.cmd.format(chan=chan, value=self.show(chan))
+
+def default_controls():
+    ''' name → Control, fresh ones (they hold the values); cc values are 0…127 '''
+    return { c.name: c for c in (
+        Control('gain',       'gain {value}',          0.0, 5.0,  0.05, 0.2, setting='synth.gain'),
+        Control('reverb',     'rev_setlevel {value}',  0.0, 1.0,  0.05, 0.9, setting='synth.reverb.level'),
+        Control('chorus',     'cho_set_level {value}', 0.0, 10.0, 0.1,  2.0, fmt='{:0.1f}',
+            setting='synth.chorus.level'),
+        Control('volume',     'cc {chan} 7 {value}',   0,   127,  2,    100, fmt='{}'),
+        Control('pan',        'cc {chan} 10 {value}',  0,   127,  2,    64,  fmt='{}'),
+        Control('expression', 'cc {chan} 11 {value}',  0,   127,  2,    127, fmt='{}'),
+    ) }
+
+async def read_settings(afso, controls):
+    ''' ask the synth (an AsyncFluidSynth) for the current value of every
+        control with a setting, in one batch, and start them from there;
+        values already nudged stay as they are
+    '''
+    cs = [ c for c in controls.values() if c.setting ]
+    if not cs:
+        return
+    answers = await afso.batch(*( f'get {c.setting}' for c in cs ))
+    for c,lines in zip(cs, answers):
+        c.set_current(lines)
+
+class Coalescer:
+    ''' collect settings changes and write them out in batches, at most
+        rate batches a second, keeping only the latest command per key
+
+        A burst of set()s (a held-down key) costs one batch per flush
+        interval no matter how many changes it made, and set() itself never
+        waits on the socket. A batch isn't started while the previous one is
+        still in flight, so a slow synth gets fewer, fresher batches instead
+        of a queue.
+
+            co = Coalescer(afso.batch)
+            co.set(('cc', 3, 7), 'cc 3 7 90')
+    '''
+
+    def __init__(self, send, rate=FLUSH_RATE, loop=None):
+        self.send = send # coroutine function taking *cmds
+        self.interval = 1.0 / rate
+        self.loop = loop
+        self.pending = dict()
+        self.last_flush = None
+        self._handle = self._task = None
+        self.batches = 0
+
+    def _loop(self):
+        return self.loop or asyncio.get_event_loop()
+
+    def set(self, key, cmd):
+        self.pending.pop(key, None) # re-insert: batch order follows the latest change
+        self.pending[key] = cmd
+        self._schedule()
+
+    def _schedule(self):
+        if self._handle is not None or not self.pending:
+            return
+        if self._task is not None and not self._task.done():
+            return # _sent() will reschedule
+        loop = self._loop()
+        now = loop.time()
+        when = now if self.last_flush is None else max(now, self.last_flush + self.interval)
+        self._handle = loop.call_at(when, self.flush)
+
+    def flush(self):
+        ''' start sending whatever is pending now; returns the task (or None) '''
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if not self.pending:
+            return
+        cmds = list(self.pending.values())
+        self.pending.clear()
+        loop = self._loop()
+        self.last_flush = loop.time()
+        self.batches += 1
+        self._task = loop.create_task(self.send(*cmds))
+        self._task.add_done_callback(self._sent)
+        return self._task
+
+    def _sent(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            log.warning('settings batch failed: %s', task.exception())
+        self._schedule()
+
+    async def drain(self):
+        ''' wait until everything set() so far has been sent '''
+        while self.pending or (self._task is not None and not self._task.done()):
+            if self._task is not None and not self._task.done():
+                await asyncio.gather(self._task, return_exceptions=True)
+            elif self.pending and self._handle is None:
+                self._schedule()
+            else:
+                await asyncio.sleep(self.interval / 2)
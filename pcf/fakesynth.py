@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+''' a stand-in for the fluidsynth shell server, for tests, benchmarks and
+    poking at the UI without a synth:
+
+        python -m pcf.fakesynth --port 9800 --fonts 3 --presets 10000 --latency 0.002
+'''
+
+import time
+import socket
+import socketserver
+import threading
+import logging
+import argparse
+
+log = logging.getLogger('pcf.fakesynth')
+
+class FakeCatalog:
+    ''' fonts: [ (id, path) ]; inst: { font_id: [ (bank, prog, name) ] } '''
+
+    def __init__(self, fonts, inst):
+        self.fonts = [ (int(i), p) for i,p in fonts ]
+        self.inst = { int(f): [ (int(b), int(p), n) for b,p,n in l ] for f,l in inst.items() }
+        self.names = { (f,b,p): n for f,l in self.inst.items() for b,p,n in l }
+
+    @classmethod
+    def synthetic(cls, fonts=3, presets=128):
+        ''' fonts with presets each, numbered the way GM banks are (128 per bank) '''
+        fl, inst = list(), dict()
+        for f in range(1, fonts+1):
+            fl.append( (f, f'/usr/share/soundfonts/synthetic-{f}.sf2') )
+            inst[f] = [ (i // 128, i % 128, f'Synthetic {f}.{i}') for i in range(presets) ]
+        return cls(fl, inst)
+
+    def default_channels(self):
+        f = self.fonts[0][0] if self.fonts else 1
+        b,p,_ = self.inst[f][0] if self.inst.get(f) else (0,0,None)
+        return { c: (f,b,p) for c in range(16) }
+
+# what 'get' answers until something 'set's it
+DEFAULT_CONFIG = {
+    'synth.gain': 0.2,
+    'synth.reverb.level': 0.9,
+    'synth.chorus.level': 2.0,
+    'synth.midi-channels': 16,
+}
+
+class FakeShellHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.clients.add(self.connection)
+
+    def finish(self):
+        self.server.clients.discard(self.connection)
+        super().finish()
+
+    def write(self, txt):
+        srv = self.server
+        data = txt.encode(srv.encoding)
+        if not srv.chunk_size:
+            self.wfile.write(data)
+            return
+        for i in range(0, len(data), srv.chunk_size):
+            self.wfile.write(data[i:i+srv.chunk_size])
+            self.wfile.flush()
+            if srv.chunk_delay:
+                time.sleep(srv.chunk_delay)
+
+    def handle(self):
+        srv = self.server
+        self.write(srv.prompt)
+        for line in self.rfile:
+            line = line.decode().strip()
+            if not line:
+                continue
+            srv.received.append(line)
+            if srv.latency:
+                time.sleep(srv.latency)
+            out = ''.join( f'{x}\n' for x in srv.respond(line) )
+            self.write(out + srv.prompt)
+
+class FakeShellServer(socketserver.ThreadingTCPServer):
+    ''' the fluidsynth shell, as far as pcf cares: fonts, channels -verbose,
+        inst, select, get/set (of .config), echo, help and the prompt; anything
+        else that looks like a setting (gain, cc, rev_*, cho_*, …) is
+        accepted silently
+
+            srv = FakeShellServer(catalog=FakeCatalog.synthetic(3, 10000), latency=0.001)
+            srv.start()
+            fs = FluidSynth(port=srv.port, host='127.0.0.1')
+            ...
+            srv.stop()
+
+        latency is slept once per command; chunk_size/chunk_delay break every
+        response up into separately flushed pieces. encoding is what the
+        replies go out as (fluidsynth just passes preset names through, so
+        older fonts come back in latin-1).
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+    quiet = ( 'gain', 'cc', 'prog', 'reset', 'noteoff', 'noteon',
+        'rev_setroomsize', 'rev_setdamp', 'rev_setwidth', 'rev_setlevel', 'reverb',
+        'cho_set_nr', 'cho_set_level', 'cho_set_speed', 'cho_set_depth', 'chorus' )
+
+    def __init__(self, host='127.0.0.1', port=0, catalog=None, prompt='fs> ',
+            latency=0, chunk_size=0, chunk_delay=0, encoding='utf-8'):
+        super().__init__((host, port), FakeShellHandler)
+        self.catalog = catalog or FakeCatalog.synthetic(2, 8)
+        self.prompt = prompt
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.encoding = encoding
+        self.received = list()
+        self.settings = dict()
+        self.config = dict(DEFAULT_CONFIG)
+        self.clients = set()
+        self._thread = None
+        self.reset()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def reset(self):
+        self.chans = self.catalog.default_channels()
+
+    def restart(self):
+        ''' act like systemd restarted fluidsynth: everyone gets hung up on
+            and the channels are back to their defaults
+        '''
+        for conn in list(self.clients):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.reset()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *a):
+        self.stop()
+
+    def name_of(self, f, b, p):
+        return self.catalog.names.get( (f,b,p), '???' )
+
+    def respond(self, line):
+        cmd, *args = line.split()
+        if cmd == 'echo':
+            return [ ' '.join(args) ]
+        if cmd == 'help':
+            # like the real one: sections set apart by blank lines
+            return [ 'Help topics:', '', 'help all', 'help fonts', '' ]
+        if cmd == 'fonts':
+            return [ 'ID  Name' ] + [ f'{i:>3d}  {p}' for i,p in self.catalog.fonts ]
+        if cmd == 'inst':
+            try:
+                f = int(args[0])
+            except (IndexError, ValueError):
+                return [ 'inst: invalid font number' ]
+            return [ f'{b:03d}-{p:03d} {n}' for b,p,n in self.catalog.inst.get(f, ()) ]
+        if cmd == 'channels':
+            if '-verbose' in args:
+                return [ f'chan {c}, sfont {f}, bank {b}, preset {p}, {self.name_of(f,b,p)}'
+                    for c,(f,b,p) in sorted(self.chans.items()) ]
+            return [ f'chan {c}, {self.name_of(*fbp)}' for c,fbp in sorted(self.chans.items()) ]
+        if cmd == 'select':
+            try:
+                c,f,b,p = ( int(x) for x in args )
+            except ValueError:
+                return [ 'select: invalid argument' ]
+            if (f,b,p) not in self.catalog.names:
+                return [ 'preset not found' ]
+            self.chans[c] = (f,b,p)
+            return []
+        if cmd == 'get':
+            v = self.config.get(args[0]) if args else None
+            if v is None:
+                return [ f"get: no such setting '{' '.join(args)}'." ]
+            return [ f'{v:.3f}' if isinstance(v, float) else str(v) ]
+        if cmd == 'set':
+            if len(args) != 2 or args[0] not in self.config:
+                return [ 'set: no such setting' ]
+            self.config[args[0]] = type(self.config[args[0]])(args[1])
+            return []
+        if cmd in self.quiet:
+            self.settings[ (cmd,) + tuple(args[:-1]) ] = args[-1] if args else None
+            return []
+        return [ f'Unknown command: {cmd}' ]
+
+def run(args=None):
+    parser = argparse.ArgumentParser(prog='pcf.fakesynth', description='fake fluidsynth shell server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', default=9800, type=int)
+    parser.add_argument('--fonts', default=3, type=int)
+    parser.add_argument('--presets', default=256, type=int, help='presets per font')
+    parser.add_argument('--latency', default=0, type=float, help='seconds per command')
+    parser.add_argument('--chunk-size', default=0, type=int)
+    parser.add_argument('--chunk-delay', default=0, type=float)
+    args = parser.parse_args(args)
+
+    srv = FakeShellServer(args.host, args.port, FakeCatalog.synthetic(args.fonts, args.presets),
+        latency=args.latency, chunk_size=args.chunk_size, chunk_delay=args.chunk_delay)
+    print(f'fake fluidsynth shell on {args.host}:{srv.port}')
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+
+if __name__ == '__main__':
+    run()
@@ -1,113 +1,783 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import time
 import logging
+import asyncio
+import inspect
 import socket
 import select
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from .misc import HandyMatch
+from .misc import LineSchema, Record
 
 # I use -o 'shell.prompt=fs> ' in my fluidsynth so when I 'nc localhost 9800' I
 # can see when I start typing.
 MY_PROMPT = re.compile(r'^[^>]*>\s*')
-LINE_SPLIT = re.compile(r'[\x0d\x0a]+')
+LINE_SPLIT = re.compile(rb'[\x0d\x0a]+')
 CHUNK_SIZE = 1024*8
 TIMEOUT = 0.1
 
-class FluidSynth:
-    _socket = None
-    log = logging.getLogger('FluidSynth')
+def _font_name(gd):
+    name = gd['path'].split('/')[-1]
+    if name.endswith('.sf2'):
+        name = name[:-4]
+    return name
+
+# response formats of 'fonts', 'channels -verbose' and 'inst N'
+FONTS = LineSchema('Font', r'^[ \t]*(?P<id>\d+)[ \t]+(?P<path>\S+)',
+    fields=('id', 'name', 'path'), derive={'name': _font_name})
+CHANNELS = LineSchema('Channel', r'^chan[ \t]+(?P<chan>\d+),[ \t]+sfont[ \t]+(?P<font>\d+),'
+    r'[ \t]+bank[ \t]+(?P<bank>\d+),[ \t]+preset[ \t]+(?P<prog>\d+),[ \t]+(?P<name>.+?)$',
+    fields=('chan', 'name', 'font', 'bank', 'prog'))
+INSTRUMENTS = LineSchema('Instrument', r'^[ \t]*0*(?P<bank>\d+)-0*(?P<prog>\d+)[ \t]+(?P<name>.+?)[ \t]*$',
+    fields=('name', 'font', 'bank', 'prog'))
+
+# When framing is on, every send() is followed by an 'echo' of a serial-numbered
+# marker; reading stops as soon as the marker comes back instead of waiting for
+# TIMEOUT worth of silence. FRAME_TIMEOUT is only the give-up point for a
+# marker that never shows.
+EOR_MARKER = 'pcf-eor'
+EOR_RE = re.compile(rf'^{EOR_MARKER}-\d+$')
+FRAME_TIMEOUT = 5.0
+
+# fluidsynth.service runs with Restart=always; when the shell goes away we
+# reconnect with a doubling delay, starting small so the rig comes back within
+# a fraction of a second of the synth. The blocking client gives up after
+# RECONNECT_TRIES, the async one keeps trying in the background.
+RECONNECT_DELAY = 0.05
+RECONNECT_MAX_DELAY = 1.0
+RECONNECT_TRIES = 8
+
+class LineFramer:
+    ''' turn a byte stream into lines without rebuilding strings
+
+        Bytes land in a reusable bytearray via recv_into(); line breaks are found
+        with a regex over the buffer itself (from where the last search left
+        off) and each line is decoded straight out of a memoryview. Whatever
+        follows the last line break stays put until more data comes in, and
+        is moved to the front only when the buffer runs out of room. A line
+        is only decoded once it's complete, so multi-byte characters split
+        across recv()s come out whole.
+
+            lf = LineFramer()
+            while lf.fill(sock):
+                for line in lf.lines():
+                    ...
+    '''
+
+    def __init__(self, size=CHUNK_SIZE, encoding='utf-8', errors='replace'):
+        self.buf = bytearray(size)
+        self.encoding = encoding
+        self.errors = errors
+        self.consumed = 0 # bytes handed out as lines (or flushed), ever
+        self.clear()
+
+    def clear(self):
+        # buf[start:end] is unconsumed; there's no line break in buf[start:scan]
+        self.start = self.scan = self.end = 0
+        self.skip_eol = False
+
+    def __len__(self):
+        return self.end - self.start
+
+    def _make_room(self, want=1):
+        if self.start == self.end:
+            self.start = self.scan = self.end = 0
+        while len(self.buf) - self.end < want:
+            if self.start:
+                n = self.end - self.start
+                with memoryview(self.buf) as mv:
+                    mv[0:n] = mv[self.start:self.end]
+                self.scan -= self.start
+                self.start, self.end = 0, n
+            else:
+                # one line bigger than the whole buffer
+                self.buf.extend(bytes(len(self.buf)))
+
+    def fill(self, sock):
+        ''' one recv_into() from sock; returns the byte count (0 means EOF) '''
+        self._make_room()
+        with memoryview(self.buf) as mv:
+            n = sock.recv_into(mv[self.end:])
+        self.end += n
+        return n
+
+    def feed(self, data):
+        ''' same as fill() but from bytes we already have '''
+        self._make_room(len(data))
+        self.buf[self.end:self.end+len(data)] = data
+        self.end += len(data)
+
+    def _decode(self, a, b):
+        with memoryview(self.buf) as mv:
+            return str(mv[a:b], self.encoding, self.errors)
+
+    def lines(self):
+        ''' yield every complete line in the buffer (consumed as it goes) '''
+        while True:
+            a = self.start
+            if self.skip_eol and self.start < self.end:
+                # the last fill() ended right after a line break, and runs of
+                # line breaks count as one
+                while self.start < self.end and self.buf[self.start] in (0x0a, 0x0d):
+                    self.start += 1
+                self.skip_eol = self.start == self.end
+                self.scan = max(self.scan, self.start)
+            m = LINE_SPLIT.search(self.buf, self.scan, self.end)
+            if m is None:
+                self.scan = self.end
+                return
+            line = self._decode(self.start, m.start())
+            self.start = self.scan = m.end()
+            self.consumed += self.start - a
+            self.skip_eol = self.start == self.end
+            yield line
+
+    def flush(self):
+        ''' whatever is left (no line break yet), decoded; empties the buffer '''
+        rest = self._decode(self.start, self.end)
+        self.consumed += self.end - self.start
+        self.clear()
+        return rest
+
+class FluidShell:
+    ''' the parts of a fluidsynth shell client that don't care how the bytes
+        move: settings, end-of-response markers, prompt stripping and parsing
+    '''
+    log = logging.getLogger('FluidShell')
 
     def __init__(self, port=9800, host='localhost',
             chunk_size=CHUNK_SIZE, timeout=TIMEOUT,
-            prompt=MY_PROMPT):
+            prompt=MY_PROMPT, framed=True, frame_timeout=FRAME_TIMEOUT,
+            reconnect_tries=RECONNECT_TRIES, stats=None):
         self.port = port
         self.host = host
         self.chunk_size = chunk_size
         self.timeout = timeout
         self.prompt = prompt
+        self.framed = framed
+        self.frame_timeout = frame_timeout
+        self.reconnect_tries = reconnect_tries
+        # a pcf.stats.IOStats (or None): per verb round trips, bytes and lines
+        self.stats = stats
+        # callbacks, called with the client, whenever a connection is made
+        # after the first one (i.e. the synth probably restarted)
+        self.on_reconnect = list()
+        self.connections = 0
+        self._serial = 0
+
+    @staticmethod
+    def backoff(delay=RECONNECT_DELAY, max_delay=RECONNECT_MAX_DELAY):
+        yield 0
+        while True:
+            yield delay
+            delay = min(max_delay, delay * 2)
+
+    def _connected(self):
+        ''' count the new connection; True means it's a reconnect '''
+        self.connections += 1
+        if self.connections > 1:
+            self.log.info('reconnected to %s:%s', self.host, self.port)
+            return True
+        return False
+
+    def _record(self, cmds, t0, bytes_out, bytes_in, lines):
+        if self.stats is not None and cmds:
+            self.stats.record(cmds[0], time.perf_counter() - t0, bytes_out, bytes_in, len(lines))
+
+    def next_marker(self):
+        self._serial += 1
+        return f'{EOR_MARKER}-{self._serial}'
+
+    def _post_read(self, part):
+        if self.prompt:
+            m = self.prompt.match(part)
+            if m and m.group():
+                # commands without output (e.g. select) leave their prompts
+                # stacked up in front of the next line: 'fs> fs> …'
+                p = m.group()
+                part = part[len(p):]
+                while part.startswith(p):
+                    part = part[len(p):]
+        return part
+
+    @staticmethod
+    def select_cmd(font=None, bank=None, prog=None, chan=0):
+        if isinstance(font, (tuple, Record)):
+            font,bank,prog = font.font, font.bank, font.prog
+        return f'select {chan} {font} {bank} {prog}'
+
+    @staticmethod
+    def parse_fonts(lines):
+        return sorted(FONTS.parse(lines), key=lambda x: int(x.id))
+
+    @staticmethod
+    def parse_channels(lines):
+        return CHANNELS.parse(lines)
+
+    @staticmethod
+    def parse_instruments(font_id, lines):
+        return INSTRUMENTS.parse(lines, font=font_id)
+
+    @staticmethod
+    def sort_instruments(inst):
+        return sorted(inst, key=lambda x: (int(x.font), int(x.bank), int(x.prog)))
+
+class FluidSynth(FluidShell):
+    _socket = None
+    log = logging.getLogger('FluidSynth')
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._framer = LineFramer(self.chunk_size)
+
+    def connect(self):
+        err = None
+        for i,delay in zip(range(max(1, self.reconnect_tries)), self.backoff()):
+            time.sleep(delay)
+            try:
+                sock = socket.create_connection( (self.host, self.port) )
+            except OSError as e:
+                self.log.debug('connect to %s:%s failed: %s', self.host, self.port, e)
+                err = e
+                continue
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._socket = sock
+            self._framer.clear()
+            if self._connected():
+                for cb in self.on_reconnect:
+                    cb(self)
+            return sock
+        raise err
+
+    def close(self):
+        if self._socket:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+        self._socket = None
+        self._framer.clear()
 
     @property
     def shell_socket(self):
         if not self._socket:
-            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._socket.connect( (self.host, self.port) )
+            self.connect()
         return self._socket
 
+    def ping(self):
+        ''' health check: True if the shell answers (reconnecting if needed) '''
+        try:
+            return self.send('echo ping') == ['ping']
+        except OSError as e:
+            self.log.warning('ping failed: %s', e)
+            return False
+
+    def _wait_readable(self, timeout):
+        rl,_,_ = select.select([self.shell_socket], [], [], timeout)
+        return bool(rl)
+
     @property
     def can_read(self):
-        rl,_,_ = select.select([self.shell_socket], [], [], self.timeout)
-        return bool(rl)
+        return self._wait_readable(self.timeout)
+
+    def _fill(self, timeout=None):
+        ''' wait (up to timeout) for data and pull it into the framer; False
+            means nothing came
+        '''
+        if timeout is None:
+            timeout = self.timeout
+        if not self._wait_readable(timeout):
+            return False
+        if not self._framer.fill(self.shell_socket):
+            raise ConnectionResetError('fluidsynth closed the shell connection')
+        return True
 
-    def _raw_read(self):
-        sock = self.shell_socket
-        while self.can_read:
-            buf = sock.recv(self.chunk_size)
-            if buf is None:
+    def read(self, marker=None):
+        ''' yield response lines
+
+            Without a marker, read until the socket has been quiet for
+            self.timeout. With a marker, read until that marker line shows up
+            (or self.frame_timeout passes without any data). Markers from
+            earlier, abandoned reads are dropped on sight.
+        '''
+        timeout = self.timeout if marker is None else self.frame_timeout
+        framer = self._framer
+        while True:
+            for line in framer.lines():
+                line = self._post_read(line)
+                if marker is not None and EOR_RE.match(line):
+                    if line == marker:
+                        return
+                    continue
+                yield line
+            if not self._fill(timeout):
                 break
-            yield buf
+        if marker is not None:
+            self.log.warning('gave up waiting for %s after %0.1fs', marker, timeout)
+        rest = framer.flush()
+        if rest:
+            rest = self._post_read(rest.rstrip())
+            if rest:
+                yield rest
 
-    def _post_read(self, part):
-        if self.prompt:
-            return self.prompt.sub('', part)
-        return part
+    def _exchange(self, groups):
+        ''' write each group of commands followed by its own marker, all in
+            one go, and read back one list of lines per group
 
-    def read(self):
-        buf = ''
-        for chunk in self._raw_read():
-            buf += chunk.decode()
-            while True:
-                bs = LINE_SPLIT.split(buf, 1)
-                if len(bs) == 1:
-                    break
-                buf = bs[1]
-                yield self._post_read(bs[0])
-        if buf:
-            buf = self._post_read(buf.rstrip())
-            if buf:
-                yield buf
+            If the connection turns out to be dead (synth restarted), reconnect
+            and try the whole exchange once more. Everything we send is a
+            query or a select, so repeating it is harmless.
+        '''
+        groups = [ tuple(cmds) for cmds in groups ]
+        out, markers = list(), list()
+        for cmds in groups:
+            marker = self.next_marker()
+            markers.append(marker)
+            out.extend( cmd.rstrip() for cmd in cmds )
+            out.append(f'echo {marker}')
+        self.log.debug('exchange(%s)', out)
+        payload = (('\n'.join(out)) + '\n').encode()
+        for attempt in range(2):
+            sock = self.shell_socket # connect() does its own retrying
+            try:
+                t0 = time.perf_counter()
+                sock.sendall(payload)
+                ret = list()
+                for cmds,marker in zip(groups, markers):
+                    rx = self._framer.consumed
+                    ret.append( list(self.read(marker)) )
+                    if self.stats is not None:
+                        # round trip from the write, so later commands in a
+                        # batch include the ones queued ahead of them
+                        tx = sum( len(c.encode()) + 1 for c in cmds ) + len(marker) + 6
+                        self._record(cmds, t0, tx, self._framer.consumed - rx, ret[-1])
+                return ret
+            except OSError as e:
+                self.close()
+                if attempt:
+                    raise
+                self.log.warning('shell connection lost (%s), reconnecting', e)
 
     def send(self, *cmds):
+        if self.framed:
+            # framed reads are drained right away so a caller that ignores the
+            # result (e.g. select()) doesn't leave its reply for the next send()
+            (lines,) = self._exchange( (cmds,) )
+            return lines
         cmds = [ cmd.rstrip() for cmd in cmds ]
         self.log.debug('send(%s)', cmds)
-        self.shell_socket.send( (('\n'.join(cmds)) + '\n').encode() )
-        return self.read()
+        payload = (('\n'.join(cmds)) + '\n').encode()
+        t0 = time.perf_counter()
+        try:
+            self.shell_socket.sendall(payload)
+        except OSError as e:
+            self.log.warning('shell connection lost (%s), reconnecting', e)
+            self.close()
+            self.shell_socket.sendall(payload)
+        if self.stats is None:
+            return self.read()
+        return self._timed_read(cmds, t0, len(payload))
+
+    def _timed_read(self, cmds, t0, bytes_out):
+        ''' read() that records the exchange once it's been drained; the
+            round trip includes the idle timeout that ends an unframed read
+        '''
+        rx = self._framer.consumed
+        lines = list()
+        for line in self.read():
+            lines.append(line)
+            yield line
+        self._record(cmds, t0, bytes_out, self._framer.consumed - rx, lines)
+
+    def batch(self, *cmds):
+        ''' pipeline several commands in one write and return one list of
+            response lines per command, in order
+
+                fonts, chans = fs.batch('fonts', 'channels -verbose')
+
+            Needs framing to tell the responses apart; unframed this falls
+            back to one send() (and one idle timeout) per command.
+        '''
+        if not self.framed:
+            return [ list(self.send(cmd)) for cmd in cmds ]
+        return self._exchange( (cmd,) for cmd in cmds )
 
     @property
     def fonts(self):
-        hm = HandyMatch(r'\s*(?P<id>\d+)\s+(?P<path>\S+)\s*')
-        ret = list()
-        for fl in self.send('fonts'):
-            if hm(fl):
-                name = hm['path']
-                name = name.split('/')[-1]
-                if name.endswith('.sf2'):
-                    name = name[:-4]
-                ret.append(hm.as_ntuple(name=name))
-        return sorted(ret, key=lambda x: int(x.id))
+        return self.parse_fonts(self.send('fonts'))
 
     @property
     def channels(self):
-        hm = HandyMatch(r'^chan\s+(?P<chan>\d+),\s+sfont\s+(?P<font>\d+),'
-            r'\s+bank\s+(?P<bank>\d+),\s+preset\s+(?P<prog>\d+),\s+(?P<name>.+?)$')
-        ret = list()
-        for cl in self.send('channels -verbose'):
-            if hm(cl):
-                ret.append(hm.as_ntuple('chan', 'name', 'font', 'bank','prog'))
-        return ret
+        return self.parse_channels(self.send('channels -verbose'))
 
     def select(self, font=None, bank=None, prog=None, chan=0):
-        if isinstance(font, tuple):
-            font,bank,prog = font.font, font.bank, font.prog
-        self.send(f'select {chan} {font} {bank} {prog}')
+        self.send(self.select_cmd(font, bank, prog, chan=chan))
+
+    def instruments_for(self, fonts):
+        fonts = list(fonts)
+        ret = list()
+        for font,lines in zip(fonts, self.batch(*( f'inst {font.id}' for font in fonts ))):
+            ret.extend(self.parse_instruments(font.id, lines))
+        return self.sort_instruments(ret)
 
     @property
     def instruments(self):
-        hm = HandyMatch(r'^\s*0*(?P<bank>\d+)-0*(?P<prog>\d+)\s+(?P<name>.+?)\s*$')
+        return self.instruments_for(self.fonts)
+
+    def status(self):
+        ''' (fonts, channels) in one exchange '''
+        fl, cl = self.batch('fonts', 'channels -verbose')
+        return self.parse_fonts(fl), self.parse_channels(cl)
+
+    def catalog(self):
+        ''' fetch (fonts, channels, instruments) in two pipelined exchanges:
+            fonts and channels together, then every inst query at once (the
+            inst queries need the font ids from the first exchange)
+        '''
+        fonts, chans = self.status()
+        return fonts, chans, self.instruments_for(fonts)
+
+class AsyncFluidSynth(FluidShell):
+    ''' asyncio flavor of FluidSynth with the same surface, except that
+        everything is awaited (the properties hand back coroutines):
+
+            afs = AsyncFluidSynth()
+            fonts = await afs.fonts
+            await afs.select(1, 0, 0, chan=3)
+
+        Responses are always framed. A single reader task hands lines to
+        whichever request is waiting on the next marker, so any number of
+        tasks can have commands in flight on the one connection.
+    '''
+    log = logging.getLogger('AsyncFluidSynth')
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._reader = self._writer = self._read_task = self._connect_lock = None
+        self._reconnect_task = None
+        self._closing = False
+        self._pending = deque()
+
+    @property
+    def connected(self):
+        return self._writer is not None
+
+    async def _open(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        sock = self._writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._read_task = asyncio.ensure_future(self._read_responses())
+        return self._connected()
+
+    async def connect(self, tries=None):
+        ''' connect (if we aren't already); on a reconnect the on_reconnect
+            callbacks run (and are awaited if they return awaitables) before
+            this returns
+        '''
+        if tries is None:
+            tries = self.reconnect_tries
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        reconnected = False
+        async with self._connect_lock:
+            err = None
+            for i,delay in zip(range(max(1, tries)), self.backoff()):
+                if self._writer is not None:
+                    break
+                await asyncio.sleep(delay)
+                try:
+                    reconnected = await self._open()
+                except OSError as e:
+                    self.log.debug('connect to %s:%s failed: %s', self.host, self.port, e)
+                    err = e
+            if self._writer is None:
+                raise err
+        if reconnected:
+            for cb in self.on_reconnect:
+                r = cb(self)
+                if inspect.isawaitable(r):
+                    await r
+        return self._writer
+
+    async def _reconnect(self):
+        while not self._closing:
+            try:
+                await self.connect(tries=self.reconnect_tries)
+                return
+            except OSError as e:
+                self.log.debug('still no shell: %s', e)
+
+    async def ping(self, timeout=1.0):
+        ''' health check; a shell that doesn't answer in time gets its
+            connection dropped, which starts the reconnect
+        '''
+        try:
+            return await asyncio.wait_for(self.send('echo ping'), timeout) == ['ping']
+        except (OSError, asyncio.TimeoutError) as e:
+            self.log.warning('ping failed: %s', e)
+            if self._writer is not None:
+                self._writer.close()
+            return False
+
+    async def keepalive(self, interval=5.0):
+        while not self._closing:
+            await self.ping()
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        self._closing = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        if self._read_task is not None:
+            await asyncio.gather(self._read_task, return_exceptions=True)
+
+    def _finish(self, marker, lines, nbytes=0):
+        for i,(m,fut) in enumerate(self._pending):
+            if m == marker:
+                break
+        else:
+            return False # stale, nobody is waiting for it anymore
+        for _ in range(i):
+            # markers come back in order, so anything queued ahead of this one
+            # lost its marker somewhere
+            m,fut = self._pending.popleft()
+            if not fut.done():
+                fut.set_exception(ConnectionError(f'{m} never came back'))
+        _,fut = self._pending.popleft()
+        if not fut.done():
+            fut.set_result( (lines, nbytes) )
+        return True
+
+    async def _read_responses(self):
+        lines, nbytes = list(), 0
+        try:
+            while True:
+                raw = await self._reader.readline()
+                if not raw:
+                    break
+                nbytes += len(raw)
+                line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+                if not line:
+                    continue # runs of line breaks count as one, as in LineFramer
+                try:
+                    line = self._post_read(line)
+                    if EOR_RE.match(line):
+                        self._finish(line, lines, nbytes)
+                        lines, nbytes = list(), 0
+                        continue
+                except Exception:
+                    # one bad line mustn't take the reader (and every future
+                    # reply) down with it
+                    self.log.exception('failed to handle %r', line)
+                    continue
+                lines.append(line)
+        except OSError as e:
+            self.log.warning('shell connection lost: %s', e)
+        finally:
+            self.log.debug('shell connection closed')
+            if self._writer is not None:
+                self._writer.close()
+            self._reader = self._writer = None
+            while self._pending:
+                m,fut = self._pending.popleft()
+                if not fut.done():
+                    fut.set_exception(ConnectionResetError(f'connection closed before {m}'))
+            if not self._closing:
+                self._reconnect_task = asyncio.ensure_future(self._reconnect())
+
+    async def _exchange(self, groups):
+        groups = [ tuple(cmds) for cmds in groups ]
+        for attempt in range(2):
+            try:
+                return await self._exchange_once(groups)
+            except ConnectionError as e:
+                if attempt:
+                    raise
+                self.log.warning('shell connection lost (%s), retrying', e)
+
+    async def _exchange_once(self, groups):
+        writer = await self.connect()
+        loop = asyncio.get_running_loop()
+        out, waiting = list(), list()
+        for cmds in groups:
+            marker = self.next_marker()
+            fut = loop.create_future()
+            self._pending.append( (marker, fut) )
+            waiting.append( (cmds, marker, fut) )
+            out.extend( cmd.rstrip() for cmd in cmds )
+            out.append(f'echo {marker}')
+        self.log.debug('exchange(%s)', out)
+        t0 = time.perf_counter()
+        writer.write( (('\n'.join(out)) + '\n').encode() )
+        await writer.drain()
         ret = list()
-        for font in self.fonts:
-            for il in self.send(f'inst {font.id}'):
-                if hm(il):
-                    ret.append(hm.as_ntuple('name', 'font', 'bank', 'prog', font=font.id))
-        return sorted(ret, key=lambda x: (int(x.font), int(x.bank), int(x.prog)))
+        for cmds,marker,fut in waiting:
+            try:
+                lines, nbytes = await asyncio.wait_for(fut, self.frame_timeout)
+                ret.append(lines)
+                if self.stats is not None:
+                    tx = sum( len(c.encode()) + 1 for c in cmds ) + len(marker) + 6
+                    self._record(cmds, t0, tx, nbytes, lines)
+            except asyncio.TimeoutError:
+                self.log.warning('gave up waiting for %s after %0.1fs', marker, self.frame_timeout)
+                ret.append( list() )
+        return ret
+
+    async def send(self, *cmds):
+        (lines,) = await self._exchange( (cmds,) )
+        return lines
+
+    async def batch(self, *cmds):
+        return await self._exchange( (cmd,) for cmd in cmds )
+
+    @property
+    async def fonts(self):
+        return self.parse_fonts(await self.send('fonts'))
+
+    @property
+    async def channels(self):
+        return self.parse_channels(await self.send('channels -verbose'))
+
+    async def select(self, font=None, bank=None, prog=None, chan=0):
+        await self.send(self.select_cmd(font, bank, prog, chan=chan))
+
+    async def instruments_for(self, fonts):
+        fonts = list(fonts)
+        ret = list()
+        for font,lines in zip(fonts, await self.batch(*( f'inst {font.id}' for font in fonts ))):
+            ret.extend(self.parse_instruments(font.id, lines))
+        return self.sort_instruments(ret)
+
+    @property
+    async def instruments(self):
+        return await self.instruments_for(await self.fonts)
+
+    async def status(self):
+        fl, cl = await self.batch('fonts', 'channels -verbose')
+        return self.parse_fonts(fl), self.parse_channels(cl)
+
+    async def catalog(self):
+        fonts, chans = await self.status()
+        return fonts, chans, await self.instruments_for(fonts)
+
+class _ShellPool:
+    ''' the shared part of FluidSynthPool and AsyncFluidSynthPool: commands
+        are dealt out round-robin, one pipelined batch per connection, and the
+        answers put back in the order they were asked
+    '''
+    client_class = None
+
+    def __init__(self, size=3, **kw):
+        self.clients = [ self.client_class(**kw) for _ in range(max(1, size)) ]
+
+    def __repr__(self):
+        c = self.clients[0]
+        return f'{self.__class__.__name__}[{len(self.clients)}× {c.host}:{c.port}]'
+
+    def _deal(self, cmds):
+        hands = [ list() for _ in self.clients ]
+        for i,cmd in enumerate(cmds):
+            hands[ i % len(hands) ].append(cmd)
+        return [ (c,h) for c,h in zip(self.clients, hands) if h ]
+
+    @staticmethod
+    def _merge(n, answers):
+        ret = [None] * n
+        for j,lines_list in enumerate(answers):
+            for k,lines in enumerate(lines_list):
+                ret[ j + k * len(answers) ] = lines
+        return ret
+
+    def _inst_cmds(self, fonts):
+        return [ f'inst {font.id}' for font in fonts ]
+
+    @staticmethod
+    def _parse_inst(fonts, answers):
+        ret = list()
+        for font,lines in zip(fonts, answers):
+            ret.extend(FluidShell.parse_instruments(font.id, lines))
+        return FluidShell.sort_instruments(ret)
+
+class FluidSynthPool(_ShellPool):
+    ''' a few FluidSynth connections to the same server; batch() runs its
+        commands on all of them at once, so N slow queries (one 'inst' per
+        font, say) take about as long as the slowest one
+
+            pool = FluidSynthPool(3)
+            fonts, chans, inst = pool.catalog()
+    '''
+    client_class = FluidSynth
+
+    def __init__(self, size=3, **kw):
+        super().__init__(size, **kw)
+        self.executor = ThreadPoolExecutor(len(self.clients), thread_name_prefix='FluidSynthPool')
+
+    def close(self):
+        for c in self.clients:
+            c.close()
+        self.executor.shutdown(wait=False)
+
+    def batch(self, *cmds):
+        hands = self._deal(cmds)
+        futures = [ self.executor.submit(c.batch, *h) for c,h in hands ]
+        return self._merge(len(cmds), [ f.result() for f in futures ])
+
+    def send(self, *cmds):
+        return self.clients[0].send(*cmds)
+
+    def select(self, *a, **kw):
+        return self.clients[0].select(*a, **kw)
+
+    def instruments_for(self, fonts):
+        fonts = list(fonts)
+        return self._parse_inst(fonts, self.batch(*self._inst_cmds(fonts)))
+
+    def status(self):
+        return self.clients[0].status()
+
+    def catalog(self):
+        ''' fonts first (everything else needs the ids), then channels and
+            every inst query side by side
+        '''
+        fonts = FluidShell.parse_fonts(self.clients[0].send('fonts'))
+        cl, *il = self.batch('channels -verbose', *self._inst_cmds(fonts))
+        return fonts, FluidShell.parse_channels(cl), self._parse_inst(fonts, il)
+
+class AsyncFluidSynthPool(_ShellPool):
+    ''' FluidSynthPool for asyncio: the same fan-out over AsyncFluidSynth
+        connections, gathered instead of threaded
+    '''
+    client_class = AsyncFluidSynth
+
+    async def close(self):
+        await asyncio.gather(*( c.close() for c in self.clients ))
+
+    async def batch(self, *cmds):
+        hands = self._deal(cmds)
+        answers = await asyncio.gather(*( c.batch(*h) for c,h in hands ))
+        return self._merge(len(cmds), answers)
+
+    async def send(self, *cmds):
+        return await self.clients[0].send(*cmds)
+
+    async def select(self, *a, **kw):
+        return await self.clients[0].select(*a, **kw)
+
+    async def instruments_for(self, fonts):
+        fonts = list(fonts)
+        return self._parse_inst(fonts, await self.batch(*self._inst_cmds(fonts)))
+
+    async def status(self):
+        return await self.clients[0].status()
+
+    async def catalog(self):
+        fonts = FluidShell.parse_fonts(await self.clients[0].send('fonts'))
+        cl, *il = await self.batch('channels -verbose', *self._inst_cmds(fonts))
+        return fonts, FluidShell.parse_channels(cl), self._parse_inst(fonts, il)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+''' how steady is the click, really
+
+        python -m pcf.jitter --bpm 120 --beats 64
+        python -m pcf.jitter --bpm 240 --beats 200 --load --loopback
+        python -m pcf.jitter --load --switch-interval   # as pcf --switch-interval runs
+
+    Every message the metronome sends goes through a Probe that notes when
+    it went out; with --loopback a MidiIn on the metronome's port notes when
+    it came back. The beats are compared against the ideal grid for the
+    tempo, anchored at the first beat.
+'''
+
+import time
+import logging
+import argparse
+import threading
+
+from pcf.scheduler import SWITCH_INTERVAL, default_scheduler
+
+log = logging.getLogger('pcf.jitter')
+
+NS_PER_MS = 1e6
+
+class _Events:
+    def __init__(self):
+        self.events = list() # (monotonic_ns, message); list.append is thread safe
+
+    def clear(self):
+        self.events = list()
+
+    def beat_times(self, window_ns=2_000_000):
+        ''' note-on times, one per beat: notes closer than window_ns to the
+            first one of their beat are the same beat (a chord)
+        '''
+        ret = list()
+        for t,msg in self.events:
+            if len(msg) < 3 or msg[0] & 0xf0 != 0x90 or not msg[2]:
+                continue
+            if not ret or t - ret[-1] > window_ns:
+                ret.append(t)
+        return ret
+
+class Probe(_Events):
+    ''' stands in for a midiout: timestamps every message, then passes it
+        on (if there's anything to pass it to)
+
+            m.midiout = probe = Probe(m.midiout)
+    '''
+
+    def __init__(self, midiout=None):
+        super().__init__()
+        self.midiout = midiout
+
+    def send_message(self, msg):
+        self.events.append( (time.monotonic_ns(), msg) )
+        if self.midiout is not None:
+            self.midiout.send_message(msg)
+
+class Loopback(_Events):
+    ''' a MidiIn listening to the port under test (by name), so the times
+        include the trip through the MIDI stack
+    '''
+
+    def __init__(self, port='pcf.metronome', midiin=None):
+        super().__init__()
+        if midiin is None:
+            import rtmidi
+            midiin = rtmidi.MidiIn()
+        for i,name in enumerate(midiin.get_ports()):
+            if port in name:
+                midiin.open_port(i)
+                break
+        else:
+            raise ValueError(f'no MIDI port matching {port!r}')
+        midiin.set_callback(self._received)
+        self.midiin = midiin
+
+    def _received(self, event, data=None):
+        msg, _delta = event
+        self.events.append( (time.monotonic_ns(), msg) )
+
+    def close(self):
+        self.midiin.close_port()
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[ min(len(sorted_values) - 1, int(p / 100.0 * len(sorted_values))) ]
+
+def analyze(times_ns, beats_per_minute):
+    ''' beat times vs. the grid: mean/p99/max of the absolute error (ms)
+        and drift (ms over the run, from a least squares fit of error vs.
+        beat number); steps without notes are just missing grid points
+    '''
+    period = 60e9 / beats_per_minute
+    if len(times_ns) < 2:
+        return { 'beats': len(times_ns) }
+    t0 = times_ns[0]
+    ks = [ round((t - t0) / period) for t in times_ns ]
+    errs = [ (t - t0 - k * period) / NS_PER_MS for t,k in zip(times_ns, ks) ]
+    n = len(errs)
+    mk, me = sum(ks) / n, sum(errs) / n
+    var = sum( (k - mk) ** 2 for k in ks )
+    slope = sum( (k - mk) * (e - me) for k,e in zip(ks, errs) ) / var if var else 0.0
+    abs_errs = sorted( abs(e) for e in errs )
+    run_minutes = (ks[-1] - ks[0]) / beats_per_minute
+    return {
+        'beats': n,
+        'bpm': beats_per_minute,
+        'mean_ms': sum(abs_errs) / n,
+        'p99_ms': _percentile(abs_errs, 99),
+        'max_ms': abs_errs[-1],
+        'drift_ms': slope * (ks[-1] - ks[0]),
+        'drift_ms_per_min': slope * beats_per_minute if run_minutes else 0.0,
+    }
+
+def format_report(name, r):
+    if r.get('beats', 0) < 2:
+        return f'{name}: not enough beats ({r.get("beats", 0)})'
+    return (f"{name}: {r['beats']} beats @{r['bpm']} bpm  mean {r['mean_ms']:0.3f} ms"
+        f"  p99 {r['p99_ms']:0.3f} ms  max {r['max_ms']:0.3f} ms  drift {r['drift_ms']:+0.3f} ms")
+
+def busy_reload(stop, fonts=3, presets=3000):
+    ''' keep a fake synth busy handing over its catalog, about what 'r' costs '''
+    from pcf.fakesynth import FakeShellServer, FakeCatalog
+    from pcf.fluidsynth import FluidSynth
+    with FakeShellServer(catalog=FakeCatalog.synthetic(fonts, presets)) as srv:
+        fs = FluidSynth(port=srv.port, host='127.0.0.1')
+        while not stop.is_set():
+            fs.catalog()
+        fs.close()
+
+def run(args=None):
+    parser = argparse.ArgumentParser(prog='pcf.jitter', description='measure metronome timing')
+    parser.add_argument('--bpm', default=120, type=int)
+    parser.add_argument('--beats', default=64, type=int)
+    parser.add_argument('--load', action='store_true', help='fetch a big catalog in a loop meanwhile')
+    parser.add_argument('--loopback', action='store_true', help='also listen on the metronome port')
+    parser.add_argument('--switch-interval', metavar='SECONDS', type=float, nargs='?', const=SWITCH_INTERVAL,
+        help='lower the GIL switch interval while the click runs (%(const)s with no value)')
+    args = parser.parse_args(args)
+
+    from pcf.metronome import Metronome
+    default_scheduler().switch_interval = args.switch_interval
+    m = Metronome(((60,100),), channel=9, beats_per_minute=args.bpm)
+    probe = m.midiout = Probe(m.midiout)
+    loop = Loopback() if args.loopback else None
+
+    stop = threading.Event()
+    if args.load:
+        threading.Thread(target=busy_reload, args=(stop,), daemon=True).start()
+        time.sleep(0.5)
+    m.start()
+    try:
+        time.sleep(args.beats * 60.0 / args.bpm)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        m.stop()
+        stop.set()
+
+    print(format_report('sent', analyze(probe.beat_times(), args.bpm)))
+    if loop is not None:
+        print(format_report('loopback', analyze(loop.beat_times(), args.bpm)))
+        loop.close()
+
+if __name__ == '__main__':
+    run()
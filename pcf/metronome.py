@@ -2,28 +2,29 @@
 # coding: utf-8
 
 import time
-import rtmidi
 import logging
+import threading
 
 log = logging.getLogger('pcf.metronome')
 
-from pcf.beatclock import BeatClock
+from pcf.scheduler import default_scheduler
+from pcf.midiclock import MidiClockOut, PPQN
+from pcf.midiport import get_port
+from pcf.patterns import Pattern, TICKS_PER_BEAT
+from pcf.sequencer import Sequencer, compile_pattern
 
-class Note:
-    def __init__(self, note=60, velocity=112, channel=9):
-        self.note     = max(0, min(127, note))
-        self.velocity = max(0, min(127, velocity))
-        self.channel  = max(0, min(15, channel))
-
-        self.on  = [0x90 + self.channel, self.note, self.velocity]
-        self.off = [0x80 + self.channel, self.note, self.velocity]
+PORT_NAME = 'pcf.metronome'
 
 class Metronome:
-    def __init__(self, *beats, channel=1, beats_per_minute=120):
+    def __init__(self, *beats, pattern=None, channel=1, beats_per_minute=120, volume=1.0,
+            steps_per_beat=1, clock_out=False, follow=None, midiout=None, scheduler=None):
         ''' channel and beats_per_minute are hopefully self explanatory
-            notes is a list of notes to play … by number … 60 being middle-c
-            notes can also be tuples themselves … second value is velocity, eg
-            all c, but different velocities
+
+            pattern is a pcf.patterns.Pattern (see pcf/metronome.pat for the
+            ones the app uses). Without one, beats is a list of notes to
+            play … by number … 60 being middle-c; notes can also be tuples
+            themselves … second value is velocity, eg all c, but different
+            velocities
 
             The list is a list of lists of lists though:
 
@@ -33,64 +34,114 @@ class Metronome:
                   ( (60,90),           ), # beat 3
                 )
                 m = Metronome(*waltz)
+
+            and steps_per_beat says how many of those steps make a quarter
+            note.
+
+            Either way the pattern is compiled to MIDI bytes on a tick grid
+            up front (see pcf.sequencer.compile_pattern()) and one Sequencer
+            plays all of it, note-offs included, each at its own tick.
+            volume scales every velocity; set_volume() recompiles off to the
+            side and swaps the result in whole.
+
+            With clock_out=True MIDI clock goes out on the same port, locked
+            to the beat. follow takes a pcf.midiclock.MidiClockIn; the
+            pattern then steps with the incoming clock instead of our own.
+
+            midiout defaults to the shared pcf.metronome port (see
+            pcf.midiport), which stays open from one Metronome to the next.
         '''
         self.channel = channel
+        self.pattern = pattern or Pattern.from_steps(beats or ((60,),), steps_per_beat)
+        self.volume = volume
+
+        scheduler = scheduler or default_scheduler()
+        midiout = get_port(PORT_NAME) if midiout is None else midiout
+        self.follow = follow
+        self.clock_out = None
+        if clock_out:
+            self.clock_out = MidiClockOut(midiout, beats_per_minute, scheduler=scheduler)
+        self.sequencer = Sequencer(compile_pattern(self.pattern, channel, volume), midiout,
+            beats_per_minute=beats_per_minute, scheduler=scheduler)
+
+    @property
+    def midiout(self):
+        return self.sequencer.midiout
 
-        if not beats:
-            beats = ((60,),)
-        self.track = list()
-        self.tpos = 0
-        for notes in beats:
-            l = list()
-            self.track.append(l)
-            for n in notes:
-                if isinstance(n, Note):
-                    l.append(n)
-                elif isinstance(n, (list,tuple)):
-                    l.append(Note(*n))
-                else:
-                    l.append(Note(n))
-
-        self.beatclock = BeatClock(callback=self.fire, beats_per_minute=beats_per_minute)
-        self.beats_per_minute = beats_per_minute
-        self.midiout = rtmidi.MidiOut()
-        self.midiout.open_virtual_port("pcf.metronome")
-        self.condition = False
+    @midiout.setter
+    def midiout(self, v):
+        self.sequencer.midiout = v
+
+    def set_pattern(self, *beats, pattern=None, steps_per_beat=1):
+        ''' play something else (from the top of the new pattern; right
+            away, if we're playing)
+        '''
+        self.pattern = pattern or Pattern.from_steps(beats or ((60,),), steps_per_beat)
+        program = compile_pattern(self.pattern, self.channel, self.volume)
+        seq = self.sequencer
+        if seq.running:
+            self.stop()
+            seq.program = program
+            self.start()
+        else:
+            seq.program = program
 
     @property
     def beats_per_minute(self):
-        return self.beatclock.beats_per_minute
+        return self.sequencer.beats_per_minute
 
     @beats_per_minute.setter
     def beats_per_minute(self, v):
-        self.beat_duration = (0.95 / v)
-        if self.beat_duration < 0.1:
-            self.beat_duration = 0.1
-        elif self.beat_duration > 0.9:
-            self.beat_duration = 0.9
-        self.beatclock.beats_per_minute = v
+        self.set_tempo(v)
+
+    def set_tempo(self, beats_per_minute, ramp_beats=0):
+        ''' change tempo while playing, without losing the place in the bar;
+            ramp_beats > 1 gets there linearly over that many beats
+        '''
+        at = time.monotonic_ns() # the same moment for both, so they stay in phase
+        self.sequencer.set_tempo(beats_per_minute, ramp_beats=ramp_beats, at_ns=at)
+        if self.clock_out is not None:
+            self.clock_out.set_tempo(beats_per_minute, ramp_beats=ramp_beats, at_ns=at)
+
+    def set_volume(self, volume, wait=False):
+        ''' recompile at the new volume in a background thread; the
+            sequencer picks up the new program at its next event (same ticks,
+            so it keeps its place; replacing the program is one reference
+            swap)
+        '''
+        self.volume = volume
+        pattern = self.pattern
+        def _compile():
+            program = compile_pattern(pattern, self.channel, volume)
+            if self.volume == volume and self.pattern is pattern: # a later call wins
+                self.sequencer.program = program
+        t = threading.Thread(target=_compile, name='pcf.metronome.compile', daemon=True)
+        t.start()
+        if wait:
+            t.join()
+        return t
 
     def start(self):
-        self.condition = True
-        self.beatclock.start()
+        if self.follow is not None:
+            self.sequencer.idx = self.sequencer.pos = 0
+            self.follow.subscribe(self._follow_step, every=1)
+            return
+        at = time.monotonic_ns()
+        if self.clock_out is not None:
+            self.clock_out.start(at)
+        self.sequencer.start(at)
 
     def stop(self):
-        self.condition = False
-        self.beatclock.stop()
-
-    def fire(self):
-        # the debug logging feels useful for debugging, but the logging methods
-        # use threading locks and don't plan ahead for this sort of signal
-        # based scheduling; so leave logging commented out unless there's a
-        # need for it.
-
-        notes = self.track[self.tpos]
-        self.tpos = (self.tpos + 1) % len(self.track)
-
-        for note in notes:
-            self.midiout.send_message(note.on)
-        time.sleep(self.beat_duration)
-        for note in notes:
-            self.midiout.send_message(note.off)
-
-        return self.condition
+        if self.follow is not None:
+            self.follow.unsubscribe(self._follow_step)
+            send = self.midiout.send_message
+            for msg in self.sequencer.program.offs:
+                send(msg)
+            return
+        self.sequencer.stop()
+        if self.clock_out is not None:
+            self.clock_out.stop()
+
+    def _follow_step(self):
+        # one incoming MIDI clock is this many of our ticks
+        self.sequencer.play_ticks(TICKS_PER_BEAT // PPQN)
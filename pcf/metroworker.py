@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+''' the metronome in a process of its own
+
+    Even on its own thread the click shares the GIL with urwid and the
+    shell parsing. MetronomeWorker runs a Metronome (patterns, scheduler and
+    rtmidi port) in a child process, asks for real-time scheduling there if
+    the system allows it, and takes orders over a pipe:
+
+        w = MetronomeWorker(cpu=1)
+        w.load(pattern=pattern, beats_per_minute=160, volume=0.7)
+        w.start()
+        w.set_tempo(170, ramp_beats=4)
+        w.stop()
+        w.close()
+'''
+
+import os
+import logging
+import threading
+import multiprocessing
+
+log = logging.getLogger('pcf.metroworker')
+
+RT_PRIORITY = 20 # well under the audio server/fluidsynth threads
+
+def realtime(priority=RT_PRIORITY, cpu=None):
+    ''' try SCHED_FIFO, then SCHED_RR, for the calling process and pin it
+        to cpu; returns a short description of what we ended up with
+    '''
+    got = list()
+    for policy in ('SCHED_FIFO', 'SCHED_RR'):
+        try:
+            os.sched_setscheduler(0, getattr(os, policy), os.sched_param(priority))
+        except (AttributeError, OSError) as e:
+            log.debug('%s not available: %s', policy, e)
+            continue
+        got.append(f'{policy}:{priority}')
+        break
+    else:
+        got.append('SCHED_OTHER')
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {cpu})
+            got.append(f'cpu {cpu}')
+        except (AttributeError, OSError) as e:
+            log.debug('unable to pin to cpu %s: %s', cpu, e)
+    return ', '.join(got)
+
+def serve(conn, factory=None, info=None):
+    ''' the child's side: run commands from conn until 'quit' (or EOF)
+
+        factory(*beats, **kw) makes the metronome on the first 'load'; it's
+        pcf.metronome.Metronome unless a test says otherwise.
+    '''
+    if factory is None:
+        from pcf.metronome import Metronome as factory
+    conn.send( ('ready', info) )
+    m = None
+    while True:
+        try:
+            cmd, *args = conn.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            if cmd == 'quit':
+                break
+            elif cmd == 'load':
+                beats, kw = args
+                if m is None:
+                    m = factory(*beats, **kw)
+                    continue
+                m.stop()
+                m.set_pattern(*beats, pattern=kw.get('pattern'), steps_per_beat=kw.get('steps_per_beat', 1))
+                m.set_volume(kw.get('volume', m.volume), wait=True)
+                m.set_tempo(kw.get('beats_per_minute', m.beats_per_minute))
+            elif m is None:
+                log.warning('%s before load, ignored', cmd)
+            elif cmd == 'start':
+                m.start()
+            elif cmd == 'stop':
+                m.stop()
+            elif cmd == 'tempo':
+                m.set_tempo(*args)
+            elif cmd == 'volume':
+                m.set_volume(*args)
+            else:
+                log.warning('unknown metronome command %s', cmd)
+        except Exception:
+            log.exception('metronome command %s failed', cmd)
+    if m is not None:
+        m.stop()
+
+def _main(conn, priority, cpu):
+    serve(conn, info=realtime(priority, cpu))
+
+class MetronomeWorker:
+    ''' the parent's side: same start/stop/set_tempo/set_volume surface as a
+        Metronome, plus load() to pick the pattern; every call is one message
+        down the pipe and returns right away
+
+        The child is started with 'spawn' (not fork: the parent has urwid,
+        asyncio and scheduler threads going) and stays up across loads, so
+        its MIDI port does too.
+    '''
+
+    def __init__(self, priority=RT_PRIORITY, cpu=None):
+        ctx = multiprocessing.get_context('spawn')
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_main, args=(child, priority, cpu),
+            name='pcf.metronome', daemon=True)
+        self.proc.start()
+        child.close()
+        self._info = None
+        self._lock = threading.Lock()
+        self._bpm = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}[pid {self.proc.pid}; {self.info}]'
+
+    @property
+    def info(self):
+        ''' what scheduling the child got (waits for it to come up) '''
+        if self._info is None:
+            try:
+                if self.conn.poll(5):
+                    _, self._info = self.conn.recv()
+            except (EOFError, OSError) as e:
+                log.warning('metronome process is gone: %s', e)
+                self._info = 'gone'
+        return self._info
+
+    def _send(self, *msg):
+        with self._lock:
+            try:
+                self.conn.send(msg)
+            except (BrokenPipeError, OSError) as e:
+                log.warning('metronome process is gone: %s', e)
+
+    def load(self, *beats, **kw):
+        self._bpm = kw.get('beats_per_minute', self._bpm)
+        self._send('load', beats, kw)
+        return self
+
+    def start(self):
+        self._send('start')
+
+    def stop(self):
+        self._send('stop')
+
+    @property
+    def beats_per_minute(self):
+        return self._bpm
+
+    @beats_per_minute.setter
+    def beats_per_minute(self, v):
+        self.set_tempo(v)
+
+    def set_tempo(self, beats_per_minute, ramp_beats=0):
+        self._bpm = beats_per_minute
+        self._send('tempo', beats_per_minute, ramp_beats)
+
+    def set_volume(self, volume):
+        self._send('volume', volume)
+
+    def close(self, timeout=1.0):
+        self._send('quit')
+        self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.conn.close()
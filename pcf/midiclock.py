@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import time
+import logging
+
+from pcf.scheduler import TickClock, NS
+
+log = logging.getLogger('pcf.midiclock')
+
+PPQN = 24 # MIDI clock messages per quarter note
+
+MIDI_CLOCK = 0xf8
+MIDI_START = 0xfa
+MIDI_CONTINUE = 0xfb
+MIDI_STOP = 0xfc
+
+# follower tempo filter: each inter-tick interval moves the estimate this far
+# towards itself; intervals more than OUTLIER times off are dropped (a late
+# callback, a missed message) instead of dragging the tempo around
+CLOCK_ALPHA = 0.05
+CLOCK_OUTLIER = 2.0
+
+class MidiClockOut(TickClock):
+    ''' send MIDI clock (0xF8 at 24 PPQN) plus start/stop on a midiout, so
+        a drum machine or DAW can follow us
+
+        It's a TickClock ticking PPQN times a beat; tempos (and tempo ramps)
+        are given in beats like everywhere else, and step on the beat just
+        like the Sequencer's do, so a clock and a click started together
+        stay together. Followers count ticks to find the beat, so a tick
+        that comes due late is still sent (the scheduler catches up) rather
+        than skipped.
+
+            co = MidiClockOut(midiout, beats_per_minute=120)
+            co.start(at_ns)     # 0xFA, then the first tick at at_ns
+            co.set_tempo(126, ramp_beats=4)
+            co.stop()           # 0xFC
+    '''
+
+    ticks_per_beat = PPQN
+
+    def __init__(self, midiout, beats_per_minute=120, scheduler=None):
+        super().__init__(callback=self.tick, beats_per_minute=beats_per_minute, scheduler=scheduler)
+        self.midiout = midiout
+        self._tick_msg = bytes((MIDI_CLOCK,))
+
+    def start(self, at_ns=None):
+        self.midiout.send_message(bytes((MIDI_START,)))
+        super().start(at_ns)
+
+    def stop(self):
+        super().stop()
+        self.midiout.send_message(bytes((MIDI_STOP,)))
+
+    def tick(self):
+        self.midiout.send_message(self._tick_msg)
+        return True
+
+    def _advance(self):
+        # never skip: however late it is, the next tick is the next one
+        self._move(1)
+        return self.next_deadline()
+
+class MidiClockIn:
+    ''' follow somebody else's MIDI clock
+
+        Counts incoming 0xF8s (0xFA starts the count over, so the next tick
+        is a downbeat) and calls each subscriber every so many ticks. The
+        tempo is estimated from the inter-tick times with an exponential
+        filter, so one late message doesn't move it much.
+
+            ci = MidiClockIn('Drum Machine')
+            ci.subscribe(lambda: print('beat'), every=PPQN)
+            ci.beats_per_minute # → the filtered tempo (None until it's seen two ticks)
+    '''
+
+    def __init__(self, port=None, midiin=None, alpha=CLOCK_ALPHA):
+        if midiin is None:
+            import rtmidi
+            midiin = rtmidi.MidiIn()
+            if port is None:
+                midiin.open_virtual_port('pcf.clock-in')
+            else:
+                for i,name in enumerate(midiin.get_ports()):
+                    if port in name:
+                        midiin.open_port(i)
+                        break
+                else:
+                    raise ValueError(f'no MIDI port matching {port!r}')
+        midiin.ignore_types(sysex=True, timing=False, active_sense=True)
+        midiin.set_callback(self._received)
+        self.midiin = midiin
+        self.alpha = alpha
+        self.subscribers = list() # [every, callback]
+        self.running = True
+        self.ticks = 0
+        self.interval_ns = None
+        self.last_ns = None
+
+    def subscribe(self, callback, every=PPQN):
+        self.subscribers.append( (int(every), callback) )
+
+    def unsubscribe(self, callback):
+        self.subscribers = [ s for s in self.subscribers if s[1] is not callback ]
+
+    @property
+    def beats_per_minute(self):
+        if not self.interval_ns:
+            return
+        return 60 * NS / (self.interval_ns * PPQN)
+
+    def _received(self, event, data=None):
+        msg, _delta = event
+        if msg[0] == MIDI_CLOCK:
+            self.clock(time.monotonic_ns())
+        elif msg[0] == MIDI_START:
+            self.ticks = 0
+            self.last_ns = None
+            self.running = True
+        elif msg[0] == MIDI_CONTINUE:
+            self.running = True
+        elif msg[0] == MIDI_STOP:
+            self.running = False
+
+    def clock(self, now_ns):
+        ''' one 0xF8, received at now_ns '''
+        if self.last_ns is not None:
+            dt = now_ns - self.last_ns
+            iv = self.interval_ns
+            if iv is None:
+                self.interval_ns = dt
+            elif iv / CLOCK_OUTLIER < dt < iv * CLOCK_OUTLIER:
+                self.interval_ns = iv + self.alpha * (dt - iv)
+        self.last_ns = now_ns
+        if not self.running:
+            return
+        t = self.ticks
+        self.ticks = t + 1
+        for every,cb in self.subscribers:
+            if t % every == 0:
+                try:
+                    cb()
+                except Exception:
+                    log.exception('clock subscriber %s failed', cb)
+
+    def close(self):
+        self.midiin.cancel_callback()
+        self.midiin.close_port()
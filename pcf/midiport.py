@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import logging
+import threading
+
+log = logging.getLogger('pcf.midiport')
+
+class PortHandle:
+    ''' what senders hold on to: the port's name and its send_message;
+        closing a handle leaves the port open for everyone else
+    '''
+    __slots__ = ('name', 'midiout', 'send_message')
+
+    def __init__(self, name, midiout):
+        self.name = name
+        self.midiout = midiout
+        self.send_message = midiout.send_message # bound once, no lookups per send
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}[{self.name}]'
+
+    def close(self):
+        pass
+
+class MidiPorts:
+    ''' named virtual MIDI output ports, each opened once per process
+
+        Opening a virtual port makes a new ALSA/JACK client that the
+        patchbay has to wire up again before anything is heard; so ports
+        are opened on first use and kept, and everyone who asks for the same
+        name shares it.
+
+            ports = MidiPorts()
+            h = ports.get('pcf.metronome')
+            h.send_message(b'\\x99\\x23\\x50')
+    '''
+
+    def __init__(self, factory=None):
+        self.factory = factory # () → an unopened rtmidi.MidiOut (or lookalike)
+        self.ports = dict()
+        self.lock = threading.Lock()
+
+    def _new_midiout(self):
+        if self.factory is not None:
+            return self.factory()
+        import rtmidi # only once somebody actually wants MIDI out
+        return rtmidi.MidiOut()
+
+    def get(self, name):
+        with self.lock:
+            h = self.ports.get(name)
+            if h is None:
+                midiout = self._new_midiout()
+                midiout.open_virtual_port(name)
+                log.debug('opened virtual MIDI port %s', name)
+                h = self.ports[name] = PortHandle(name, midiout)
+            return h
+
+    def close_all(self):
+        with self.lock:
+            for h in self.ports.values():
+                try:
+                    h.midiout.close_port()
+                except Exception as e:
+                    log.debug('closing %s: %s', h.name, e)
+            self.ports.clear()
+
+_ports = None
+_ports_lock = threading.Lock()
+
+def midi_ports():
+    ''' the process-wide MidiPorts '''
+    global _ports
+    with _ports_lock:
+        if _ports is None:
+            _ports = MidiPorts()
+        return _ports
+
+def get_port(name):
+    return midi_ports().get(name)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import logging
+
+from .misc import Record
+from .midiport import get_port
+
+log = logging.getLogger('pcf.midiselect')
+
+CC_BANK_MSB = 0
+CC_BANK_LSB = 32
+
+class MidiSelect:
+    ''' instrument selection by bank select + program change, sent straight
+        to the synth's MIDI input instead of through the text shell
+
+        MIDI can't name a soundfont: fluidsynth takes the first font in its
+        stack that has the bank/prog, and the last font loaded (highest id)
+        sits on top. So this only handles selections the stack would resolve
+        to the wanted font anyway; select() returns False for the rest (and
+        for banks MIDI can't reach) so the caller can use the shell.
+
+            ms = MidiSelect()           # virtual port pcf.select; patch it to the synth
+            ms.update_catalog(inst_list)
+            if not ms.select(font, bank, prog, chan=3):
+                fso.select(font, bank, prog, chan=3)
+
+        bank_select should match the synth's synth.midi-bank-select: 'gs'
+        (fluidsynth's default, CC0 is the bank) or 'mma' (14 bit, CC0/CC32).
+    '''
+
+    def __init__(self, port_name='pcf.select', midiout=None, bank_select='gs', drum_channels=(9,)):
+        self.midiout = get_port(port_name) if midiout is None else midiout
+        self.bank_select = bank_select
+        # fluidsynth treats bank select differently on percussion channels,
+        # leave those to the shell
+        self.drum_channels = set(drum_channels)
+        self.winner = dict()
+
+    def update_catalog(self, inst_list):
+        ''' remember which font wins each (bank, prog) '''
+        winner = dict()
+        for _,font,bank,prog in inst_list:
+            k = (int(bank), int(prog))
+            if int(font) > winner.get(k, -1):
+                winner[k] = int(font)
+        self.winner = winner
+
+    def can_select(self, font, bank, prog, chan=0):
+        bank, prog = int(bank), int(prog)
+        if int(chan) in self.drum_channels:
+            return False
+        if self.bank_select == 'gs' and bank > 127:
+            return False
+        if bank > 0x3fff or prog > 127:
+            return False
+        return self.winner.get( (bank, prog) ) == int(font)
+
+    def messages(self, bank, prog, chan=0):
+        bank, prog, chan = int(bank), int(prog), int(chan) & 0x0f
+        if self.bank_select == 'mma':
+            msb, lsb = (bank >> 7) & 0x7f, bank & 0x7f
+        else:
+            msb, lsb = bank & 0x7f, 0
+        return ( (0xb0 | chan, CC_BANK_MSB, msb),
+                 (0xb0 | chan, CC_BANK_LSB, lsb),
+                 (0xc0 | chan, prog) )
+
+    def select(self, font=None, bank=None, prog=None, chan=0):
+        if isinstance(font, (tuple, Record)):
+            font,bank,prog = font.font, font.bank, font.prog
+        if not self.can_select(font, bank, prog, chan):
+            return False
+        for msg in self.messages(bank, prog, chan):
+            self.midiout.send_message(msg)
+        return True
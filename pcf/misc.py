@@ -123,3 +123,94 @@ class HandyMatch:
             return True
         self.g = self.gd = None
         return False
+
+class Record:
+    ''' base for the __slots__ record types LineSchema makes; they iterate,
+        index and compare like the tuples they replace
+    '''
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, *a, **kw):
+        for f,v in zip(self._fields, a):
+            setattr(self, f, v)
+        for f in self._fields[len(a):]:
+            setattr(self, f, kw.get(f))
+
+    def __iter__(self):
+        for f in self._fields:
+            yield getattr(self, f)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, i):
+        if isinstance(i, str):
+            return getattr(self, i)
+        return tuple(self)[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(' + ', '.join( f'{f}={getattr(self, f)!r}' for f in self._fields ) + ')'
+
+    def _asdict(self):
+        return { f: getattr(self, f) for f in self._fields }
+
+class LineSchema:
+    r''' a line-oriented response format, compiled once
+
+            inst = LineSchema('Inst', r'^(?P<bank>\d+)-(?P<prog>\d+)[ \t]+(?P<name>.+?)$',
+                fields=('name', 'font', 'bank', 'prog'))
+            inst.parse(block, font='1') # → [ Inst(name=…, font='1', …), … ]
+
+        The pattern runs (re.MULTILINE) with finditer over the whole block, so
+        it should anchor with ^/$ and use [ \t] rather than \s. Fields that
+        aren't groups in the pattern come from keyword arguments to parse()
+        or from derive={'field': fn(groupdict)}. Nothing is kept between
+        calls, so one schema can be shared by any number of threads.
+    '''
+    _types = dict()
+
+    def __init__(self, name, pat, fields=None, derive=None):
+        self.pat = re.compile(pat, re.MULTILINE)
+        groups = tuple(sorted(self.pat.groupindex, key=self.pat.groupindex.get))
+        self.fields = tuple(fields or groups)
+        self.derive = dict(derive or {})
+        self.record = self.record_type(name, self.fields)
+        self._direct = self.fields == groups and not self.derive
+
+    @classmethod
+    def record_type(cls, name, fields):
+        k = (name, fields)
+        if k not in cls._types:
+            cls._types[k] = type(name, (Record,), { '__slots__': fields, '_fields': fields })
+        return cls._types[k]
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}[{self.record.__name__}: {self.pat.pattern}]'
+
+    def parse(self, text, **extra):
+        if not isinstance(text, str):
+            text = '\n'.join(text)
+        rec = self.record
+        if self._direct and not extra:
+            fields = self.fields
+            if len(fields) == 1:
+                return [ rec(m.group(*fields)) for m in self.pat.finditer(text) ]
+            return [ rec(*m.group(*fields)) for m in self.pat.finditer(text) ]
+        ret = list()
+        fields, derive = self.fields, self.derive.items()
+        for m in self.pat.finditer(text):
+            gd = m.groupdict()
+            gd.update(extra)
+            for f,fn in derive:
+                gd[f] = fn(gd)
+            ret.append( rec(*[ gd.get(f) for f in fields ]) )
+        return ret
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+''' metronome patterns: one bar of hits on a grid of TICKS_PER_BEAT ticks
+    to the quarter note, read from a small text format
+
+        # lines starting with # are comments
+        [44-8]              a pattern's name
+        key %               the pcf key that toggles it (optional)
+        beats 4             bar length in quarter notes (3.5 for 7/8)
+        swing 50            50 is straight, 66 is a triplet shuffle
+        hhat      50 30 50 30 50 30 50 30
+        floor_tom 80 .  73 .  73 .  73 .
+        kick      73 .  .  .  .  .  .  .
+
+    Each note line is a note number (or one of NOTE_NAMES) and then one
+    velocity (or . for a rest) per step. A line's steps divide the whole bar
+    evenly, however many there are, so lines of 4 and 3 steps make 4 against
+    3 and 12 steps in 4 beats are triplets. Swing delays every other step
+    of lines with an even number of steps per beat.
+
+    The patterns bundled with pcf are in pcf/metronome.pat; the same names
+    in ~/.config/pcf/metronome.pat replace them, new names add to them.
+'''
+
+import os
+import logging
+
+log = logging.getLogger('pcf.patterns')
+
+TICKS_PER_BEAT = 96 # divides evenly by 2, 3, 4, 6, 8, 12, 16, 24 and 32
+
+# what the patterns call the drum kit notes
+NOTE_NAMES = {
+    'floor_tom': 35,
+    'rims': 37,
+    'snare': 38,
+    'hhat': 42,
+    'kick': 45,
+    'ccrash': 46,
+}
+
+REST = ('.', '-')
+
+def default_patterns_path():
+    base = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    return os.path.join(base, 'pcf', 'metronome.pat')
+
+class Pattern:
+    ''' one bar: hits are (tick, note, velocity), sorted; the swing is
+        already in the hit ticks, .swing just says how much there was
+    '''
+
+    def __init__(self, name='', beats=1, hits=(), key=None, swing=50):
+        self.name = name
+        self.beats = beats
+        self.key = key
+        self.swing = swing
+        self.hits = sorted(hits)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}[{self.name}; {self.beats} beats; {len(self.hits)} hits]'
+
+    @property
+    def bar_ticks(self):
+        return int(round(self.beats * TICKS_PER_BEAT))
+
+    @classmethod
+    def from_steps(cls, steps, steps_per_beat=1, name=''):
+        ''' the old style: one tuple of notes per step, a step being
+            1/steps_per_beat of a beat; notes are numbers or (number,
+            velocity)
+        '''
+        hits = list()
+        for i,notes in enumerate(steps):
+            tick = int(round(i * TICKS_PER_BEAT / steps_per_beat))
+            for n in notes:
+                if isinstance(n, (list,tuple)):
+                    note, vel = (tuple(n) + (112,))[:2]
+                else:
+                    note, vel = n, 112
+                hits.append( (tick, max(0, min(127, note)), max(0, min(127, vel))) )
+        return cls(name, len(steps) / steps_per_beat, hits)
+
+def _note(word):
+    if word.lower() in NOTE_NAMES:
+        return NOTE_NAMES[word.lower()]
+    note = int(word)
+    if not 0 <= note <= 127:
+        raise ValueError(f'note {note} is out of range')
+    return note
+
+def _line_hits(cells, bar_ticks, beats, swing):
+    ''' (tick, velocity) for the non-rest cells of one note line '''
+    n = len(cells)
+    per_beat = n / beats
+    swung = swing != 50 and per_beat == int(per_beat) and per_beat % 2 == 0
+    for i,cell in enumerate(cells):
+        if cell in REST:
+            continue
+        vel = int(cell)
+        if not 0 < vel <= 127:
+            raise ValueError(f'velocity {vel} is out of range')
+        if swung and i % 2:
+            # the odd step lands swing% of the way through its pair
+            tick = int(round((i - 1) * bar_ticks / n + 2 * bar_ticks / n * swing / 100))
+        else:
+            tick = int(round(i * bar_ticks / n))
+        yield tick, vel
+
+def parse_patterns(text, source='<patterns>'):
+    ''' pattern text (see the module docstring) → {name: Pattern}, in the
+        order they're written
+    '''
+    ret = dict()
+    cur = lines = None
+
+    def finish():
+        if cur is None:
+            return
+        bar = cur.bar_ticks
+        for lineno,note,cells in lines:
+            try:
+                for tick,vel in _line_hits(cells, bar, cur.beats, cur.swing):
+                    cur.hits.append( (tick, note, vel) )
+            except ValueError as e:
+                raise ValueError(f'{source}:{lineno}: {e}') from None
+        cur.hits.sort()
+        ret[cur.name] = cur
+
+    for lineno,line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            if line.startswith('[') and line.endswith(']'):
+                finish()
+                cur, lines = Pattern(line[1:-1].strip(), beats=4), list()
+                continue
+            if cur is None:
+                raise ValueError('expected a [name] first')
+            word, *rest = line.split()
+            if word == 'key':
+                if len(rest) != 1 or len(rest[0]) != 1:
+                    raise ValueError('key takes one character')
+                cur.key = rest[0]
+            elif word == 'beats':
+                cur.beats = float(rest[0]) if '.' in rest[0] else int(rest[0])
+                if cur.beats <= 0:
+                    raise ValueError('beats has to be more than 0')
+            elif word == 'swing':
+                cur.swing = float(rest[0])
+                if not 0 < cur.swing < 100:
+                    raise ValueError('swing is a percentage, 50 is straight')
+            elif rest:
+                lines.append( (lineno, _note(word), rest) )
+            else:
+                raise ValueError(f'no steps after {word}')
+        except (ValueError, IndexError) as e:
+            raise ValueError(f'{source}:{lineno}: {e}') from None
+    finish()
+    return ret
+
+def load_patterns(path=None, user=True):
+    ''' the bundled patterns, updated from path (default_patterns_path()
+        unless given) if it exists and user is true
+    '''
+    from importlib.resources import files
+    ret = parse_patterns(files('pcf').joinpath('metronome.pat').read_text(), 'pcf/metronome.pat')
+    if path is None:
+        path = default_patterns_path()
+    if user and os.path.isfile(path):
+        with open(path) as fh:
+            ret.update(parse_patterns(fh.read(), path))
+        log.debug('read metronome patterns from %s', path)
+    return ret
@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sys
+import time
+import heapq
+import logging
+import itertools
+import threading
+
+log = logging.getLogger('pcf.scheduler')
+
+NS = 1_000_000_000
+
+# The scheduler thread still needs the GIL to run a callback; by default
+# python hands it over every 5 ms, which is an audible flam. 1 ms keeps the
+# click steady while the UI thread is busy parsing or redrawing. It's a
+# process-wide setting, so a Scheduler only uses it when asked to.
+SWITCH_INTERVAL = 0.001
+
+class Clock:
+    ''' a periodic beat, run on a Scheduler's thread
+
+        Beat n is due at start_ns + n * period_ns; deadlines come from that
+        absolute start, never from when the previous beat actually ran, so
+        lateness doesn't pile up into drift. If the callback returns
+        something falsy the clock stops. A clock that falls more than a
+        whole beat behind skips the missed beats (counted in .missed)
+        rather than firing them all at once.
+
+        Tempo changes keep the phase: if the change lands 30% of the way
+        into a beat, the next beat comes after the remaining 70% of a beat
+        at the new tempo. With ramp_beats the tempo moves there linearly,
+        one step per beat.
+
+            c = Clock(lambda: print('tick') or True, beats_per_minute=90)
+            c.start()
+            c.set_tempo(120, ramp_beats=4)
+            ...
+            c.stop()
+    '''
+
+    def __init__(self, callback=None, beats_per_minute=60, scheduler=None):
+        self.cb = callback
+        self.scheduler = scheduler
+        self._bpm = beats_per_minute
+        self.running = False
+        self.start_ns = self.last_ns = None
+        self.beat = 0
+        self.missed = 0
+        self._ramp = list() # tempos for the coming beats, during a ramp
+        self._gen = 0 # bumped on every start/stop; stale heap entries are dropped
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.beats_per_minute} bpm)'
+
+    @property
+    def beats_per_minute(self):
+        return self._bpm
+
+    @beats_per_minute.setter
+    def beats_per_minute(self, v):
+        self.set_tempo(v)
+
+    def set_tempo(self, beats_per_minute, ramp_beats=0):
+        steps = [ beats_per_minute ]
+        if ramp_beats > 1:
+            a, n = self._bpm, int(ramp_beats)
+            steps = [ a + (beats_per_minute - a) * k / n for k in range(1, n) ] + [ beats_per_minute ]
+        sched = self.scheduler
+        if not self.running or sched is None:
+            self._bpm, self._ramp = steps[-1], list()
+            return
+        with sched.lock:
+            now = time.monotonic_ns()
+            nxt, old = self.next_deadline(), self.period_ns
+            self._bpm, self._ramp = steps[0], steps[1:]
+            if self.last_ns is not None:
+                # we're part way into a beat: keep that phase at the new tempo
+                phase = min(1.0, max(0.0, (now - self.last_ns) / old))
+                nxt = now + int((1 - phase) * self.period_ns)
+            self.start_ns, self.beat = nxt, 0
+            sched.reschedule(self)
+
+    @property
+    def period_ns(self):
+        return int(60 * NS / self._bpm)
+
+    def next_deadline(self):
+        return self.start_ns + self.beat * self.period_ns
+
+    def start(self, at_ns=None):
+        ''' first beat at at_ns (a time.monotonic_ns() value), or right away '''
+        if self.scheduler is None:
+            self.scheduler = default_scheduler()
+        self.scheduler.add(self, at_ns)
+
+    def stop(self):
+        if self.scheduler is not None:
+            self.scheduler.remove(self)
+
+    def _tick(self):
+        ''' run one beat (outside the scheduler lock); False means stop '''
+        return self.cb() if callable(self.cb) else True
+
+    def _advance(self):
+        ''' on to the next beat (under the scheduler lock); its deadline '''
+        if self._ramp:
+            # each ramp step sets the gap that follows the beat just played
+            self.start_ns, self.beat = self.next_deadline(), 0
+            self._bpm = self._ramp.pop(0)
+        self.beat += 1
+        nxt = self.next_deadline()
+        now_ns = time.monotonic_ns()
+        if nxt <= now_ns:
+            missed = (now_ns - nxt) // self.period_ns + 1
+            self.beat += missed
+            self.missed += missed
+            nxt = self.next_deadline()
+        return nxt
+
+class TickClock(Clock):
+    ''' a Clock ticking ticks_per_beat times a beat; tempos (and ramps) are
+        still given in beats
+
+        Deadlines are worked out in beats from one absolute start, and a
+        ramp steps on the beat boundaries counted from start() (the first
+        step right away, for what's left of the current beat). So two
+        TickClocks of different resolutions, started on the same at_ns and
+        given the same set_tempo() calls, put their beats on the same
+        nanosecond however many ramps they go through.
+    '''
+
+    ticks_per_beat = 1
+
+    def __init__(self, callback=None, beats_per_minute=60, scheduler=None):
+        super().__init__(callback, beats_per_minute=beats_per_minute, scheduler=scheduler)
+        self.ticks = 0 # since start, so ramp steps land on beats
+
+    @property
+    def period_ns(self):
+        return int(60 * NS / (self._bpm * self.ticks_per_beat))
+
+    def next_deadline(self):
+        return self.start_ns + int(self.beat / self.ticks_per_beat * 60 * NS / self._bpm)
+
+    def set_tempo(self, beats_per_minute, ramp_beats=0, at_ns=None):
+        ''' at_ns (default: now) is when the change happens; give clocks
+            that have to stay together the same one
+        '''
+        steps = [ beats_per_minute ]
+        if ramp_beats > 1:
+            a, n = self._bpm, int(ramp_beats)
+            steps = [ a + (beats_per_minute - a) * k / n for k in range(1, n) ] + [ beats_per_minute ]
+        sched = self.scheduler
+        if not self.running or sched is None:
+            self._bpm, self._ramp = steps[-1], list()
+            return
+        with sched.lock:
+            # the tick moves on to the next one before this lock is let go,
+            # so the deadline here is always the one that's coming; whatever
+            # is left of the wait for it is stretched to the new tempo
+            now = time.monotonic_ns() if at_ns is None else at_ns
+            nxt, old = self.next_deadline(), self._bpm
+            self._bpm, self._ramp = steps[0], steps[1:]
+            if self.last_ns is not None:
+                nxt = now + int(max(0, nxt - now) * old / self._bpm)
+                if self._ramp and self.ticks % self.ticks_per_beat == 0:
+                    # the coming tick is a beat: the first step was just
+                    # the rest of this one, the next starts there
+                    self._bpm = self._ramp.pop(0)
+            self.start_ns, self.beat = nxt, 0
+            sched.reschedule(self)
+
+    def start(self, at_ns=None):
+        self.ticks = 0
+        super().start(at_ns)
+
+    def _move(self, ticks):
+        ''' count off ticks, taking the ramp's steps on the beats among them '''
+        tpb = self.ticks_per_beat
+        while self._ramp:
+            to_beat = tpb - self.ticks % tpb
+            if to_beat > ticks:
+                break
+            self.beat += to_beat
+            self.ticks += to_beat
+            ticks -= to_beat
+            self.start_ns, self.beat = self.next_deadline(), 0
+            self._bpm = self._ramp.pop(0)
+        self.beat += ticks
+        self.ticks += ticks
+
+    def _advance(self):
+        self._move(1)
+        nxt = self.next_deadline()
+        now_ns = time.monotonic_ns()
+        if nxt <= now_ns:
+            missed = (now_ns - nxt) // self.period_ns + 1
+            self._move(missed)
+            self.missed += missed
+            nxt = self.next_deadline()
+        return nxt
+
+class Timer:
+    ''' a one-shot call_at() on a Scheduler; cancel() it before it's due to
+        keep it from running
+    '''
+    __slots__ = ('fn', 'args', 'when_ns', 'scheduler', 'running', 'last_ns', '_gen')
+
+    def __init__(self, fn, args, when_ns, scheduler):
+        self.fn = fn
+        self.args = args
+        self.when_ns = when_ns
+        self.scheduler = scheduler
+        self.running = True
+        self.last_ns = None
+        self._gen = 0
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.fn!r} @{self.when_ns})'
+
+    def cancel(self):
+        self.scheduler.remove(self)
+
+    def _tick(self):
+        self.fn(*self.args)
+        return False
+
+class Scheduler:
+    ''' one thread running any number of Clocks and one-shot Timers, each at
+        its own deadline
+
+        The thread sleeps on a condition until the earliest deadline on the
+        heap (or until something is added or removed), runs that callback
+        outside the lock, and puts clocks back with their next deadline.
+        Callbacks should be quick: while one runs, nothing else on this
+        scheduler can. Anything that has to happen later (a note-off, say)
+        should be a call_at() rather than a sleep.
+    '''
+
+    def __init__(self, name='pcf.scheduler', switch_interval=None):
+        ''' switch_interval (seconds, eg SWITCH_INTERVAL) lowers
+            sys.setswitchinterval() to that while anything is scheduled; it
+            is put back once nothing is left (or on shutdown())
+        '''
+        self.name = name
+        self.switch_interval = switch_interval
+        self._saved_switch = None
+        self.lock = threading.RLock()
+        self._cond = threading.Condition(self.lock)
+        self._heap = list()
+        self._seq = itertools.count()
+        self._thread = None
+        self._stopping = False
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}[{self.name}; {len(self._heap)} queued]'
+
+    def _push(self, when_ns, item):
+        heapq.heappush(self._heap, (when_ns, next(self._seq), item, item._gen))
+
+    def add(self, clock, at_ns=None):
+        with self._cond:
+            clock.scheduler = self
+            clock._gen += 1
+            clock.running = True
+            clock.start_ns = time.monotonic_ns() if at_ns is None else at_ns
+            clock.beat = 0
+            clock.last_ns = None
+            self._push(clock.start_ns, clock)
+            self._ensure_thread()
+            self._lower_switch()
+            self._cond.notify()
+
+    def reschedule(self, clock):
+        ''' a running clock's next_deadline() changed '''
+        with self._cond:
+            clock._gen += 1
+            self._push(clock.next_deadline(), clock)
+            self._cond.notify()
+
+    def remove(self, item):
+        ''' stop a Clock or cancel a Timer '''
+        with self._cond:
+            item._gen += 1
+            item.running = False
+            self._cond.notify()
+
+    def call_at(self, when_ns, fn, *args):
+        ''' run fn(*args) on the scheduler thread at when_ns (monotonic_ns) '''
+        t = Timer(fn, args, when_ns, self)
+        with self._cond:
+            self._push(when_ns, t)
+            self._ensure_thread()
+            self._lower_switch()
+            if self._heap[0][2] is t:
+                self._cond.notify() # only matters if it's the new earliest
+        return t
+
+    def call_later(self, delay, fn, *args):
+        ''' call_at(), delay seconds from now '''
+        return self.call_at(time.monotonic_ns() + int(delay * NS), fn, *args)
+
+    def _lower_switch(self):
+        if self.switch_interval and sys.getswitchinterval() > self.switch_interval:
+            self._saved_switch = sys.getswitchinterval()
+            sys.setswitchinterval(self.switch_interval)
+
+    def _restore_switch(self):
+        if self._saved_switch is not None:
+            sys.setswitchinterval(self._saved_switch)
+            self._saved_switch = None
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        with self._cond:
+            self._restore_switch()
+
+    def _run(self):
+        heap, cond = self._heap, self._cond
+        with cond:
+            while not self._stopping:
+                if not heap:
+                    # nothing to keep time for: let the rest of the
+                    # process have the GIL the way it's used to
+                    self._restore_switch()
+                    cond.wait()
+                    continue
+                when, _, item, gen = heap[0]
+                if gen != item._gen:
+                    heapq.heappop(heap)
+                    continue
+                now = time.monotonic_ns()
+                if when > now:
+                    cond.wait((when - now) / NS)
+                    continue
+                heapq.heappop(heap)
+                item.last_ns = when
+                cond.release()
+                try:
+                    keep = item._tick()
+                except Exception:
+                    log.exception('%s callback failed, stopping it', item)
+                    keep = False
+                finally:
+                    cond.acquire()
+                if gen != item._gen:
+                    continue # stopped, restarted or retimed while its callback ran
+                if keep:
+                    self._push(item._advance(), item)
+                else:
+                    item.running = False
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_scheduler():
+    ''' the process-wide scheduler the metronome (and anything else) shares '''
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Scheduler()
+        return _default
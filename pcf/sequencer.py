@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import time
+import logging
+from collections import namedtuple
+
+from pcf.scheduler import TickClock
+from pcf.patterns import TICKS_PER_BEAT
+
+log = logging.getLogger('pcf.sequencer')
+
+GATE_TICKS = TICKS_PER_BEAT // 4 # how long a click sounds, unless the same note comes sooner
+
+# a compiled pattern: events are (tick, messages) sorted by tick, the first
+# one at tick 0; offs is every note-off in it, for stop()
+Program = namedtuple('Program', 'bar_ticks events offs')
+
+def compile_pattern(pattern, channel=9, volume=1.0):
+    ''' Pattern → Program: the note-ons and their note-offs as ready-to-send
+        3 byte messages on channel, volume already applied, grouped by tick
+    '''
+    bar = max(1, pattern.bar_ticks)
+    at = dict()
+    offs = dict()
+    hits = sorted( (t % bar, n, v) for t,n,v in pattern.hits )
+    for i,(tick,note,vel) in enumerate(hits):
+        vel = max(5, min(127, int(vel * volume)))
+        on = bytes((0x90 + channel, note, vel))
+        off = bytes((0x80 + channel, note, vel))
+        # the next hit of the same note (maybe around the bar line) cuts it short
+        gap = next( (t - tick for t,n,_ in hits[i+1:] if n == note and t > tick), None )
+        if gap is None:
+            gap = next( (t + bar - tick for t,n,_ in hits if n == note), bar )
+        off_tick = (tick + min(GATE_TICKS, gap)) % bar
+        at.setdefault(tick, ([], []))[1].append(on)
+        at.setdefault(off_tick, ([], []))[0].append(off)
+        offs[note] = bytes((0x80 + channel, note, 0))
+    at.setdefault(0, ([], []))
+    # note-offs first, so a note-off never cuts the note-on at the same tick
+    events = tuple( (t, tuple(o) + tuple(n)) for t,(o,n) in sorted(at.items()) )
+    return Program(bar, events, tuple(offs.values()))
+
+class Sequencer(TickClock):
+    ''' play a Program over and over, one scheduler wakeup per event
+
+        It's a TickClock ticking TICKS_PER_BEAT times a beat that only wakes
+        up on the ticks that have something on them. Tempos (and ramps, which
+        step once a beat) are given in beats. Every deadline still comes
+        from one absolute start, so however a bar is cut up, nothing drifts.
+
+            s = Sequencer(compile_pattern(pattern), midiout, beats_per_minute=90)
+            s.start()
+            s.set_tempo(120, ramp_beats=4)
+            s.program = compile_pattern(pattern, volume=0.5) # same ticks: keeps its place
+            s.stop()
+    '''
+
+    ticks_per_beat = TICKS_PER_BEAT
+
+    def __init__(self, program, midiout, beats_per_minute=120, scheduler=None):
+        super().__init__(beats_per_minute=beats_per_minute, scheduler=scheduler)
+        self.program = program
+        self.midiout = midiout
+        self.idx = 0 # the event due next
+        self.pos = 0 # where play_ticks() is in the bar
+
+    def start(self, at_ns=None):
+        ''' the top of the bar at at_ns (time.monotonic_ns()), or right away '''
+        self.idx = 0
+        super().start(at_ns)
+
+    def stop(self):
+        ''' stop, and let go of anything still sounding '''
+        if self.scheduler is None:
+            return
+        with self.scheduler.lock:
+            super().stop()
+            send = self.midiout.send_message
+            for msg in self.program.offs:
+                send(msg)
+
+    def _next(self, program):
+        ''' on to the event after idx; the ticks that took '''
+        bar, events, _ = program
+        n = len(events)
+        i = self.idx % n
+        self.idx = j = (i + 1) % n
+        return events[j][0] - events[i][0] + (bar if j <= i else 0)
+
+    def _tick(self):
+        with self.scheduler.lock:
+            if not self.running:
+                return False
+            program = self.program
+            send = self.midiout.send_message
+            for msg in program.events[self.idx % len(program.events)][1]:
+                send(msg)
+            self._move(self._next(program))
+        return True
+
+    def _advance(self):
+        nxt = self.next_deadline()
+        now_ns = time.monotonic_ns()
+        if nxt <= now_ns:
+            # too far behind: drop whole bars, then events, until we're ahead
+            program = self.program
+            bars = (now_ns - nxt) // self.period_ns // program.bar_ticks
+            self._move(bars * program.bar_ticks)
+            self.missed += bars * len(program.events)
+            while self.next_deadline() <= now_ns:
+                self._move(self._next(program))
+                self.missed += 1
+            nxt = self.next_deadline()
+        return nxt
+
+    def play_ticks(self, ticks):
+        ''' play whatever comes in the next ticks, right now; for following
+            somebody else's clock instead of running our own
+        '''
+        program = self.program
+        bar, events, _ = program
+        send = self.midiout.send_message
+        self.pos += ticks
+        while events[self.idx % len(events)][0] < self.pos:
+            for msg in events[self.idx % len(events)][1]:
+                send(msg)
+            self.idx = (self.idx + 1) % len(events)
+            if self.idx == 0:
+                self.pos -= bar
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import math
+import time
+import json
+import socket
+import logging
+import threading
+
+log = logging.getLogger('pcf.stats')
+
+def default_stats_path():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'pcf', f'stats-{socket.gethostname()}.json')
+
+# 4 buckets per power of two: ~19% wide, plenty to tell 1 ms from 100 ms
+BUCKETS_PER_OCTAVE = 4
+
+class Histogram:
+    ''' log-bucketed histogram; record() is a log2 and a dict increment, so
+        it's cheap enough to sit on every shell command
+
+            h = Histogram()
+            h.record(0.0012)
+            h.percentile(99) # → upper edge of the bucket holding the p99
+    '''
+
+    def __init__(self):
+        self.buckets = dict()
+        self.count = 0
+        self.total = 0
+        self.min = self.max = None
+
+    @staticmethod
+    def bucket_of(v):
+        if v <= 0:
+            return None
+        return math.ceil(math.log2(v) * BUCKETS_PER_OCTAVE)
+
+    @staticmethod
+    def upper_edge(b):
+        return 0 if b is None else 2 ** (b / BUCKETS_PER_OCTAVE)
+
+    def record(self, v):
+        b = self.bucket_of(v)
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+        self.count += 1
+        self.total += v
+        if self.min is None or v < self.min:
+            self.min = v
+        if self.max is None or v > self.max:
+            self.max = v
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        want = self.count * p / 100.0
+        seen = 0
+        for b in sorted(self.buckets, key=lambda b: -math.inf if b is None else b):
+            seen += self.buckets[b]
+            if seen >= want:
+                return min(self.max, self.upper_edge(b))
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def as_dict(self):
+        return { 'count': self.count, 'mean': self.mean, 'min': self.min, 'max': self.max,
+            'p50': self.percentile(50), 'p99': self.percentile(99) }
+
+class VerbStats:
+    __slots__ = ('rtt', 'bytes_out', 'bytes_in', 'lines')
+
+    def __init__(self):
+        self.rtt = Histogram()
+        self.bytes_out = self.bytes_in = self.lines = 0
+
+    def as_dict(self):
+        return { 'rtt': self.rtt.as_dict(), 'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in, 'lines': self.lines }
+
+class IOStats:
+    ''' per command verb (select, inst, channels, …): round trip times,
+        bytes each way and lines parsed; one of these can be shared by any
+        number of clients (and threads)
+    '''
+
+    def __init__(self):
+        self.verbs = dict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def verb_of(cmd):
+        return cmd.split(None, 1)[0] if cmd.strip() else '?'
+
+    def record(self, cmd, rtt, bytes_out=0, bytes_in=0, lines=0):
+        verb = self.verb_of(cmd)
+        with self.lock:
+            vs = self.verbs.get(verb)
+            if vs is None:
+                vs = self.verbs[verb] = VerbStats()
+            vs.rtt.record(rtt)
+            vs.bytes_out += bytes_out
+            vs.bytes_in += bytes_in
+            vs.lines += lines
+
+    def totals(self):
+        ret = { 'count': 0, 'rtt': 0, 'bytes_out': 0, 'bytes_in': 0, 'lines': 0 }
+        with self.lock:
+            for vs in self.verbs.values():
+                ret['count'] += vs.rtt.count
+                ret['rtt'] += vs.rtt.total
+                ret['bytes_out'] += vs.bytes_out
+                ret['bytes_in'] += vs.bytes_in
+                ret['lines'] += vs.lines
+        return ret
+
+    @staticmethod
+    def diff(after, before):
+        return { k: after[k] - before[k] for k in after }
+
+    def as_dict(self):
+        with self.lock:
+            verbs = { v: vs.as_dict() for v,vs in sorted(self.verbs.items()) }
+        return { 'host': socket.gethostname(), 'time': time.time(), 'verbs': verbs }
+
+    def dump(self, path=None, **extra):
+        ''' write as_dict() (plus extra) to path as JSON; returns the path '''
+        path = path or default_stats_path()
+        dat = self.as_dict()
+        dat.update(extra)
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w') as fh:
+                json.dump(dat, fh, indent=2)
+        except OSError as e:
+            log.warning('unable to write stats %s: %s', path, e)
+            return
+        return path
+
+    def lines_of_text(self):
+        ''' a little table: verb, count, p50/p99 in ms, bytes in '''
+        ret = [ f"{'verb':<10s} {'n':>5s} {'p50':>7s} {'p99':>7s} {'in':>7s}" ]
+        with self.lock:
+            for verb,vs in sorted(self.verbs.items()):
+                p50, p99 = vs.rtt.percentile(50), vs.rtt.percentile(99)
+                ret.append( f'{verb[:10]:<10s} {vs.rtt.count:>5d} {p50*1e3:>6.1f}m {p99*1e3:>6.1f}m'
+                    f' {human_bytes(vs.bytes_in):>7s}' )
+        return ret
+
+def human_bytes(n):
+    for unit in ('', 'k', 'M'):
+        if n < 1024:
+            return f'{n:.0f}{unit}' if not unit else f'{n:.1f}{unit}'
+        n /= 1024.0
+    return f'{n:.1f}G'
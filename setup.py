@@ -36,6 +36,7 @@ setup(name='pycursesfluid',
     install_requires = mods,
     cmdclass         = {'test': PyTest},
     packages         = find_packages(),
+    package_data     = {'pcf': ['*.pat']},
 
     entry_points = {
         'console_scripts': [
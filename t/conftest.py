@@ -1,4 +1,96 @@
 # coding: utf-8
 
+import time
+import threading
+
 import pytest
 
+from pcf.fluidsynth import FluidSynth
+from pcf.fakesynth import FakeShellServer, FakeCatalog
+from pcf.scheduler import Timer, NS
+
+FAKE_FONTS = ( (1, '/usr/share/soundfonts/FluidR3_GM.sf2'),
+               (2, '/usr/share/soundfonts/freepats-general-midi.sf2'), )
+
+FAKE_INST = {
+    1: ( (0, 0, 'Yamaha Grand Piano'), (0, 1, 'Bright Yamaha Grand'), (128, 0, 'Standard') ),
+    2: ( (0, 0, 'Acoustic Grand Piano'), (0, 40, 'Violin') ),
+}
+
+@pytest.fixture
+def fake_server():
+    with FakeShellServer(catalog=FakeCatalog(FAKE_FONTS, FAKE_INST)) as srv:
+        yield srv
+
+@pytest.fixture
+def fake_fs(fake_server):
+    fs = FluidSynth(port=fake_server.port, host='127.0.0.1')
+    yield fs
+    fs.close()
+
+class FakeScheduler:
+    ''' runs clocks (and call_at() timers) on a made-up time.monotonic_ns(),
+        no thread: run_until() steps everything through its deadlines like
+        Scheduler._run() does, so tests can check where the deadlines land,
+        not how late a busy box woke up for them
+    '''
+
+    def __init__(self, now=10**12):
+        self.now = now
+        self.lock = threading.RLock()
+        self.clocks = list()
+        self.retimed = None
+
+    def add(self, clock, at_ns=None):
+        clock.scheduler = self
+        clock.running = True
+        clock.start_ns = self.now if at_ns is None else at_ns
+        clock.beat = 0
+        clock.last_ns = None
+        if clock not in self.clocks:
+            self.clocks.append(clock)
+
+    def reschedule(self, clock):
+        self.retimed = clock
+
+    def remove(self, clock):
+        clock.running = False
+        if clock in self.clocks:
+            self.clocks.remove(clock)
+
+    def call_at(self, when_ns, fn, *args):
+        t = Timer(fn, args, when_ns, self)
+        self.clocks.append(t)
+        return t
+
+    def call_later(self, delay, fn, *args):
+        return self.call_at(self.now + int(delay * NS), fn, *args)
+
+    def run_until(self, t_ns, stall=None):
+        ''' run everything due up to t_ns; stall(clock) → ns the callback
+            "took", if given
+        '''
+        def deadline(c):
+            return c.when_ns if isinstance(c, Timer) else c.next_deadline()
+        while True:
+            due = [ (deadline(c), i, c) for i,c in enumerate(self.clocks) if c.running ]
+            if not due or min(due)[0] > t_ns:
+                self.now = max(self.now, t_ns)
+                return
+            when, _, c = min(due)
+            self.now = max(self.now, when)
+            c.last_ns = when
+            self.retimed = None
+            if c._tick():
+                if stall is not None:
+                    self.now += stall(c)
+                if self.retimed is not c: # retimed by its own callback: already set
+                    c._advance()
+            else:
+                self.remove(c)
+
+@pytest.fixture
+def fake_sched(monkeypatch):
+    sched = FakeScheduler()
+    monkeypatch.setattr(time, 'monotonic_ns', lambda: sched.now)
+    return sched
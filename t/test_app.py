@@ -0,0 +1,269 @@
+# coding: utf-8
+
+import asyncio
+
+import pytest
+
+from pcf.app import PCFApp, FluidInstrumentNode
+from pcf.fakesynth import FakeShellServer, FakeCatalog
+
+class FakeLoop:
+    ''' as much of urwid's MainLoop as PCFApp touches outside main() '''
+
+    def __init__(self):
+        self.alarms = dict()
+        self._handles = iter(range(1, 1<<30))
+
+    def set_alarm_in(self, sec, callback):
+        handle = next(self._handles)
+        self.alarms[handle] = callback
+        return handle
+
+    def remove_alarm(self, handle):
+        return self.alarms.pop(handle, None) is not None
+
+    def draw_screen(self):
+        pass
+
+    def fire(self):
+        ''' run (and use up) every alarm that's pending right now '''
+        alarms, self.alarms = self.alarms, dict()
+        for cb in alarms.values():
+            cb(self, None)
+
+@pytest.fixture
+def make_app(monkeypatch):
+    ''' make_app(srv) → a PCFApp (no screen, no cache) on srv, with its own
+        shell clients
+    '''
+    made = list()
+    def _make(srv):
+        monkeypatch.setattr(PCFApp, 'host', '127.0.0.1')
+        monkeypatch.setattr(PCFApp, 'port', srv.port)
+        monkeypatch.setattr(PCFApp, 'pool_size', 1)
+        for k in ('_fso', '_afso', '_pool', '_apool', 'font_list', 'chan_list', 'inst_list'):
+            monkeypatch.setattr(PCFApp, k, None)
+        app = PCFApp(cache=False, keepalive=0)
+        made.append( (app, PCFApp._fso, PCFApp._afso) )
+        return app
+    yield _make
+    for app,fso,afso in made:
+        fso.close()
+        app.aloop.run_until_complete(afso.close())
+        app.aloop.close()
+
+@pytest.fixture
+def app(fake_server, make_app):
+    return make_app(fake_server)
+
+def test_stats_refresh_is_one_chain(app):
+    app.loop = FakeLoop()
+    refreshes = lambda: sum( 1 for cb in app.loop.alarms.values() if cb == app.update_stats )
+    app.toggle_stats()
+    assert refreshes() == 1
+    app.toggle_stats() # off, then on again before the refresh was due
+    assert refreshes() == 0
+    app.toggle_stats()
+    assert refreshes() == 1
+    for _ in range(3):
+        app.loop.fire()
+        assert refreshes() == 1
+    app.toggle_stats()
+    app.loop.fire()
+    assert refreshes() == 0
+
+def _catalog(fonts):
+    ''' { font id: [ (bank, prog, name) ] } → a FakeCatalog '''
+    return FakeCatalog([ (f, f'/sf/font-{f}.sf2') for f in fonts ], fonts)
+
+BEFORE = _catalog({
+    1: [ (0, 0, 'Grand'), (0, 1, 'Bright'), (128, 0, 'Standard') ],
+    2: [ (0, 0, 'Piano'), (0, 40, 'Violin') ],
+    3: [ (0, 0, 'Organ') ],
+})
+
+# font 3 goes, font 4 comes; 1 and 2 lose, gain and rename presets
+AFTER = _catalog({
+    1: [ (0, 0, 'Grand v2'), (0, 2, 'Electric'), (128, 0, 'Standard') ],
+    2: [ (0, 0, 'Piano'), (0, 40, 'Violin'), (0, 41, 'Viola') ],
+    4: [ (0, 0, 'Strings'), (0, 1, 'Pad') ],
+})
+
+def _shape(app):
+    ''' everything a redraw could show, by path, from the top down '''
+    ret = list()
+    tree = app.inst_tree
+    for fpath in app.top_node.get_child_keys():
+        f = tree[fpath]
+        ret.append( (fpath, f.name, sorted(f.chan)) )
+        for path in f.get_child_keys():
+            n = tree[path]
+            ret.append( (path, n.name, sorted(n.chan)) )
+    return ret, sorted(app.top_node.chan), dict(app.chan_map)
+
+def _reload_with(app, srv, catalog, chans):
+    srv.catalog = catalog
+    srv.chans = dict(chans)
+    app.reload(incremental=True)
+
+@pytest.fixture
+def server():
+    with FakeShellServer(catalog=BEFORE) as srv:
+        yield srv
+
+def test_reload_patches_to_what_a_rebuild_makes(server, make_app):
+    srv = server
+    srv.chans = { 0: (1,0,0), 1: (1,0,1), 2: (3,0,0), 9: (1,128,0), 10: (2,0,40) }
+    app = make_app(srv)
+    violin = app.inst_tree['/2/0/40']
+    app.walker.set_focus(violin)
+    app.inst_tree['/2'].get_widget().unfold()
+    folded = app.inst_tree['/1'].get_widget()
+    assert not folded.expanded
+
+    # 0 stays on the renamed Grand, 1 loses Bright for a new font, 2 loses
+    # its font altogether and goes to a new preset, 10 moves within font 2
+    _reload_with(app, srv, AFTER, { 0: (1,0,0), 1: (4,0,1), 2: (1,0,2), 9: (1,128,0), 10: (2,0,41) })
+    fresh = make_app(srv)
+    assert _shape(app) == _shape(fresh)
+    assert app.inst_tree['/1/0/0'].name == '000-000 Grand v2'
+    assert '/3' not in app.inst_tree and '/1/0/1' not in app.inst_tree
+
+    # the same nodes (and widgets) as before: focus and folds are where they were
+    assert app.current_node is violin
+    assert app.inst_tree['/2'].get_widget().expanded
+    assert app.inst_tree['/1'].get_widget() is folded and not folded.expanded
+    assert app.inst_tree['/4'].start_expanded is False
+
+def test_reload_moves_focus_off_a_removed_preset(server, make_app):
+    srv = server
+    app = make_app(srv)
+    app.walker.set_focus(app.inst_tree['/1/0/1'])
+    _reload_with(app, srv, AFTER, AFTER.default_channels())
+    assert app.current_node is app.inst_tree['/1']
+    assert _shape(app) == _shape(make_app(srv))
+
+def test_reload_moves_focus_off_a_removed_font(server, make_app):
+    srv = server
+    app = make_app(srv)
+    app.inst_tree['/3'].get_widget().unfold()
+    app.walker.set_focus(app.inst_tree['/3/0/0'])
+    _reload_with(app, srv, AFTER, AFTER.default_channels())
+    assert app.current_node is app.top_node
+    assert _shape(app) == _shape(make_app(srv))
+
+def test_channel_moves_keep_chan_map_and_redraw_only_what_changed(server, make_app, monkeypatch):
+    srv = server
+    srv.chans = { 0: (1,0,0), 1: (1,0,0), 2: (2,0,0) }
+    app = make_app(srv)
+    redrawn = list()
+    monkeypatch.setattr(FluidInstrumentNode, '_invalidate', lambda self: redrawn.append(self.path))
+    tree = app.inst_tree
+
+    def push(path, *chans):
+        redrawn.clear()
+        app.walker.set_focus(tree[path])
+        app.active_channels = set(chans)
+        before = asyncio.all_tasks(app.aloop)
+        app.push_current_node_to_active_channels()
+        spawned = asyncio.all_tasks(app.aloop) - before # the select batch, if any
+        if spawned:
+            app.aloop.run_until_complete(asyncio.wait(spawned))
+        return sorted(redrawn)
+
+    def fonts():
+        return { p: sorted(tree[p].chan) for p in app.top_node.get_child_keys() + ('/',) }
+
+    # within a font: the font still has 1 (it's added before it's taken
+    # away), so only the two instruments are redrawn
+    assert push('/1/0/1', 1) == [ '/1/0/0', '/1/0/1' ]
+    assert app.chan_map == { 0: '/1/0/0', 1: '/1/0/1', 2: '/2/0/0' }
+    assert fonts() == { '/1': [0, 1], '/2': [2], '/3': [], '/': [0, 1, 2] }
+
+    # across fonts: both fonts change, the top doesn't
+    assert push('/1/0/1', 2) == [ '/1', '/1/0/1', '/2', '/2/0/0' ]
+    assert app.chan_map == { 0: '/1/0/0', 1: '/1/0/1', 2: '/1/0/1' }
+    assert fonts() == { '/1': [0, 1, 2], '/2': [], '/3': [], '/': [0, 1, 2] }
+
+    # a channel nobody had (5) changes the top too; one already there (2)
+    # isn't touched at all
+    assert push('/3/0/0', 0, 5) == [ '/', '/1', '/1/0/0', '/3', '/3/0/0' ]
+    assert app.chan_map == { 0: '/3/0/0', 1: '/1/0/1', 2: '/1/0/1', 5: '/3/0/0' }
+    assert fonts() == { '/1': [1, 2], '/2': [], '/3': [0, 5], '/': [0, 1, 2, 5] }
+    assert push('/1/0/1', 2) == []
+
+    # font rows (and the top) aren't presets: nothing is sent or moved
+    srv.received.clear()
+    for path in ('/2', '/'):
+        assert push(path, 0, 5) == []
+    assert srv.received == []
+    assert app.chan_map == { 0: '/3/0/0', 1: '/1/0/1', 2: '/1/0/1', 5: '/3/0/0' }
+    assert fonts() == { '/1': [1, 2], '/2': [], '/3': [0, 5], '/': [0, 1, 2, 5] }
+
+    # the synth agrees, so a reload finds nothing to do
+    assert srv.chans == { 0: (3,0,0), 1: (1,0,1), 2: (1,0,1), 5: (3,0,0) }
+    app.reload(incremental=True)
+    assert redrawn == [] and app.chan_map[5] == '/3/0/0'
+
+    # and when the synth moved one by itself, the reload follows it
+    srv.chans[1] = (2,0,40)
+    app.reload(incremental=True)
+    assert sorted(redrawn) == [ '/1', '/1/0/1', '/2', '/2/0/40' ]
+    assert app.chan_map[1] == '/2/0/40' and fonts()['/1'] == [2]
+
+def test_reload_keeps_selections_made_while_it_ran(server, make_app, monkeypatch):
+    srv = server
+    srv.chans = { 0: (1,0,0) }
+    app = make_app(srv)
+    tree, spawned = app.inst_tree, set()
+    status = app.afso.status
+
+    async def status_then_select():
+        ret = await status()
+        # space on another preset before the reply is handled
+        app.walker.set_focus(tree['/1/0/1'])
+        before = asyncio.all_tasks()
+        app.push_current_node_to_active_channels()
+        spawned.update(asyncio.all_tasks() - before)
+        return ret
+
+    monkeypatch.setattr(app.afso, 'status', status_then_select)
+    app.aloop.run_until_complete(app.areload())
+    app.aloop.run_until_complete(asyncio.wait(spawned))
+    assert srv.chans[0] == (1,0,1)
+    assert app.chan_map[0] == '/1/0/1'
+    assert sorted(tree['/1/0/1'].chan) == [0] and not tree['/1/0/0'].chan
+
+    # the next reload sees the select, and follows the synth again
+    monkeypatch.setattr(app.afso, 'status', status)
+    srv.chans[0] = (2,0,0)
+    app.aloop.run_until_complete(app.areload())
+    assert app.chan_map[0] == '/2/0/0' and not tree['/1/0/1'].chan
+
+def test_cache_is_only_rewritten_when_the_catalog_changes(server, make_app):
+    srv = server
+    app = make_app(srv)
+    saved = list()
+    class Cache:
+        def save(self, fonts, chans, inst):
+            saved.append(inst)
+    app.cache = Cache()
+    for _ in range(3):
+        srv.chans[0] = (2,0,40) # channels alone don't count
+        app.aloop.run_until_complete(app.areload())
+    assert saved == []
+    srv.catalog = AFTER
+    app.aloop.run_until_complete(app.areload())
+    assert saved == [ app.inst_list ]
+
+def test_reconnect_rereads_settings_and_replays_the_rest(server, make_app):
+    srv = server
+    app = make_app(srv)
+    app.nudge_control('reverb', -2)
+    srv.config['synth.gain'] = 0.8 # what a restarted synth came up with
+    srv.received.clear()
+    app.aloop.run_until_complete(app.replay_channels(app.afso))
+    assert app.controls['gain'].get() == 0.8
+    assert app.controls['reverb'].get() == pytest.approx(0.8)
+    assert 'rev_setlevel 0.80' in srv.received
+    assert not any( c.startswith('gain') for c in srv.received )
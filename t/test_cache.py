@@ -0,0 +1,58 @@
+# coding: utf-8
+
+import os
+from pcf.cache import CatalogCache, Font, Channel, Instrument, font_key
+
+def _catalog(path):
+    fonts = [ Font('1', 'x', str(path)) ]
+    chans = [ Channel('0', 'Piano', '1', '0', '0') ]
+    inst = [ Instrument('Piano', '1', '0', '0'), Instrument('Violin', '1', '0', '40') ]
+    return fonts, chans, inst
+
+def test_cache_round_trip(tmp_path):
+    sf = tmp_path / 'x.sf2'
+    sf.write_bytes(b'sf2')
+    cc = CatalogCache(str(tmp_path / 'sub' / 'catalog.json'))
+    assert cc.load() is None
+
+    fonts, chans, inst = _catalog(sf)
+    cc.save(fonts, chans, inst)
+    key, f, c, i = cc.load()
+    assert (f, c, i) == (fonts, chans, inst)
+    assert i[1].prog == '40'
+    assert key == font_key(fonts)
+
+def test_cache_goes_stale_when_a_font_changes(tmp_path):
+    sf = tmp_path / 'x.sf2'
+    sf.write_bytes(b'sf2')
+    cc = CatalogCache(str(tmp_path / 'catalog.json'))
+    fonts, chans, inst = _catalog(sf)
+    cc.save(fonts, chans, inst)
+    key = cc.load()[0]
+
+    st = os.stat(sf)
+    os.utime(sf, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert key != font_key(fonts)
+    assert key != font_key([ Font('2', 'x', str(sf)) ])
+
+def test_missing_font_files_still_key(tmp_path):
+    assert font_key([ Font('1', 'x', '/nope/x.sf2') ]) == [ ['1', '/nope/x.sf2', None] ]
+
+def test_garbage_cache_is_ignored(tmp_path):
+    p = tmp_path / 'catalog.json'
+    p.write_text('{not json')
+    assert CatalogCache(str(p)).load() is None
+
+def test_each_synth_has_its_own_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    sf = tmp_path / 'x.sf2'
+    sf.write_bytes(b'sf2')
+    local = CatalogCache(host='localhost', port=9800)
+    other = CatalogCache(host='studio.lan', port=9800)
+    second = CatalogCache(host='localhost', port=9801)
+    assert len({ local.path, other.path, second.path }) == 3
+    local.save(*_catalog(sf))
+    assert local.load() is not None
+    assert other.load() is None and second.load() is None
+    # the same font paths mean nothing for another synth, even in the same file
+    assert CatalogCache(local.path, host='studio.lan', port=9800).load() is None
@@ -0,0 +1,41 @@
+# coding: utf-8
+
+from pcf.app import FluidFontNode, FluidInstrumentNode
+
+def _tree():
+    top = FluidFontNode('FluidSynth')
+    f1 = FluidFontNode('/a.sf2', 1, parent=top)
+    f2 = FluidFontNode('/b.sf2', 2, parent=top)
+    a = FluidInstrumentNode('000-000 a', 1, 0, 0, parent=f1)
+    b = FluidInstrumentNode('000-001 b', 1, 0, 1, parent=f1)
+    c = FluidInstrumentNode('000-000 c', 2, 0, 0, parent=f2)
+    return top, f1, f2, a, b, c
+
+def test_fonts_count_their_childrens_channels():
+    top, f1, f2, a, b, c = _tree()
+    a.chan.add(3)
+    b.chan.add('3')
+    b.chan.add(4)
+    assert f1.chan == {3, 4} and f1.chan_count == {3: 2, 4: 1}
+    assert top.chan == {3, 4} and top.chan_count == {3: 1, 4: 1}
+    a.chan.discard(3)
+    assert f1.chan == {3, 4} # b still has it
+    b.chan.remove(3)
+    assert f1.chan == {4} and 3 not in f1.chan_count and top.chan == {4}
+    b.chan.discard(9) # never had it: nothing to count
+    assert f1.chan_count == {4: 1}
+
+def test_only_changed_fonts_say_so():
+    top, f1, f2, a, b, c = _tree()
+    a.chan.add(3)
+    for n in (top, f1, f2):
+        n.chan_changed = False
+    b.chan.add(3) # f1 already had 3
+    assert not f1.chan_changed and not top.chan_changed
+    c.chan.add(3) # f2 didn't, the top did
+    a.chan.discard(3)
+    b.chan.discard(3)
+    assert f1.chan_changed and f2.chan_changed and not top.chan_changed
+    assert top.chan == {3} and f1.chan == set() and f2.chan == {3}
+    c.chan.clear()
+    assert top.chan == set() and top.chan_changed
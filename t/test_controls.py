@@ -0,0 +1,87 @@
+# coding: utf-8
+
+import asyncio
+
+import pytest
+
+from pcf.controls import Control, Coalescer, default_controls, read_settings
+from pcf.fluidsynth import AsyncFluidSynth
+
+def test_control_nudge_clamps():
+    c = Control('vol', 'cc {chan} 7 {value}', 0, 127, 2, 100, fmt='{}')
+    assert c.nudge(+1, chan=3) == 102
+    assert c.get(4) == 100
+    for _ in range(50):
+        c.nudge(+1, chan=3)
+    assert c.get(3) == 127
+    assert c.command(3) == 'cc 3 7 127'
+
+    g = Control('gain', 'gain {value}', 0.0, 5.0, 0.05, 0.2)
+    g.nudge(-10)
+    assert g.command() == 'gain 0.00'
+
+def test_coalescer_keeps_latest_and_limits_rate():
+    sent = list()
+    async def send(*cmds):
+        sent.append( (asyncio.get_running_loop().time(), cmds) )
+        await asyncio.sleep(0.001)
+    async def go():
+        co = Coalescer(send, rate=50)
+        for i in range(100):
+            co.set('gain', f'gain {i}')
+            co.set(('cc', i % 2), f'cc {i % 2} 7 {i}')
+            await asyncio.sleep(0.0005)
+        await co.drain()
+        return co
+    co = asyncio.run(go())
+    # ~50ms+ of key repeat → a handful of batches, not 200 writes
+    assert 1 < len(sent) < 20
+    assert co.batches == len(sent)
+    times = [ t for t,_ in sent ]
+    assert all( b - a >= 0.02 * 0.9 for a,b in zip(times, times[1:]) )
+    final = dict()
+    for _,cmds in sent:
+        for c in cmds:
+            final[c.rsplit(' ', 1)[0]] = c
+        assert len(cmds) <= 3
+    assert final == { 'gain': 'gain 99', 'cc 0 7': 'cc 0 7 98', 'cc 1 7': 'cc 1 7 99' }
+
+def test_coalescer_against_the_shell(fake_server):
+    async def go():
+        afs = AsyncFluidSynth(port=fake_server.port, host='127.0.0.1')
+        co = Coalescer(afs.batch)
+        try:
+            for c in default_controls().values():
+                for _ in range(5):
+                    c.nudge(-1, chan=2)
+                co.set( (c.name, 2), c.command(2) )
+            await co.drain()
+        finally:
+            await afs.close()
+    asyncio.run(go())
+    s = fake_server.settings
+    assert s[('gain',)] == '0.00'
+    assert s[('cc', '2', '7')] == '90'
+    assert s[('cc', '2', '10')] == '54'
+    assert s[('rev_setlevel',)] == '0.65'
+    assert s[('cho_set_level',)] == '1.5'
+
+def test_controls_start_from_the_synth(fake_server):
+    fake_server.config['synth.gain'] = 0.6
+    fake_server.config['synth.chorus.level'] = 3.5
+    del fake_server.config['synth.reverb.level'] # an older synth: keeps the default
+    controls = default_controls()
+    controls['chorus'].nudge(+1) # moved before the answer came: stays moved
+    async def go():
+        afs = AsyncFluidSynth(port=fake_server.port, host='127.0.0.1')
+        try:
+            await read_settings(afs, controls)
+        finally:
+            await afs.close()
+    asyncio.run(go())
+    assert controls['gain'].get() == 0.6
+    assert controls['gain'].nudge(+1) == pytest.approx(0.65) # not 0.25
+    assert controls['chorus'].default == 3.5 and controls['chorus'].get() == pytest.approx(2.1)
+    assert controls['reverb'].get() == 0.9
+    assert controls['volume'].setting is None
+    assert controls['gain'].set_current(['9.000']) == 5.0 # clamped
@@ -1,9 +1,12 @@
 # coding: utf-8
 
+import time
+import asyncio
 import pytest
-from pcf.fluidsynth import FluidSynth
+from pcf.fluidsynth import FluidSynth, AsyncFluidSynth, FluidSynthPool, AsyncFluidSynthPool
+from pcf.fakesynth import FakeShellServer, FakeCatalog
 
-FS = FluidSynth()
+FS = FluidSynth(reconnect_tries=1)
 pretest = list()
 try:
     pretest = list(FS.send('echo test'))
@@ -15,3 +18,179 @@ except:
 def test_fs():
     res = list(FS.send('echo test1', 'echo test2', 'echo test3'))
     assert res == ['test1', 'test2', 'test3']
+
+def test_framed_send(fake_fs):
+    res = fake_fs.send('echo test1', 'echo test2', 'echo test3')
+    assert res == ['test1', 'test2', 'test3']
+
+def test_framed_send_doesnt_wait_for_timeout(fake_fs):
+    fake_fs.timeout = 10 # the idle timeout must not be involved at all
+    t0 = time.time()
+    for i in range(10):
+        assert fake_fs.send(f'echo {i}') == [ str(i) ]
+    assert time.time() - t0 < 1
+
+def test_framed_skips_stale_markers(fake_fs):
+    fake_fs.shell_socket.sendall(b'echo pcf-eor-999\necho leftover\n')
+    assert fake_fs.send('echo fresh') == ['leftover', 'fresh']
+
+def test_unframed_send(fake_fs):
+    fake_fs.framed = False
+    assert list(fake_fs.send('echo a', 'echo b')) == ['a', 'b']
+
+def test_fonts_channels_instruments(fake_fs):
+    fonts = fake_fs.fonts
+    assert [ (f.id, f.name) for f in fonts ] == [('1', 'FluidR3_GM'), ('2', 'freepats-general-midi')]
+    assert len(fake_fs.instruments) == 5
+    fake_fs.select(2, 0, 40, chan=3)
+    chans = { int(c.chan): c for c in fake_fs.channels }
+    assert (chans[3].font, chans[3].bank, chans[3].prog, chans[3].name) == ('2', '0', '40', 'Violin')
+
+def test_batch_demuxes_responses(fake_fs):
+    a, b, c = fake_fs.batch('echo one', 'inst 2', 'echo three')
+    assert a == ['one']
+    assert b == ['000-000 Acoustic Grand Piano', '000-040 Violin']
+    assert c == ['three']
+
+def test_batch_is_one_write(fake_fs, fake_server):
+    fake_fs.batch('echo 1', 'echo 2')
+    assert fake_server.received == ['echo 1', 'echo pcf-eor-1', 'echo 2', 'echo pcf-eor-2']
+
+def test_batch_unframed(fake_fs):
+    fake_fs.framed = False
+    assert fake_fs.batch('echo a', 'echo b') == [['a'], ['b']]
+
+def test_catalog(fake_fs):
+    fonts, chans, inst = fake_fs.catalog()
+    assert [ f.id for f in fonts ] == ['1', '2']
+    assert len(chans) == 16
+    assert inst == fake_fs.instruments
+    assert [ (i.font, i.bank, i.prog) for i in inst ][-1] == ('2', '0', '40')
+
+def _arun(fake_server, coro_fn):
+    async def go():
+        afs = AsyncFluidSynth(port=fake_server.port, host='127.0.0.1')
+        try:
+            return await coro_fn(afs)
+        finally:
+            await afs.close()
+    return asyncio.run(go())
+
+def test_async_send_and_batch(fake_server):
+    async def go(afs):
+        assert await afs.send('echo a', 'echo b') == ['a', 'b']
+        assert await afs.batch('echo c', 'echo d') == [['c'], ['d']]
+    _arun(fake_server, go)
+
+def test_async_concurrent_requests_dont_mix(fake_server):
+    async def go(afs):
+        res = await asyncio.gather(*( afs.send(f'echo {i}') for i in range(20) ))
+        assert res == [ [str(i)] for i in range(20) ]
+    _arun(fake_server, go)
+
+def test_async_surface_matches_sync(fake_server, fake_fs):
+    async def go(afs):
+        await afs.select(2, 0, 40, chan=5)
+        return (await afs.fonts, await afs.channels, await afs.instruments, await afs.catalog())
+    fonts, chans, inst, cat = _arun(fake_server, go)
+    assert fonts == fake_fs.fonts
+    assert chans == fake_fs.channels
+    assert inst == fake_fs.instruments
+    assert cat == fake_fs.catalog()
+    assert chans[5].name == 'Violin'
+
+def test_async_blank_lines_match_sync(fake_server, fake_fs):
+    async def go(afs):
+        return await afs.send('help')
+    assert _arun(fake_server, go) == fake_fs.send('help') == ['Help topics:', 'help all', 'help fonts']
+
+def test_async_survives_undecodable_names():
+    cat = FakeCatalog([ (1, 'old.sf2') ], { 1: [ (0, 0, 'Pi\xe9no') ] })
+    with FakeShellServer(catalog=cat, encoding='latin-1') as srv:
+        async def go(afs):
+            assert await afs.send('inst 1') == ['000-000 Pi\ufffdno']
+            assert await afs.send('echo still here') == ['still here']
+        _arun(srv, go)
+
+def test_reconnect_after_restart(fake_fs, fake_server):
+    seen = list()
+    fake_fs.on_reconnect.append(lambda fs: seen.append(fs.batch('echo replay')))
+    assert fake_fs.send('echo before') == ['before']
+    fake_server.restart()
+    assert fake_fs.send('echo after') == ['after']
+    assert seen == [ [['replay']] ]
+    assert fake_fs.ping()
+
+def test_async_reconnect_replays_on_its_own(fake_server):
+    async def replay(afs):
+        await afs.batch(afs.select_cmd(2, 0, 40, chan=7))
+
+    async def go(afs):
+        afs.on_reconnect.append(replay)
+        await afs.select(2, 0, 40, chan=7)
+        fake_server.restart()
+        assert fake_server.chans[7] == (1,0,0)
+        for i in range(100):
+            await asyncio.sleep(0.01)
+            if fake_server.chans[7] == (2,0,40):
+                break
+        assert fake_server.chans[7] == (2,0,40)
+        assert afs.connections == 2
+        assert await afs.ping()
+    _arun(fake_server, go)
+
+def test_big_catalog_in_tiny_chunks():
+    with FakeShellServer(catalog=FakeCatalog.synthetic(3, 3000), chunk_size=1000) as srv:
+        fs = FluidSynth(port=srv.port, host='127.0.0.1')
+        fonts, chans, inst = fs.catalog()
+        fs.close()
+    assert len(fonts) == 3
+    assert len(chans) == 16
+    assert len(inst) == 9000
+    assert tuple(inst[-1]) == ('Synthetic 3.2999', '3', '23', '55')
+
+def test_fake_latency_is_per_command():
+    with FakeShellServer(latency=0.02) as srv:
+        fs = FluidSynth(port=srv.port, host='127.0.0.1')
+        t0 = time.time()
+        assert fs.send('gain 1.5') == []
+        assert time.time() - t0 >= 0.04 # gain + echo
+        fs.close()
+    assert srv.settings[('gain',)] == '1.5'
+
+def test_pool_batch_keeps_order(fake_server):
+    pool = FluidSynthPool(3, port=fake_server.port, host='127.0.0.1')
+    try:
+        res = pool.batch(*( f'echo {i}' for i in range(10) ))
+        assert res == [ [str(i)] for i in range(10) ]
+        assert pool.catalog() == FluidSynth(port=fake_server.port, host='127.0.0.1').catalog()
+    finally:
+        pool.close()
+
+def test_pool_fans_out():
+    with FakeShellServer(catalog=FakeCatalog.synthetic(3, 10), latency=0.05) as srv:
+        fs = FluidSynth(port=srv.port, host='127.0.0.1')
+        pool = FluidSynthPool(4, port=srv.port, host='127.0.0.1')
+        try:
+            t0 = time.time()
+            single = fs.catalog()
+            t1 = time.time()
+            pooled = pool.catalog()
+            t2 = time.time()
+        finally:
+            fs.close()
+            pool.close()
+    assert single == pooled
+    assert t2 - t1 < (t1 - t0) * 0.7
+
+def test_async_pool(fake_server, fake_fs):
+    async def go():
+        pool = AsyncFluidSynthPool(3, port=fake_server.port, host='127.0.0.1')
+        try:
+            res = await pool.batch(*( f'echo {i}' for i in range(7) ))
+            return res, await pool.catalog()
+        finally:
+            await pool.close()
+    res, cat = asyncio.run(go())
+    assert res == [ [str(i)] for i in range(7) ]
+    assert cat == fake_fs.catalog()
@@ -0,0 +1,51 @@
+# coding: utf-8
+
+from pcf.app import FluidFontNode, InstTree, inst_path
+from pcf.cache import Instrument
+
+def _tree(presets=100):
+    top = FluidFontNode('FluidSynth')
+    tree = InstTree(top)
+    for font in (1, 2):
+        f = tree.add_font(FluidFontNode(f'/f{font}.sf2', font, parent=top))
+        for i in range(presets):
+            rec = Instrument(f'preset {i}', str(font), str(i // 128), str(i % 128))
+            f.records[inst_path(*rec[1:])] = rec
+    return tree
+
+def test_nodes_are_made_on_demand():
+    tree = _tree()
+    f1 = tree['/1']
+    assert len(tree) == 3 + 200
+    assert '/1/0/42' in tree and '/1/0/100' not in tree and '/9/0/0' not in tree
+    assert None not in tree
+    assert not f1._children # looking didn't make anything
+    n = tree['/1/0/42']
+    assert n.name == '000-042 preset 42' and (n.font, n.bank, n.prog) == ('1', '0', '42')
+    assert tree['/1/0/42'] is n and n.get_parent() is f1
+    assert list(f1._children) == [ '/1/0/42' ]
+    assert tree.get('/1/0/100') is None
+    assert set(tree.nodes()) == { tree.top, f1, tree['/2'], n }
+
+def test_child_keys_follow_the_records():
+    tree = _tree(3)
+    f1 = tree['/1']
+    keys = f1.get_child_keys()
+    assert keys == ( '/1/0/0', '/1/0/1', '/1/0/2' )
+    assert f1.get_child_keys() is keys # the same tuple until the records change
+    n = tree['/1/0/1']
+    n.chan.add(5)
+    assert f1.chan == {5}
+    assert f1.remove_child('/1/0/1') is n
+    assert f1.remove_child('/1/0/2') is None # never had a node
+    assert f1.get_child_keys() == ( '/1/0/0', )
+    assert '/1/0/1' not in tree
+
+def test_fonts_start_folded():
+    tree = _tree(3)
+    w = tree['/1'].get_widget()
+    assert not w.expanded and w.first_child() is None
+    assert not tree['/1']._children # folding didn't need them
+    f2 = tree['/2']
+    f2.start_expanded = True
+    assert f2.get_widget().first_child().get_node() is tree['/2/0/0']
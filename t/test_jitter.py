@@ -0,0 +1,75 @@
+# coding: utf-8
+
+import time
+import threading
+
+from pcf.jitter import Probe, Loopback, analyze, format_report, busy_reload
+from pcf.scheduler import Scheduler, Clock, SWITCH_INTERVAL
+
+def test_analyze_perfect_grid_with_gaps():
+    period = 500_000_000 # 120 bpm
+    times = [ 10**9 + k * period for k in (0, 1, 2, 4, 5, 8) ]
+    r = analyze(times, 120)
+    assert r['beats'] == 6
+    assert r['max_ms'] == r['mean_ms'] == r['drift_ms'] == 0
+
+def test_analyze_jitter_and_drift():
+    period = 100_000_000
+    jitter = [ 0, 2, -1, 0, 3, -2, 0, 1 ]
+    r = analyze([ k * period + j * 1_000_000 for k,j in enumerate(jitter) ], 600)
+    assert r['max_ms'] == 3
+    assert r['p99_ms'] == 3
+    # 1 ms late per beat
+    r = analyze([ k * (period + 1_000_000) for k in range(11) ], 600)
+    assert abs(r['drift_ms'] - 10) < 1e-6
+    assert abs(r['drift_ms_per_min'] - 600) < 1e-6
+    assert 'drift +10.000 ms' in format_report('x', r)
+    assert 'not enough' in format_report('x', analyze([1], 60))
+
+def test_probe_groups_chords_and_passes_through():
+    sink = Probe()
+    p = Probe(sink)
+    for msg in ( (0x99, 35, 80), (0x99, 45, 80), (0x89, 35, 80), (0x99, 35, 0) ):
+        p.send_message(bytes(msg))
+    time.sleep(0.003)
+    p.send_message(bytes((0x99, 42, 50)))
+    assert len(sink.events) == 5
+    assert len(p.beat_times()) == 2
+
+class _FakeMidiIn:
+    def get_ports(self):
+        return [ 'Midi Through 14:0', 'pcf.metronome 128:0' ]
+    def open_port(self, i):
+        self.opened = i
+    def set_callback(self, cb, data=None):
+        self.cb = cb
+    def close_port(self):
+        pass
+
+def test_loopback_listens_on_the_named_port():
+    mi = _FakeMidiIn()
+    lb = Loopback(midiin=mi)
+    assert mi.opened == 1
+    mi.cb( ([0x99, 60, 100], 0.0) )
+    assert len(lb.beat_times()) == 1
+
+def test_scheduler_clock_under_load():
+    ''' the scheduler thread vs. a catalog being fetched and parsed in a
+        loop, with the GIL handed around the way pcf --switch-interval does
+    '''
+    sched, probe = Scheduler(name='test', switch_interval=SWITCH_INTERVAL), Probe()
+    stop = threading.Event()
+    load = threading.Thread(target=busy_reload, args=(stop, 2, 2000), daemon=True)
+    load.start()
+    # 20 ms beats: ~30 of them, so one stall near the end can't swing the drift fit
+    c = Clock(lambda: probe.send_message(b'\x99\x3c\x64') or True, beats_per_minute=3000, scheduler=sched)
+    c.start()
+    time.sleep(0.6)
+    c.stop()
+    stop.set()
+    load.join()
+    sched.shutdown()
+    r = analyze(probe.beat_times(), 3000)
+    assert r['beats'] >= 10
+    assert abs(r['drift_ms']) < 5
+    assert r['max_ms'] < 25 # generous: shared CI boxes
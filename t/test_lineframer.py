@@ -0,0 +1,58 @@
+# coding: utf-8
+
+from pcf.fluidsynth import LineFramer
+
+class ChunkySock:
+    def __init__(self, data, size):
+        self.chunks = [ data[i:i+size] for i in range(0, len(data), size) ]
+
+    def recv_into(self, mv):
+        if not self.chunks:
+            return 0
+        c = self.chunks.pop(0)
+        if len(c) > len(mv):
+            c, rest = c[:len(mv)], c[len(mv):]
+            self.chunks.insert(0, rest)
+        mv[:len(c)] = c
+        return len(c)
+
+def _all_lines(data, chunk, size=16):
+    lf = LineFramer(size)
+    sock = ChunkySock(data, chunk)
+    ret = list()
+    while lf.fill(sock):
+        ret.extend(lf.lines())
+    return ret, lf.flush()
+
+def test_lines_across_chunks():
+    data = b'one\ntwo\r\nthree\n\nfour'
+    for chunk in (1, 2, 3, 5, 64):
+        lines, rest = _all_lines(data, chunk)
+        assert lines == ['one', 'two', 'three'], chunk
+        assert rest == 'four'
+
+def test_multibyte_split_across_chunks():
+    data = '→ setting → ünïcödé\nnext\n'.encode()
+    for chunk in range(1, 8):
+        assert _all_lines(data, chunk) == (['→ setting → ünïcödé', 'next'], '')
+
+def test_long_lines_grow_the_buffer_and_it_stays_put():
+    data = b''.join( b'%05d %s\n' % (i, b'x' * (i % 50)) for i in range(2000) )
+    lf = LineFramer(32)
+    sock = ChunkySock(data, 100)
+    lines = list()
+    while lf.fill(sock):
+        lines.extend(lf.lines())
+    assert len(lines) == 2000
+    assert lines[1999] == '01999 ' + 'x' * 49
+    assert len(lf.buf) <= 128
+
+def test_feed_and_partial_consumption():
+    lf = LineFramer(8)
+    lf.feed(b'fs> a\nb\nfs> ')
+    it = lf.lines()
+    assert next(it) == 'fs> a'
+    it.close()
+    assert len(lf) == 6
+    lf.feed(b'c\n')
+    assert list(lf.lines()) == ['b', 'fs> c']
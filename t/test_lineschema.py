@@ -0,0 +1,53 @@
+# coding: utf-8
+
+import threading
+from pcf.misc import LineSchema, Record
+from pcf.fluidsynth import FluidSynth, INSTRUMENTS
+
+BLOCK = '''000-000 Yamaha Grand Piano
+000-001 Bright Yamaha Grand
+garbage line
+128-000 Standard   '''
+
+def test_schema_parses_a_block():
+    res = INSTRUMENTS.parse(BLOCK, font='1')
+    assert [ tuple(r) for r in res ] == [
+        ('Yamaha Grand Piano', '1', '0', '0'),
+        ('Bright Yamaha Grand', '1', '0', '1'),
+        ('Standard', '1', '128', '0'),
+    ]
+    assert res[2].bank == '128'
+    assert res[0] == ('Yamaha Grand Piano', '1', '0', '0')
+    assert INSTRUMENTS.parse(BLOCK.splitlines(), font='1') == res
+
+def test_records_are_slotted_and_types_are_cached():
+    r = INSTRUMENTS.parse(BLOCK, font='1')[0]
+    assert isinstance(r, Record)
+    assert not hasattr(r, '__dict__')
+    s = LineSchema('Instrument', r'^(?P<name>x)$', fields=('name', 'font', 'bank', 'prog'))
+    assert s.record is INSTRUMENTS.record
+    name, font, *bp = r
+    assert (name, font, bp) == ('Yamaha Grand Piano', '1', ['0', '0'])
+    assert r[2:] == ('0', '0')
+    assert r._asdict()['name'] == 'Yamaha Grand Piano'
+
+def test_schema_direct_and_derived():
+    s = LineSchema('KV', r'^(?P<k>\w+)=(?P<v>\w+)$')
+    assert s.parse('a=1\nb=2\n!!\n') == [ ('a', '1'), ('b', '2') ]
+    s = LineSchema('KV2', r'^(?P<k>\w+)=(?P<v>\w+)$', fields=('k', 'v', 'kv'),
+        derive={'kv': lambda gd: gd['k'] + gd['v']})
+    assert s.parse('a=1')[0].kv == 'a1'
+
+def test_schema_is_shareable_between_threads():
+    big = '\n'.join( f'{i//128:03d}-{i%128:03d} Preset {i}' for i in range(2000) )
+    out = list()
+    def work(f):
+        out.append(len(INSTRUMENTS.parse(big, font=f)))
+    th = [ threading.Thread(target=work, args=(str(i),)) for i in range(4) ]
+    for t in th: t.start()
+    for t in th: t.join()
+    assert out == [2000] * 4
+
+def test_font_names():
+    fonts = FluidSynth.parse_fonts(['ID  Name', '  2  /x/b.sf2', '  1  /y/a.sf2'])
+    assert [ (f.id, f.name, f.path) for f in fonts ] == [ ('1', 'a', '/y/a.sf2'), ('2', 'b', '/x/b.sf2') ]
@@ -0,0 +1,49 @@
+# coding: utf-8
+
+import time
+
+from pcf.metronome import Metronome
+from pcf.midiport import MidiPorts
+from pcf.scheduler import Scheduler
+from pcf.jitter import Probe
+
+def test_metronome_plays_the_pattern():
+    sched, probe = Scheduler(name='test'), Probe()
+    m = Metronome(((35, 80), (45, 80)), ((42, 50),), channel=9, beats_per_minute=1200,
+        midiout=probe, scheduler=sched) # 50 ms
+    m.start()
+    time.sleep(0.12)
+    m.set_volume(0.5, wait=True)
+    time.sleep(0.1)
+    m.stop()
+    sched.shutdown()
+    ons = [ bytes(msg) for _,msg in probe.events if msg[0] == 0x99 ]
+    offs = { bytes(msg[:2]) for _,msg in probe.events if msg[0] == 0x89 }
+    assert ons[:3] == [ b'\x99\x23\x50', b'\x99\x2d\x50', b'\x99\x2a\x32' ]
+    assert offs == { b'\x89\x23', b'\x89\x2d', b'\x89\x2a' }
+    assert probe.events[-1][1][0] == 0x89 # nothing left sounding
+    assert ons[-1][2] < 0x50 # the new volume took
+    assert 4 <= len(probe.beat_times()) <= 6
+
+class _FakeMidiOut:
+    opened = list()
+    def open_virtual_port(self, name):
+        self.opened.append(name)
+    def send_message(self, msg):
+        pass
+    def close_port(self):
+        pass
+
+def test_ports_are_opened_once():
+    _FakeMidiOut.opened.clear()
+    ports = MidiPorts(factory=_FakeMidiOut)
+    a = ports.get('pcf.metronome')
+    b = ports.get('pcf.metronome')
+    c = ports.get('pcf.select')
+    assert a is b and a is not c
+    assert _FakeMidiOut.opened == [ 'pcf.metronome', 'pcf.select' ]
+    m1 = Metronome(midiout=a)
+    m2 = Metronome(((60,),), midiout=ports.get('pcf.metronome'))
+    assert m1.midiout is m2.midiout
+    ports.close_all()
+    assert not ports.ports
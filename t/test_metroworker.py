@@ -0,0 +1,59 @@
+# coding: utf-8
+
+import threading
+import multiprocessing
+
+import pcf.metroworker as mw
+
+class _FakeMetronome:
+    made = list()
+
+    def __init__(self, *beats, **kw):
+        self.calls = [ ('init', beats, kw) ]
+        self.volume = kw.get('volume', 1.0)
+        self.beats_per_minute = kw.get('beats_per_minute')
+        self.made.append(self)
+
+    def __getattr__(self, name):
+        return lambda *a, **kw: self.calls.append( (name,) + a )
+
+def test_serve_runs_the_commands():
+    _FakeMetronome.made.clear()
+    parent, child = multiprocessing.Pipe()
+    t = threading.Thread(target=mw.serve, args=(child, _FakeMetronome, 'SCHED_OTHER'))
+    t.start()
+    assert parent.recv() == ('ready', 'SCHED_OTHER')
+    parent.send( ('start',) ) # nothing loaded yet: ignored
+    parent.send( ('load', ((60,),), {'beats_per_minute': 100, 'volume': 0.5}) )
+    parent.send( ('start',) )
+    parent.send( ('tempo', 110, 4) )
+    parent.send( ('load', ((61,),(62,)), {'beats_per_minute': 200, 'steps_per_beat': 2}) )
+    parent.send( ('bogus',) )
+    parent.send( ('quit',) )
+    t.join(2)
+    assert not t.is_alive()
+    (m,) = _FakeMetronome.made
+    assert m.calls == [
+        ('init', ((60,),), {'beats_per_minute': 100, 'volume': 0.5}),
+        ('start',), ('set_tempo', 110, 4),
+        ('stop',), ('set_pattern', (61,), (62,)), ('set_volume', 0.5), ('set_tempo', 200),
+        ('stop',),
+    ]
+
+def test_realtime_falls_back(monkeypatch):
+    def nope(*a):
+        raise PermissionError('not allowed')
+    monkeypatch.setattr(mw.os, 'sched_setscheduler', nope)
+    monkeypatch.setattr(mw.os, 'sched_setaffinity', nope)
+    assert mw.realtime(cpu=0) == 'SCHED_OTHER'
+
+def test_realtime_takes_what_it_gets(monkeypatch):
+    got = list()
+    def fifo_denied(pid, policy, param):
+        if policy == mw.os.SCHED_FIFO:
+            raise PermissionError('not allowed')
+        got.append(policy)
+    monkeypatch.setattr(mw.os, 'sched_setscheduler', fifo_denied)
+    monkeypatch.setattr(mw.os, 'sched_setaffinity', lambda pid, cpus: got.append(cpus))
+    assert mw.realtime(priority=10, cpu=1) == 'SCHED_RR:10, cpu 1'
+    assert got == [ mw.os.SCHED_RR, {1} ]
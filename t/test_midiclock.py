@@ -0,0 +1,100 @@
+# coding: utf-8
+
+import time
+import random
+
+from pcf.midiclock import MidiClockOut, MidiClockIn, PPQN, MIDI_CLOCK, MIDI_START, MIDI_STOP
+from pcf.scheduler import Scheduler, NS
+from pcf.jitter import Probe
+
+def test_clock_out():
+    sched, probe = Scheduler(name='test'), Probe()
+    co = MidiClockOut(probe, beats_per_minute=600, scheduler=sched) # 240 ticks/s
+    assert co.beats_per_minute == 600
+    co.start()
+    time.sleep(0.1)
+    co.set_tempo(300)
+    assert co.beats_per_minute == 300
+    time.sleep(0.1)
+    co.stop()
+    sched.shutdown()
+    msgs = [ m[0] for _,m in probe.events ]
+    assert msgs[0] == MIDI_START and msgs[-1] == MIDI_STOP
+    ticks = [ t for t,m in probe.events if m[0] == MIDI_CLOCK ]
+    assert 30 <= len(ticks) <= 40 # ~24 then ~12
+    early = [ b - a for a,b in zip(ticks[1:15], ticks[2:16]) ]
+    assert abs(sum(early) / len(early) - 1e9 / 240) < 1e6
+
+class _FakeMidiIn:
+    def ignore_types(self, **kw):
+        self.ignored = kw
+    def set_callback(self, cb, data=None):
+        self.cb = cb
+
+def test_clock_in_follows_and_filters():
+    mi = _FakeMidiIn()
+    ci = MidiClockIn(midiin=mi, alpha=0.2)
+    assert mi.ignored['timing'] is False
+    beats = list()
+    ci.subscribe(lambda: beats.append(ci.ticks), every=PPQN)
+    ci.subscribe(lambda: beats.append('8th'), every=PPQN // 2)
+    assert ci.beats_per_minute is None
+
+    rnd = random.Random(1)
+    iv = 60e9 / (120 * PPQN)
+    t = 0
+    for i in range(4 * PPQN):
+        ci.clock(int(t + rnd.uniform(-0.5e6, 0.5e6)))
+        t += iv
+    assert abs(ci.beats_per_minute - 120) < 1
+    assert beats.count('8th') == 8
+    assert [ b for b in beats if b != '8th' ] == [ 1, 25, 49, 73 ]
+
+    ci.clock(int(t + 10 * iv)) # a dropout doesn't drag the tempo
+    assert abs(ci.beats_per_minute - 120) < 1
+
+    mi.cb( ([MIDI_STOP], 0) )
+    n = len(beats)
+    ci.clock(int(t + 11 * iv))
+    assert len(beats) == n
+    mi.cb( ([MIDI_START], 0) )
+    mi.cb( ([MIDI_CLOCK], 0) )
+    assert ci.ticks == 1 and len(beats) == n + 2 # back on a downbeat
+
+def test_clock_out_stays_with_the_click_through_a_ramp(fake_sched):
+    from pcf.metronome import Metronome
+    probe = Probe()
+    m = Metronome(clock_out=True, beats_per_minute=120, midiout=probe, scheduler=fake_sched)
+    m.start()
+    start = fake_sched.now
+    fake_sched.run_until(start + 650_000_000) # 1.3 beats in
+    m.set_tempo(160, ramp_beats=4)
+    fake_sched.run_until(start + 6 * NS)
+    m.stop()
+    clicks = [ t for t,msg in probe.events if msg[0] & 0xf0 == 0x90 ]
+    ticks = [ t for t,msg in probe.events if msg[0] == MIDI_CLOCK ]
+    assert len(clicks) > 12
+    # every 24th tick is a click, ramp or no ramp (give or take rounding)
+    offsets = [ a - b for a,b in zip(ticks[::PPQN], clicks) ]
+    assert len(offsets) == len(clicks)
+    assert max( abs(o) for o in offsets ) < 10, offsets
+    # and the ramp did happen, a step a beat: 500 ms, the rest of that beat
+    # at 130 bpm, 140, 150, then 160
+    gaps = [ (b - a) / 1e6 for a,b in zip(clicks, clicks[1:]) ]
+    want = [ 500, 150 + 0.7 * 60000 / 130, 60000 / 140, 60000 / 150 ] + [ 375 ] * (len(gaps) - 4)
+    assert all( abs(g - w) < 1e-5 for g,w in zip(gaps, want) ), gaps
+
+def test_clock_out_sends_late_ticks(fake_sched):
+    probe = Probe()
+    co = MidiClockOut(probe, beats_per_minute=600, scheduler=fake_sched) # 240 ticks/s
+    co.start()
+    start = fake_sched.now
+    period = NS / 240
+    # the third tick's callback stalls for ten ticks' worth
+    fake_sched.run_until(start + NS // 10, stall=lambda c: int(10 * period) if c.beat == 2 else 0)
+    ticks = [ t for t,msg in probe.events if msg[0] == MIDI_CLOCK ]
+    assert co.missed == 0
+    # every tick up to 100 ms went out: the late ones right after the stall
+    assert len(ticks) == int(0.1 * 240) + 1
+    assert abs(ticks[3] - ticks[2] - 10 * period) <= 1 and ticks[3] == ticks[11]
+    assert ticks[-1] == start + int(24 * period)
@@ -0,0 +1,37 @@
+# coding: utf-8
+
+from pcf.midiselect import MidiSelect
+from pcf.fluidsynth import INSTRUMENTS
+
+class RecordingOut:
+    def __init__(self):
+        self.sent = list()
+
+    def send_message(self, msg):
+        self.sent.append(tuple(msg))
+
+def _ms(**kw):
+    ms = MidiSelect(midiout=RecordingOut(), **kw)
+    inst = INSTRUMENTS.parse('000-000 Piano\n000-040 Violin', font='1') \
+         + INSTRUMENTS.parse('000-000 Other Piano\n128-000 Drums', font='2')
+    ms.update_catalog(inst)
+    return ms
+
+def test_midi_select_sends_bank_and_program():
+    ms = _ms()
+    assert ms.select(1, 0, 40, chan=3)
+    assert ms.midiout.sent == [ (0xb3, 0, 0), (0xb3, 32, 0), (0xc3, 40) ]
+
+def test_midi_select_only_when_the_font_stack_agrees():
+    ms = _ms()
+    assert not ms.select(1, 0, 0, chan=0) # font 2 (loaded later) has 000-000 too
+    assert ms.select(2, 0, 0, chan=0)
+    assert not ms.select(2, 128, 0, chan=0) # out of reach for gs bank select
+    assert not ms.select(1, 0, 40, chan=9) # percussion channel
+    assert not ms.select(1, 0, 41, chan=1) # unknown preset
+    assert len(ms.midiout.sent) == 3
+
+def test_mma_bank_select():
+    ms = _ms(bank_select='mma')
+    assert ms.messages(300, 5, chan=2) == ( (0xb2, 0, 2), (0xb2, 32, 44), (0xc2, 5) )
+    assert ms.select(2, 128, 0, chan=1)
@@ -0,0 +1,65 @@
+# coding: utf-8
+
+import pytest
+
+from pcf.patterns import Pattern, parse_patterns, load_patterns, TICKS_PER_BEAT as T
+
+TEXT = '''
+# a comment
+[straight]
+key %
+beats 2
+hhat 50 30 50 30
+35   80 .  73 .
+
+[swung]
+swing 75
+beats 1
+hhat 50 30
+
+[3:2]
+beats 1
+kick 80 80
+rims 60 60 60
+'''
+
+def test_parse():
+    p = parse_patterns(TEXT)
+    assert list(p) == [ 'straight', 'swung', '3:2' ]
+    s = p['straight']
+    assert s.key == '%' and s.beats == 2 and s.bar_ticks == 2 * T
+    assert s.hits == [ (0, 35, 80), (0, 42, 50), (T//2, 42, 30), (T, 35, 73), (T, 42, 50), (3*T//2, 42, 30) ]
+    assert p['swung'].hits == [ (0, 42, 50), (3*T//4, 42, 30) ]
+    assert [ t for t,n,v in p['3:2'].hits ] == [ 0, 0, T//3, T//2, 2*T//3 ]
+    assert p['3:2'].key is None
+
+@pytest.mark.parametrize('text,where', [
+    ('hhat 50', ':1:'),
+    ('[x]\nbogus_drum 50', ':2:'),
+    ('[x]\nhhat 50 200', ':2:'),
+    ('[x]\nbeats 0', ':2:'),
+    ('[x]\nswing 100', ':2:'),
+    ('[x]\nhhat', ':2:'),
+])
+def test_parse_errors(text, where):
+    with pytest.raises(ValueError) as e:
+        parse_patterns(text, 'mine.pat')
+    assert str(e.value).startswith('mine.pat' + where)
+
+def test_from_steps():
+    p = Pattern.from_steps( (((35, 80), 42), ((35, 200),)), steps_per_beat=2 )
+    assert p.beats == 1
+    assert p.hits == [ (0, 35, 80), (0, 42, 112), (T//2, 35, 127) ]
+
+def test_bundled_and_user_patterns(tmp_path):
+    bundled = load_patterns(user=False)
+    keys = { p.key for p in bundled.values() if p.key }
+    assert { '!', '@', '#', '$', '%', '^' } <= keys
+    assert bundled['4/4,8'].bar_ticks == 4 * T
+
+    mine = tmp_path / 'metronome.pat'
+    mine.write_text('[4/4]\nkey $\nbeats 4\nsnare 90 . 90 .\n\n[mine]\nkey ~\nbeats 1\nrims 100\n')
+    both = load_patterns(str(mine))
+    assert both['4/4'].hits == [ (0, 38, 90), (2*T, 38, 90) ]
+    assert both['mine'].key == '~'
+    assert set(bundled) < set(both)
@@ -0,0 +1,161 @@
+# coding: utf-8
+
+import sys
+import time
+import random
+import itertools
+import threading
+
+from pcf.scheduler import Scheduler, Clock, NS
+
+def _recorder(n, done):
+    times = list()
+    def cb():
+        times.append(time.monotonic_ns())
+        if len(times) >= n:
+            done.set()
+            return False
+        return True
+    return times, cb
+
+def test_clock_has_no_drift(fake_sched):
+    rnd = random.Random(1)
+    deadlines = list()
+    c = Clock(lambda: deadlines.append(c.last_ns) or len(deadlines) < 30,
+        beats_per_minute=6000, scheduler=fake_sched) # 10 ms
+    start = fake_sched.now + NS // 100
+    c.start(at_ns=start)
+    # every callback runs late, by up to most of a beat
+    fake_sched.run_until(start + NS, stall=lambda c: rnd.randrange(8_000_000))
+    assert not c.running
+    # ... and every deadline is still on the grid from the one start
+    assert deadlines == [ start + k * c.period_ns for k in range(30) ]
+    assert c.missed == 0
+
+def test_independent_clocks_and_stop():
+    sched = Scheduler(name='test')
+    a_done, b_done = threading.Event(), threading.Event()
+    a_times, a_cb = _recorder(10, a_done)
+    b_times, b_cb = _recorder(1000, b_done)
+    a = Clock(a_cb, beats_per_minute=12000, scheduler=sched)
+    b = Clock(b_cb, beats_per_minute=4000, scheduler=sched)
+    a.start()
+    b.start()
+    assert a_done.wait(2)
+    b.stop()
+    n = len(b_times)
+    time.sleep(0.05)
+    sched.shutdown()
+    assert len(a_times) == 10
+    assert 2 <= n <= 6 and len(b_times) == n
+
+def test_late_clock_skips_instead_of_bursting(fake_sched):
+    beats = list()
+    c = Clock(lambda: beats.append(c.beat) or len(beats) < 3, beats_per_minute=6000,
+        scheduler=fake_sched) # 10 ms
+    c.start()
+    start = c.start_ns
+    # the first beat's callback stalls for 55 ms: beats 1 to 5 are gone
+    fake_sched.run_until(start + NS, stall=lambda c: 55_000_000 if c.beat == 0 else 0)
+    assert beats == [ 0, 6, 7 ]
+    assert c.missed == 5
+    assert c.start_ns == start and c.last_ns == start + 7 * c.period_ns
+
+def test_timers_run_in_order_and_cancel():
+    sched = Scheduler(name='test')
+    got, done = list(), threading.Event()
+    now = time.monotonic_ns()
+    sched.call_at(now + 20_000_000, got.append, 'c')
+    sched.call_at(now + 5_000_000, got.append, 'a')
+    t = sched.call_later(0.01, got.append, 'never')
+    sched.call_at(now + 10_000_000, got.append, 'b')
+    sched.call_at(now + 30_000_000, done.set)
+    t.cancel()
+    assert done.wait(1)
+    sched.shutdown()
+    assert got == ['a', 'b', 'c']
+
+def test_clock_callbacks_schedule_their_own_note_offs(fake_sched):
+    sched, events = fake_sched, list()
+    def beat():
+        events.append( ('on', sched.now) )
+        # a note longer than the beat: overlaps the next note-on
+        sched.call_later(0.015, lambda: events.append( ('off', sched.now) ))
+        return sum( 1 for e,_ in events if e == 'on' ) < 4
+    c = Clock(beat, beats_per_minute=6000, scheduler=sched) # 10 ms
+    c.start()
+    start = c.start_ns
+    # the callbacks each take a while; that moves nothing that's due later
+    sched.run_until(start + 70_000_000, stall=lambda c: 2_000_000)
+    kinds = [ e for e,_ in events ]
+    assert kinds == [ 'on', 'on', 'off', 'on', 'off', 'on', 'off', 'off' ]
+    ons = [ t for e,t in events if e == 'on' ]
+    offs = [ t for e,t in events if e == 'off' ]
+    assert ons == [ start + k * 10_000_000 for k in range(4) ]
+    assert offs == [ on + 15_000_000 for on in ons ]
+
+def test_tempo_change_keeps_phase(fake_sched):
+    deadlines = list()
+    c = Clock(lambda: deadlines.append(c.last_ns) or True, beats_per_minute=3000,
+        scheduler=fake_sched) # 20 ms
+    c.start()
+    start = c.start_ns
+    fake_sched.run_until(start + 45_000_000) # a quarter of the way into the third beat
+    c.set_tempo(1500) # 40 ms
+    fake_sched.run_until(start + 150_000_000)
+    # the other three quarters of that beat at the new tempo, then 40 ms beats
+    due = start + 45_000_000 + 30_000_000
+    assert deadlines == [ start, start + 20_000_000, start + 40_000_000,
+        due, due + 40_000_000 ]
+    assert c.missed == 0
+
+def test_tempo_ramp(fake_sched):
+    deadlines = list()
+    def cb():
+        deadlines.append(c.last_ns)
+        if len(deadlines) == 2:
+            c.set_tempo(1500, ramp_beats=4) # 20 ms → 40 ms beats over 4 beats
+        return len(deadlines) < 8
+    c = Clock(cb, beats_per_minute=3000, scheduler=fake_sched)
+    c.start()
+    fake_sched.run_until(c.start_ns + NS)
+    # 20 ms, the ramp steps at 2625, 2250 and 1875 bpm, then 40 ms; each
+    # deadline exactly one period of its step after the one before
+    periods = [ int(60 * NS / bpm) for bpm in (3000, 2625, 2250, 1875, 1500, 1500, 1500) ]
+    assert deadlines == list(itertools.accumulate([ deadlines[0] ] + periods))
+    assert c.beats_per_minute == 1500 and not c._ramp
+
+def _switch_interval_settles(want, timeout=1):
+    t_end = time.monotonic() + timeout
+    while sys.getswitchinterval() != want and time.monotonic() < t_end:
+        time.sleep(0.005)
+    return sys.getswitchinterval() == want
+
+def test_switch_interval_is_opt_in_and_only_lowered_while_busy():
+    before = sys.getswitchinterval()
+    sched = Scheduler(name='test')
+    sched.call_later(0, lambda: None)
+    assert sys.getswitchinterval() == before
+    sched.shutdown()
+
+    sched = Scheduler(name='test', switch_interval=before / 5)
+    done = threading.Event()
+    sched.call_later(0.05, done.set)
+    assert sys.getswitchinterval() == before / 5
+    assert done.wait(1)
+    # nothing left to run: put back with the thread still there
+    assert _switch_interval_settles(before)
+    c = Clock(lambda: True, beats_per_minute=600, scheduler=sched)
+    c.start()
+    assert sys.getswitchinterval() == before / 5
+    c.stop()
+    assert _switch_interval_settles(before)
+    c.start()
+    sched.shutdown()
+    assert sys.getswitchinterval() == before
+    sched.shutdown()
+    sched = Scheduler(name='test', switch_interval=before / 5)
+    sched.call_later(0, lambda: None)
+    assert sys.getswitchinterval() == before / 5
+    sched.shutdown()
+    assert sys.getswitchinterval() == before
@@ -0,0 +1,83 @@
+# coding: utf-8
+
+import time
+import threading
+
+from pcf.patterns import Pattern, parse_patterns, TICKS_PER_BEAT as T
+from pcf.sequencer import Sequencer, compile_pattern, GATE_TICKS
+from pcf.scheduler import Scheduler, NS
+from pcf.jitter import Probe
+
+def test_compile_pattern():
+    p = Pattern('x', 1, [ (0, 35, 80), (0, 42, 100), (T//8, 42, 50), (T//2, 38, 200) ])
+    prog = compile_pattern(p, channel=9, volume=0.5)
+    assert prog.bar_ticks == T
+    ticks = [ t for t,_ in prog.events ]
+    assert ticks == sorted(ticks) and ticks[0] == 0
+    at = dict(prog.events)
+    assert at[0] == (b'\x99\x23\x28', b'\x99\x2a\x32')
+    # the second hhat comes before the gate is up: the first one ends there
+    assert at[T//8] == (b'\x89\x2a\x32', b'\x99\x2a\x19')
+    assert at[T//8 + GATE_TICKS] == (b'\x89\x2a\x19',)
+    assert at[T//2] == (b'\x99\x26\x64',) # halved, then capped at 127
+    assert at[GATE_TICKS] == (b'\x89\x23\x28',)
+    assert set(prog.offs) == { b'\x89\x23\x00', b'\x89\x2a\x00', b'\x89\x26\x00' }
+    # never silent, never past 127
+    quiet = compile_pattern(Pattern('q', 1, [ (0, 35, 100) ]), volume=0.01)
+    assert quiet.events[0][1] == (b'\x99\x23\x05',)
+
+def test_a_rest_on_the_downbeat():
+    prog = compile_pattern(Pattern('r', 1, [ (T//2, 35, 100) ]))
+    assert prog.events[0] == (0, ())
+
+def test_subdivisions_land_on_their_ticks(fake_sched):
+    # 4 against 3 at 300 bpm: a 200 ms beat, one wakeup per distinct tick
+    (p,) = parse_patterns('[x]\nbeats 1\nkick 80 80 80 80\nrims 60 60 60\n').values()
+    prog = compile_pattern(p)
+    assert [ t for t,_ in prog.events ] == sorted({ 0, T//4, T//3, T//2, 2*T//3, 3*T//4 }
+        | { t + GATE_TICKS for t in (T//4, T//3, T//2, 2*T//3, 3*T//4) if t + GATE_TICKS < T })
+    probe = Probe()
+    s = Sequencer(prog, probe, beats_per_minute=300, scheduler=fake_sched)
+    start = fake_sched.now + NS // 50
+    s.start(at_ns=start)
+    fake_sched.run_until(start + 2 * NS // 5 - 1) # two bars
+    s.stop()
+    tick_ns = 60 * NS / (300 * T)
+    ons = sorted( (t, msg[1]) for t,msg in probe.events if msg[0] == 0x99 )
+    want = [ (b * T + k * T // 4, 45) for b in range(2) for k in range(4) ]
+    want += [ (b * T + k * T // 3, 37) for b in range(2) for k in range(3) ]
+    # every note-on went out on the deadline worked out for its tick
+    assert ons == sorted( (start + int(tick * tick_ns), n) for tick,n in want )
+    assert s.missed == 0
+
+def test_tempo_is_in_beats():
+    s = Sequencer(compile_pattern(Pattern('x', 1, [ (0, 35, 80) ])), Probe(), beats_per_minute=90)
+    assert s.beats_per_minute == 90
+    assert s.period_ns == int(60 * NS / (90 * T))
+    s.set_tempo(120, ramp_beats=4)
+    assert s.beats_per_minute == 120 # not running: straight there
+
+def test_ramp_steps_on_beats():
+    sched = Scheduler(name='test')
+    s = Sequencer(compile_pattern(Pattern('x', 1, [ (0, 35, 80), (T//2, 42, 50) ])), Probe(),
+        beats_per_minute=600, scheduler=sched)
+    s.start()
+    time.sleep(0.01)
+    s.set_tempo(1200, ramp_beats=4)
+    done = threading.Event()
+    sched.call_later(0.5, done.set)
+    done.wait(2)
+    s.stop()
+    sched.shutdown()
+    assert s.beats_per_minute == 1200 and not s._ramp
+
+def test_play_ticks_follows():
+    (p,) = parse_patterns('[x]\nbeats 1\nkick 80 . . .\nrims 60 60 60\n').values()
+    probe = Probe()
+    s = Sequencer(compile_pattern(p), probe)
+    for _ in range(24): # one beat of MIDI clock
+        s.play_ticks(T // 24)
+    ons = [ msg[1] for _,msg in probe.events if msg[0] == 0x99 ]
+    assert ons == [ 37, 45, 37, 37 ]
+    s.play_ticks(T // 24)
+    assert probe.events[-1][1] == b'\x99\x2d\x50' # and around again
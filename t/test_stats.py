@@ -0,0 +1,71 @@
+# coding: utf-8
+
+import json
+import asyncio
+
+from pcf.stats import Histogram, IOStats
+from pcf.fluidsynth import FluidSynth, AsyncFluidSynth
+
+def test_histogram_percentiles():
+    h = Histogram()
+    for i in range(1, 101):
+        h.record(i / 1000.0)
+    assert h.count == 100
+    assert h.min == 0.001 and h.max == 0.1
+    # buckets are ~19% wide, the answer is the top of the right bucket
+    assert 0.050 <= h.percentile(50) <= 0.050 * 1.2
+    assert 0.099 <= h.percentile(99) <= 0.1
+    assert Histogram().percentile(50) is None
+
+def test_histogram_zero():
+    h = Histogram()
+    h.record(0)
+    h.record(0.5)
+    assert h.percentile(50) == 0
+    assert h.percentile(100) == 0.5
+
+def test_iostats_by_verb_and_totals(tmp_path):
+    st = IOStats()
+    st.record('select 0 1 0 0', 0.002, bytes_out=15)
+    st.record('select 1 1 0 0', 0.004, bytes_out=15)
+    st.record('inst 1', 0.010, bytes_out=7, bytes_in=300, lines=12)
+    assert sorted(st.verbs) == ['inst', 'select']
+    assert st.verbs['select'].rtt.count == 2
+    before = st.totals()
+    st.record('inst 2', 0.010, bytes_out=7, bytes_in=100, lines=3)
+    d = IOStats.diff(st.totals(), before)
+    assert (d['count'], d['bytes_in'], d['lines']) == (1, 100, 3)
+
+    path = st.dump(str(tmp_path / 'stats.json'), last_reload=d)
+    dat = json.load(open(path))
+    assert dat['verbs']['inst']['lines'] == 15
+    assert dat['last_reload']['bytes_in'] == 100
+    assert len(st.lines_of_text()) == 3
+
+def test_client_records_exchanges(fake_server):
+    st = IOStats()
+    fs = FluidSynth(port=fake_server.port, host='127.0.0.1', stats=st)
+    fs.batch('fonts', 'inst 1')
+    fs.select(1, 0, 0, chan=3)
+    assert st.verbs['inst'].lines == 3
+    assert st.verbs['inst'].bytes_in > len('000-000 Yamaha Grand Piano') * 3
+    assert st.verbs['select'].rtt.count == 1
+    assert st.verbs['fonts'].bytes_out == len('fonts\necho pcf-eor-1\n')
+
+    list(FluidSynth(port=fake_server.port, host='127.0.0.1', framed=False, stats=st).send('channels'))
+    assert st.verbs['channels'].lines == 16
+    assert st.verbs['channels'].rtt.min >= fs.timeout # the idle wait counts
+    fs.close()
+
+def test_async_client_records_exchanges(fake_server):
+    st = IOStats()
+    async def go():
+        afs = AsyncFluidSynth(port=fake_server.port, host='127.0.0.1', stats=st)
+        try:
+            await afs.batch('inst 1', 'inst 2')
+        finally:
+            await afs.close()
+    asyncio.run(go())
+    assert st.verbs['inst'].rtt.count == 2
+    assert st.verbs['inst'].lines == 5
+    assert st.verbs['inst'].bytes_in > 0